@@ -3,7 +3,7 @@
 -- Create tables to store and read information
 CREATE TABLE sensors (
     sensor_id SERIAL PRIMARY KEY,
-    sensor_name VARCHAR(50) NOT NULL,
+    sensor_name VARCHAR(50) NOT NULL UNIQUE,  -- Registration upserts on the name
     sensor_locale VARCHAR(50) NOT NULL,
     sensor_region VARCHAR(50) NOT NULL,
     sensor_country VARCHAR(50) NOT NULL,
@@ -12,10 +12,11 @@ CREATE TABLE sensors (
     sensor_timezone VARCHAR(50) NOT NULL
 );
 
+-- Readings are range partitioned by week; partitions are created ahead of time by ensure_weather_partitions()
 CREATE TABLE weather_data (
-    data_id SERIAL PRIMARY KEY,
+    data_id SERIAL,
     sensor_id INTEGER REFERENCES sensors(sensor_id),
-    time_recorded VARCHAR(50) NOT NULL,
+    time_recorded TIMESTAMPTZ NOT NULL,
     temp_c REAL NOT NULL,
     temp_f FLOAT NOT NULL,
     wind_mph FLOAT NOT NULL,
@@ -27,7 +28,284 @@ CREATE TABLE weather_data (
     precip_mm FLOAT NOT NULL,
     precip_in FLOAT NOT NULL,
     humidity_perc FLOAT NOT NULL,
-    uv_index_score FLOAT NOT NULL
+    uv_index_score FLOAT NOT NULL,
+    PRIMARY KEY (data_id, time_recorded),
+    UNIQUE (sensor_id, time_recorded)  -- Also serves as the (sensor_id, time_recorded) lookup index
+) PARTITION BY RANGE (time_recorded);
+
+CREATE TABLE weather_partitions (
+    partition_name VARCHAR(63) PRIMARY KEY,
+    range_start TIMESTAMPTZ NOT NULL,
+    range_end TIMESTAMPTZ NOT NULL
+);
+
+-- Per-minute, hourly and daily rollups of weather_data, kept current by refresh_weather_rollups()
+CREATE TABLE weather_rollups (
+    resolution VARCHAR(10) NOT NULL,
+    sensor_id INTEGER REFERENCES sensors(sensor_id),
+    bucket_start TIMESTAMPTZ NOT NULL,
+    sample_count INTEGER NOT NULL,
+    temp_c_min FLOAT NOT NULL,
+    temp_c_mean FLOAT NOT NULL,
+    temp_c_max FLOAT NOT NULL,
+    temp_f_min FLOAT NOT NULL,
+    temp_f_mean FLOAT NOT NULL,
+    temp_f_max FLOAT NOT NULL,
+    wind_mph_min FLOAT NOT NULL,
+    wind_mph_mean FLOAT NOT NULL,
+    wind_mph_max FLOAT NOT NULL,
+    wind_kph_min FLOAT NOT NULL,
+    wind_kph_mean FLOAT NOT NULL,
+    wind_kph_max FLOAT NOT NULL,
+    wind_degree_min FLOAT NOT NULL,
+    wind_degree_mean FLOAT NOT NULL,
+    wind_degree_max FLOAT NOT NULL,
+    pressure_mb_min FLOAT NOT NULL,
+    pressure_mb_mean FLOAT NOT NULL,
+    pressure_mb_max FLOAT NOT NULL,
+    pressure_in_min FLOAT NOT NULL,
+    pressure_in_mean FLOAT NOT NULL,
+    pressure_in_max FLOAT NOT NULL,
+    precip_mm_min FLOAT NOT NULL,
+    precip_mm_mean FLOAT NOT NULL,
+    precip_mm_max FLOAT NOT NULL,
+    precip_in_min FLOAT NOT NULL,
+    precip_in_mean FLOAT NOT NULL,
+    precip_in_max FLOAT NOT NULL,
+    humidity_perc_min FLOAT NOT NULL,
+    humidity_perc_mean FLOAT NOT NULL,
+    humidity_perc_max FLOAT NOT NULL,
+    uv_index_score_min FLOAT NOT NULL,
+    uv_index_score_mean FLOAT NOT NULL,
+    uv_index_score_max FLOAT NOT NULL,
+    PRIMARY KEY (resolution, sensor_id, bucket_start)
+);
+
+CREATE TABLE wind_dir_rollups (
+    resolution VARCHAR(10) NOT NULL,
+    sensor_id INTEGER REFERENCES sensors(sensor_id),
+    bucket_start TIMESTAMPTZ NOT NULL,
+    wind_dir VARCHAR(50) NOT NULL,
+    direction_count INTEGER NOT NULL,
+    PRIMARY KEY (resolution, sensor_id, bucket_start, wind_dir)
+);
+
+-- Recompute every rollup bucket touched by rows of the given sensors between the given times. Minute buckets are
+-- built from the raw rows, then each hour from its minutes and each day from its hours, so a live insert only
+-- re-aggregates the handful of buckets it touched
+CREATE FUNCTION refresh_weather_rollups(changed_sensor_ids INTEGER[], changed_start TIMESTAMPTZ,
+                                        changed_end TIMESTAMPTZ) RETURNS void AS $$
+DECLARE
+    locked_sensor_id INTEGER;
+    minute_start TIMESTAMPTZ := date_trunc('minute', changed_start);
+    minute_end TIMESTAMPTZ := date_trunc('minute', changed_end) + interval '1 minute';
+    rollup_resolution TEXT;
+    source_resolution TEXT := 'minute';
+    rollup_start TIMESTAMPTZ;
+    rollup_end TIMESTAMPTZ;
+BEGIN
+    -- Refresh one sensor at a time across transactions, taking the locks in a fixed order so writers cannot
+    -- deadlock. Otherwise two backfill workers sharing a bucket would each rebuild it from only their own rows
+    FOREACH locked_sensor_id IN ARRAY ARRAY(SELECT DISTINCT unnest(changed_sensor_ids) ORDER BY 1) LOOP
+        PERFORM pg_advisory_xact_lock(hashtext('refresh_weather_rollups'), locked_sensor_id);
+    END LOOP;
+
+    INSERT INTO weather_rollups (
+        resolution, sensor_id, bucket_start, sample_count,
+        temp_c_min, temp_c_mean, temp_c_max,
+        temp_f_min, temp_f_mean, temp_f_max,
+        wind_mph_min, wind_mph_mean, wind_mph_max,
+        wind_kph_min, wind_kph_mean, wind_kph_max,
+        wind_degree_min, wind_degree_mean, wind_degree_max,
+        pressure_mb_min, pressure_mb_mean, pressure_mb_max,
+        pressure_in_min, pressure_in_mean, pressure_in_max,
+        precip_mm_min, precip_mm_mean, precip_mm_max,
+        precip_in_min, precip_in_mean, precip_in_max,
+        humidity_perc_min, humidity_perc_mean, humidity_perc_max,
+        uv_index_score_min, uv_index_score_mean, uv_index_score_max
+    )
+    SELECT
+        'minute', sensor_id, date_trunc('minute', time_recorded), COUNT(*),
+        MIN(temp_c), AVG(temp_c), MAX(temp_c),
+        MIN(temp_f), AVG(temp_f), MAX(temp_f),
+        MIN(wind_mph), AVG(wind_mph), MAX(wind_mph),
+        MIN(wind_kph), AVG(wind_kph), MAX(wind_kph),
+        MIN(wind_degree), AVG(wind_degree), MAX(wind_degree),
+        MIN(pressure_mb), AVG(pressure_mb), MAX(pressure_mb),
+        MIN(pressure_in), AVG(pressure_in), MAX(pressure_in),
+        MIN(precip_mm), AVG(precip_mm), MAX(precip_mm),
+        MIN(precip_in), AVG(precip_in), MAX(precip_in),
+        MIN(humidity_perc), AVG(humidity_perc), MAX(humidity_perc),
+        MIN(uv_index_score), AVG(uv_index_score), MAX(uv_index_score)
+    FROM weather_data
+    WHERE sensor_id = ANY(changed_sensor_ids) AND time_recorded >= minute_start AND time_recorded < minute_end
+    GROUP BY 2, 3
+    ON CONFLICT (resolution, sensor_id, bucket_start) DO UPDATE SET
+        sample_count = EXCLUDED.sample_count,
+        temp_c_min = EXCLUDED.temp_c_min, temp_c_mean = EXCLUDED.temp_c_mean, temp_c_max = EXCLUDED.temp_c_max,
+        temp_f_min = EXCLUDED.temp_f_min, temp_f_mean = EXCLUDED.temp_f_mean, temp_f_max = EXCLUDED.temp_f_max,
+        wind_mph_min = EXCLUDED.wind_mph_min, wind_mph_mean = EXCLUDED.wind_mph_mean, wind_mph_max = EXCLUDED.wind_mph_max,
+        wind_kph_min = EXCLUDED.wind_kph_min, wind_kph_mean = EXCLUDED.wind_kph_mean, wind_kph_max = EXCLUDED.wind_kph_max,
+        wind_degree_min = EXCLUDED.wind_degree_min, wind_degree_mean = EXCLUDED.wind_degree_mean, wind_degree_max = EXCLUDED.wind_degree_max,
+        pressure_mb_min = EXCLUDED.pressure_mb_min, pressure_mb_mean = EXCLUDED.pressure_mb_mean, pressure_mb_max = EXCLUDED.pressure_mb_max,
+        pressure_in_min = EXCLUDED.pressure_in_min, pressure_in_mean = EXCLUDED.pressure_in_mean, pressure_in_max = EXCLUDED.pressure_in_max,
+        precip_mm_min = EXCLUDED.precip_mm_min, precip_mm_mean = EXCLUDED.precip_mm_mean, precip_mm_max = EXCLUDED.precip_mm_max,
+        precip_in_min = EXCLUDED.precip_in_min, precip_in_mean = EXCLUDED.precip_in_mean, precip_in_max = EXCLUDED.precip_in_max,
+        humidity_perc_min = EXCLUDED.humidity_perc_min, humidity_perc_mean = EXCLUDED.humidity_perc_mean, humidity_perc_max = EXCLUDED.humidity_perc_max,
+        uv_index_score_min = EXCLUDED.uv_index_score_min, uv_index_score_mean = EXCLUDED.uv_index_score_mean, uv_index_score_max = EXCLUDED.uv_index_score_max;
+
+    DELETE FROM wind_dir_rollups
+    WHERE resolution = 'minute' AND sensor_id = ANY(changed_sensor_ids)
+        AND bucket_start >= minute_start AND bucket_start < minute_end;
+    INSERT INTO wind_dir_rollups (resolution, sensor_id, bucket_start, wind_dir, direction_count)
+    SELECT 'minute', sensor_id, date_trunc('minute', time_recorded), wind_dir, COUNT(*)
+    FROM weather_data
+    WHERE sensor_id = ANY(changed_sensor_ids) AND time_recorded >= minute_start AND time_recorded < minute_end
+    GROUP BY 2, 3, 4
+    ON CONFLICT (resolution, sensor_id, bucket_start, wind_dir) DO UPDATE SET
+        direction_count = EXCLUDED.direction_count;
+
+    -- Roll the refreshed buckets up one level at a time, weighting means by their sample counts
+    FOREACH rollup_resolution IN ARRAY ARRAY['hour', 'day'] LOOP
+        rollup_start := date_trunc(rollup_resolution, changed_start);
+        rollup_end := date_trunc(rollup_resolution, changed_end) + ('1 ' || rollup_resolution)::interval;
+
+        INSERT INTO weather_rollups (
+            resolution, sensor_id, bucket_start, sample_count,
+            temp_c_min, temp_c_mean, temp_c_max,
+            temp_f_min, temp_f_mean, temp_f_max,
+            wind_mph_min, wind_mph_mean, wind_mph_max,
+            wind_kph_min, wind_kph_mean, wind_kph_max,
+            wind_degree_min, wind_degree_mean, wind_degree_max,
+            pressure_mb_min, pressure_mb_mean, pressure_mb_max,
+            pressure_in_min, pressure_in_mean, pressure_in_max,
+            precip_mm_min, precip_mm_mean, precip_mm_max,
+            precip_in_min, precip_in_mean, precip_in_max,
+            humidity_perc_min, humidity_perc_mean, humidity_perc_max,
+            uv_index_score_min, uv_index_score_mean, uv_index_score_max
+        )
+        SELECT
+            rollup_resolution, sensor_id, date_trunc(rollup_resolution, bucket_start), SUM(sample_count),
+            MIN(temp_c_min), SUM(temp_c_mean * sample_count) / SUM(sample_count), MAX(temp_c_max),
+            MIN(temp_f_min), SUM(temp_f_mean * sample_count) / SUM(sample_count), MAX(temp_f_max),
+            MIN(wind_mph_min), SUM(wind_mph_mean * sample_count) / SUM(sample_count), MAX(wind_mph_max),
+            MIN(wind_kph_min), SUM(wind_kph_mean * sample_count) / SUM(sample_count), MAX(wind_kph_max),
+            MIN(wind_degree_min), SUM(wind_degree_mean * sample_count) / SUM(sample_count), MAX(wind_degree_max),
+            MIN(pressure_mb_min), SUM(pressure_mb_mean * sample_count) / SUM(sample_count), MAX(pressure_mb_max),
+            MIN(pressure_in_min), SUM(pressure_in_mean * sample_count) / SUM(sample_count), MAX(pressure_in_max),
+            MIN(precip_mm_min), SUM(precip_mm_mean * sample_count) / SUM(sample_count), MAX(precip_mm_max),
+            MIN(precip_in_min), SUM(precip_in_mean * sample_count) / SUM(sample_count), MAX(precip_in_max),
+            MIN(humidity_perc_min), SUM(humidity_perc_mean * sample_count) / SUM(sample_count), MAX(humidity_perc_max),
+            MIN(uv_index_score_min), SUM(uv_index_score_mean * sample_count) / SUM(sample_count), MAX(uv_index_score_max)
+        FROM weather_rollups
+        WHERE resolution = source_resolution AND sensor_id = ANY(changed_sensor_ids)
+            AND bucket_start >= rollup_start AND bucket_start < rollup_end
+        GROUP BY 2, 3
+        ON CONFLICT (resolution, sensor_id, bucket_start) DO UPDATE SET
+            sample_count = EXCLUDED.sample_count,
+            temp_c_min = EXCLUDED.temp_c_min, temp_c_mean = EXCLUDED.temp_c_mean, temp_c_max = EXCLUDED.temp_c_max,
+            temp_f_min = EXCLUDED.temp_f_min, temp_f_mean = EXCLUDED.temp_f_mean, temp_f_max = EXCLUDED.temp_f_max,
+            wind_mph_min = EXCLUDED.wind_mph_min, wind_mph_mean = EXCLUDED.wind_mph_mean, wind_mph_max = EXCLUDED.wind_mph_max,
+            wind_kph_min = EXCLUDED.wind_kph_min, wind_kph_mean = EXCLUDED.wind_kph_mean, wind_kph_max = EXCLUDED.wind_kph_max,
+            wind_degree_min = EXCLUDED.wind_degree_min, wind_degree_mean = EXCLUDED.wind_degree_mean, wind_degree_max = EXCLUDED.wind_degree_max,
+            pressure_mb_min = EXCLUDED.pressure_mb_min, pressure_mb_mean = EXCLUDED.pressure_mb_mean, pressure_mb_max = EXCLUDED.pressure_mb_max,
+            pressure_in_min = EXCLUDED.pressure_in_min, pressure_in_mean = EXCLUDED.pressure_in_mean, pressure_in_max = EXCLUDED.pressure_in_max,
+            precip_mm_min = EXCLUDED.precip_mm_min, precip_mm_mean = EXCLUDED.precip_mm_mean, precip_mm_max = EXCLUDED.precip_mm_max,
+            precip_in_min = EXCLUDED.precip_in_min, precip_in_mean = EXCLUDED.precip_in_mean, precip_in_max = EXCLUDED.precip_in_max,
+            humidity_perc_min = EXCLUDED.humidity_perc_min, humidity_perc_mean = EXCLUDED.humidity_perc_mean, humidity_perc_max = EXCLUDED.humidity_perc_max,
+            uv_index_score_min = EXCLUDED.uv_index_score_min, uv_index_score_mean = EXCLUDED.uv_index_score_mean, uv_index_score_max = EXCLUDED.uv_index_score_max;
+
+        DELETE FROM wind_dir_rollups
+        WHERE resolution = rollup_resolution AND sensor_id = ANY(changed_sensor_ids)
+            AND bucket_start >= rollup_start AND bucket_start < rollup_end;
+        INSERT INTO wind_dir_rollups (resolution, sensor_id, bucket_start, wind_dir, direction_count)
+        SELECT rollup_resolution, sensor_id, date_trunc(rollup_resolution, bucket_start), wind_dir,
+            SUM(direction_count)
+        FROM wind_dir_rollups
+        WHERE resolution = source_resolution AND sensor_id = ANY(changed_sensor_ids)
+            AND bucket_start >= rollup_start AND bucket_start < rollup_end
+        GROUP BY 2, 3, 4
+        ON CONFLICT (resolution, sensor_id, bucket_start, wind_dir) DO UPDATE SET
+            direction_count = EXCLUDED.direction_count;
+
+        source_resolution := rollup_resolution;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql SET TimeZone = 'UTC';
+
+-- Create the weekly weather_data partitions covering the given times, skipping weeks an existing partition already
+-- covers (such as the weather_data_legacy partition a migrated database starts with)
+CREATE FUNCTION ensure_weather_partitions(range_start TIMESTAMPTZ, range_end TIMESTAMPTZ) RETURNS INTEGER AS $$
+DECLARE
+    partition_start TIMESTAMPTZ := date_trunc('week', range_start);
+    partition_name TEXT;
+    partitions_created INTEGER := 0;
+BEGIN
+    WHILE partition_start <= range_end LOOP
+        partition_name := 'weather_data_' || to_char(partition_start, 'IYYY"w"IW');
+        IF to_regclass(partition_name) IS NULL AND NOT EXISTS (
+            SELECT 1 FROM weather_partitions AS p
+            WHERE p.range_start < partition_start + interval '1 week' AND p.range_end > partition_start
+        ) THEN
+            EXECUTE format(
+                'CREATE TABLE IF NOT EXISTS %I PARTITION OF weather_data FOR VALUES FROM (%L) TO (%L)',
+                partition_name, partition_start, partition_start + interval '1 week'
+            );
+            INSERT INTO weather_partitions VALUES (partition_name, partition_start, partition_start + interval '1 week')
+            ON CONFLICT DO NOTHING;
+            partitions_created := partitions_created + 1;
+        END IF;
+        partition_start := partition_start + interval '1 week';
+    END LOOP;
+    RETURN partitions_created;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public SET TimeZone = 'UTC';
+
+-- Drop every partition that ended before the cutoff. The rollups are kept current on every insert, so nothing is
+-- rebuilt here. The parent is locked before anything else, so the drop never holds a lock that a writer already
+-- inside weather_data is waiting for
+CREATE FUNCTION expire_weather_partitions(retain_after TIMESTAMPTZ) RETURNS INTEGER AS $$
+DECLARE
+    expired_partition RECORD;
+    partitions_dropped INTEGER := 0;
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM weather_partitions WHERE range_end <= retain_after) THEN
+        RETURN 0;
+    END IF;
+    LOCK TABLE weather_data IN ACCESS EXCLUSIVE MODE;
+
+    FOR expired_partition IN
+        SELECT * FROM weather_partitions WHERE range_end <= retain_after ORDER BY range_start
+    LOOP
+        EXECUTE format('DROP TABLE IF EXISTS %I', expired_partition.partition_name);
+        DELETE FROM weather_partitions WHERE partition_name = expired_partition.partition_name;
+        partitions_dropped := partitions_dropped + 1;
+    END LOOP;
+    RETURN partitions_dropped;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public SET TimeZone = 'UTC';
+
+-- Delete the minute rollups older than the oldest raw partition. They are as many as the raw rows, so they are only
+-- kept while the raw rows are; hourly and daily rollups are kept for good
+CREATE FUNCTION expire_minute_rollups() RETURNS INTEGER AS $$
+DECLARE
+    hot_start TIMESTAMPTZ := (SELECT MIN(range_start) FROM weather_partitions);
+    buckets_deleted INTEGER;
+BEGIN
+    IF hot_start IS NULL THEN
+        RETURN 0;
+    END IF;
+    DELETE FROM wind_dir_rollups WHERE resolution = 'minute' AND bucket_start < hot_start;
+    DELETE FROM weather_rollups WHERE resolution = 'minute' AND bucket_start < hot_start;
+    GET DIAGNOSTICS buckets_deleted = ROW_COUNT;
+    RETURN buckets_deleted;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TABLE backfill_days (
+    sensor_id INTEGER REFERENCES sensors(sensor_id),
+    day_ingested DATE NOT NULL,
+    PRIMARY KEY (sensor_id, day_ingested)
 );
 
 -- Create data generation user and set permissions
@@ -37,6 +315,10 @@ GRANT USAGE ON SCHEMA public TO data_generator;
 GRANT SELECT, INSERT, UPDATE, DELETE ON ALL TABLES IN SCHEMA public TO data_generator;
 GRANT USAGE, SELECT ON SEQUENCE sensors_sensor_id_seq TO data_generator;
 GRANT USAGE, SELECT ON SEQUENCE weather_data_data_id_seq TO data_generator;
+REVOKE EXECUTE ON FUNCTION ensure_weather_partitions(TIMESTAMPTZ, TIMESTAMPTZ) FROM PUBLIC;
+REVOKE EXECUTE ON FUNCTION expire_weather_partitions(TIMESTAMPTZ) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION ensure_weather_partitions(TIMESTAMPTZ, TIMESTAMPTZ) TO data_generator;
+GRANT EXECUTE ON FUNCTION expire_weather_partitions(TIMESTAMPTZ) TO data_generator;
 
 -- Create web viewer user and set permissions
 CREATE ROLE web_viewer WITH LOGIN PASSWORD 'web_view_pass';
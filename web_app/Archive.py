@@ -0,0 +1,115 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from os import makedirs, replace
+from os.path import join, exists
+from datetime import datetime, date, timedelta, timezone
+from psycopg2.extensions import connection, cursor
+
+
+# Readings joined with sensor metadata, one compressed Parquet file per sensor and UTC day:
+#   <archive_dir>/sensor_id=<id>/date=<YYYY-MM-DD>.parquet
+ARCHIVE_SCHEMA: pa.Schema = pa.schema([
+    ('data_id', pa.int64()),
+    ('sensor_id', pa.int32()),
+    ('time_recorded', pa.timestamp('us', tz='UTC')),
+    ('temp_c', pa.float64()),
+    ('temp_f', pa.float64()),
+    ('wind_mph', pa.float64()),
+    ('wind_kph', pa.float64()),
+    ('wind_degree', pa.float64()),
+    ('wind_dir', pa.string()),
+    ('pressure_mb', pa.float64()),
+    ('pressure_in', pa.float64()),
+    ('precip_mm', pa.float64()),
+    ('precip_in', pa.float64()),
+    ('humidity_perc', pa.float64()),
+    ('uv_index_score', pa.float64()),
+    ('sensor_name', pa.string()),
+    ('sensor_locale', pa.string()),
+    ('sensor_region', pa.string()),
+    ('sensor_country', pa.string()),
+    ('sensor_lat', pa.float64()),
+    ('sensor_long', pa.float64()),
+    ('sensor_timezone', pa.string()),
+])
+
+# Small row groups let readers skip most of a day when only a few hours are wanted
+ARCHIVE_ROW_GROUP_SIZE: int = 2048
+
+
+def get_archive_path(archive_dir: str, sensor_id: int, day: date) -> str:
+    return join(archive_dir, f'sensor_id={sensor_id}', f'date={day.isoformat()}.parquet')
+
+
+def archive_closed_days(archive_conn: connection, archive_dir: str, archive_before: datetime) -> int:
+    archive_cursor: cursor = archive_conn.cursor()
+    archive_cursor.execute("SET TIME ZONE 'UTC'")
+
+    # Find every whole UTC day before the cutoff that still has raw readings
+    archive_cursor.execute(
+        "SELECT sensor_id, date_trunc('day', time_recorded)::date AS day_recorded FROM weather_data "
+        "WHERE time_recorded < date_trunc('day', %s::timestamptz) GROUP BY 1, 2 ORDER BY 2, 1",
+        (archive_before,)
+    )
+    closed_days: list[tuple[int, date]] = archive_cursor.fetchall()
+
+    # Export the days that are not archived yet
+    days_archived: int = 0
+    for sensor_id, day_recorded in closed_days:
+        archive_path: str = get_archive_path(archive_dir, sensor_id, day_recorded)
+        if exists(archive_path):
+            continue
+
+        day_start: datetime = datetime.combine(day_recorded, datetime.min.time(), tzinfo=timezone.utc)
+        archive_cursor.execute(
+            "SELECT w.data_id, w.sensor_id, w.time_recorded, w.temp_c, w.temp_f, w.wind_mph, w.wind_kph, "
+            "w.wind_degree, w.wind_dir, w.pressure_mb, w.pressure_in, w.precip_mm, w.precip_in, w.humidity_perc, "
+            "w.uv_index_score, s.sensor_name, s.sensor_locale, s.sensor_region, s.sensor_country, s.sensor_lat, "
+            "s.sensor_long, s.sensor_timezone "
+            "FROM weather_data AS w JOIN sensors AS s ON s.sensor_id = w.sensor_id "
+            "WHERE w.sensor_id = %s AND w.time_recorded >= %s AND w.time_recorded < %s ORDER BY w.time_recorded",
+            (sensor_id, day_start, day_start + timedelta(days=1))
+        )
+        day_rows: list[tuple] = archive_cursor.fetchall()
+        day_table: pa.Table = pa.Table.from_pylist(
+            [dict(zip(ARCHIVE_SCHEMA.names, day_row)) for day_row in day_rows], schema=ARCHIVE_SCHEMA
+        )
+
+        # Write to a temporary file first so readers never see a partial day
+        makedirs(join(archive_dir, f'sensor_id={sensor_id}'), exist_ok=True)
+        pq.write_table(
+            day_table, f'{archive_path}.tmp', compression='zstd', row_group_size=ARCHIVE_ROW_GROUP_SIZE
+        )
+        replace(f'{archive_path}.tmp', archive_path)
+        days_archived += 1
+
+    archive_conn.commit()
+    print(f'Archived {days_archived} sensor day(s) of weather data to {archive_dir}.')
+    return days_archived
+
+
+def read_archive(archive_dir: str, start_date_time: datetime, end_date_time: datetime, sensor_ids: list[int],
+                 columns: list[str]) -> pd.DataFrame:
+    # Only open the files of the wanted sensors and days
+    start_utc: datetime = start_date_time.astimezone(timezone.utc)
+    end_utc: datetime = end_date_time.astimezone(timezone.utc)
+    wanted_columns: list[str] = ['sensor_id', 'time_recorded'] + [
+        column for column in columns if column not in ('sensor_id', 'time_recorded')
+    ]
+    day_tables: list[pa.Table] = []
+    cur_day: date = start_utc.date()
+    while cur_day <= end_utc.date():
+        for sensor_id in sensor_ids:
+            archive_path: str = get_archive_path(archive_dir, sensor_id, cur_day)
+            if exists(archive_path):
+                # Memory-map the file, reading only the wanted columns and row groups that overlap the range
+                day_tables.append(pq.read_table(
+                    archive_path, columns=wanted_columns, memory_map=True,
+                    filters=[('time_recorded', '>=', start_utc), ('time_recorded', '<', end_utc)]
+                ))
+        cur_day += timedelta(days=1)
+
+    if not day_tables:
+        return pd.DataFrame(columns=wanted_columns)
+    return pa.concat_tables(day_tables).to_pandas()
@@ -0,0 +1,193 @@
+from argparse import ArgumentParser
+from os import environ, getenv
+from os.path import join
+from tempfile import TemporaryDirectory
+from io import StringIO
+from contextlib import redirect_stdout
+from subprocess import run
+from threading import Thread, Event, enumerate as enumerate_threads
+from time import perf_counter, sleep
+from datetime import datetime, timedelta, timezone
+from json import dumps
+from psycopg2.extensions import connection, cursor
+from MockWeatherApi import start_mock_server, REQUEST_COUNTS, REQUEST_COUNTS_LOCK
+
+
+# Offline benchmark of DataGen against MockWeatherApi.py and a local Postgres created from init.sql, e.g.
+#   python BenchmarkDataGen.py --db-port 8000 --db-password <data_generator password> --output bench.json
+# Every scenario registers its own bench_* sensors and deletes them again, leaving other data untouched.
+BENCH_SENSOR_PREFIX: str = 'sensor_bench_'
+
+
+def get_percentile(values: list[float], percentile: float) -> float:
+    if not values:
+        return 0.0
+    sorted_values: list[float] = sorted(values)
+    return sorted_values[min(len(sorted_values) - 1, int(percentile / 100 * len(sorted_values)))]
+
+
+def summarize_timings(timings: dict[str, list[float]]) -> dict[str, float]:
+    # Report milliseconds so results read the same at every scale
+    insert_seconds: list[float] = timings.get('insert', [])
+    lock_wait_seconds: list[float] = timings.get('lock_wait', [])
+    return {
+        'insert_count': len(insert_seconds),
+        'insert_p50_ms': get_percentile(insert_seconds, 50) * 1000,
+        'insert_p99_ms': get_percentile(insert_seconds, 99) * 1000,
+        'lock_wait_total_ms': sum(lock_wait_seconds) * 1000,
+        'lock_wait_p99_ms': get_percentile(lock_wait_seconds, 99) * 1000,
+    }
+
+
+def count_bench_rows(bench_conn: connection) -> int:
+    bench_cursor: cursor = bench_conn.cursor()
+    bench_cursor.execute(
+        "SELECT COUNT(*) FROM weather_data AS w JOIN sensors AS s ON s.sensor_id = w.sensor_id "
+        "WHERE s.sensor_name LIKE %s", (f'{BENCH_SENSOR_PREFIX}%',)
+    )
+    row_count: int = bench_cursor.fetchone()[0]
+    bench_conn.commit()
+    return row_count
+
+
+def remove_bench_sensors(bench_conn: connection) -> None:
+    # Children first, since every table references sensors
+    bench_cursor: cursor = bench_conn.cursor()
+    sensor_filter: str = 'sensor_id IN (SELECT sensor_id FROM sensors WHERE sensor_name LIKE %s)'
+    for table_name in ('wind_dir_rollups', 'weather_rollups', 'backfill_days', 'weather_data'):
+        bench_cursor.execute(f'DELETE FROM {table_name} WHERE {sensor_filter}', (f'{BENCH_SENSOR_PREFIX}%',))
+    bench_cursor.execute('DELETE FROM sensors WHERE sensor_name LIKE %s', (f'{BENCH_SENSOR_PREFIX}%',))
+    bench_conn.commit()
+
+
+def run_scenario(data_gen, location_count: int, geo_cache_dir: str, args) -> dict:
+    # Point DataGen at this scenario's locations; its functions read these globals on every call. Every scenario
+    # starts from its own empty geo cache, so registration is equally cold and the real cache is never touched
+    data_gen.LOCATION_SET = [f'Bench {location_index:04d}' for location_index in range(location_count)]
+    data_gen.GEO_CACHE_PATH = join(geo_cache_dir, f'locations_{location_count}.json')
+    data_gen.HISTORICAL_DAYS = args.historical_days
+    data_gen.INGESTION_MODE = args.ingestion_mode
+    data_gen.UPDATE_INTERVAL_SECONDS = args.update_interval_seconds
+    data_gen.HISTORICAL_REQUESTS_PER_SECOND = 0
+    data_gen.RAW_RETENTION_DAYS = 0
+    data_gen.SPOOL_READINGS = 'no'
+
+    bench_conn: connection = data_gen.connect_data_generator()
+    remove_bench_sensors(bench_conn)
+    data_gen.maintain_partitions(bench_conn, datetime.now(timezone.utc) - timedelta(days=args.historical_days + 1))
+    with REQUEST_COUNTS_LOCK:
+        REQUEST_COUNTS.clear()
+
+    # Backfill, including the fixed start-up pause in create_historical_data
+    data_gen.INGEST_TIMINGS = {}
+    backfill_start: float = perf_counter()
+    data_gen.create_historical_data()
+    backfill_seconds: float = perf_counter() - backfill_start
+    backfill_rows: int = count_bench_rows(bench_conn)
+    backfill_timings: dict[str, list[float]] = data_gen.INGEST_TIMINGS
+
+    # Live ingestion for a fixed window, then wait for every ingestion thread to drain and exit
+    data_gen.INGEST_TIMINGS = {}
+    threads_before: set[Thread] = set(enumerate_threads())
+    live_stop_event: Event = Event()
+    live_start: float = perf_counter()
+    data_gen.start_sensor_threads(live_stop_event)
+    sleep(args.live_seconds)
+    live_stop_event.set()
+    for live_thread in set(enumerate_threads()) - threads_before:
+        # Daemon threads such as a metrics server run until the process exits
+        if not live_thread.daemon:
+            live_thread.join()
+    live_seconds: float = perf_counter() - live_start
+    live_rows: int = count_bench_rows(bench_conn) - backfill_rows
+    live_timings: dict[str, list[float]] = data_gen.INGEST_TIMINGS
+    data_gen.INGEST_TIMINGS = None
+
+    with REQUEST_COUNTS_LOCK:
+        api_requests: dict[str, int] = dict(REQUEST_COUNTS)
+    if not args.keep_data:
+        remove_bench_sensors(bench_conn)
+    bench_conn.close()
+
+    return {
+        'locations': location_count,
+        'backfill': {
+            'wall_seconds': backfill_seconds, 'rows': backfill_rows,
+            'rows_per_second': backfill_rows / backfill_seconds, **summarize_timings(backfill_timings)
+        },
+        'live': {
+            'wall_seconds': live_seconds, 'rows': live_rows,
+            'rows_per_second': live_rows / live_seconds, **summarize_timings(live_timings)
+        },
+        'api_requests': api_requests,
+    }
+
+
+def get_commit() -> str:
+    git_result = run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True)
+    return git_result.stdout.strip() if git_result.returncode == 0 else 'unknown'
+
+
+if __name__ == '__main__':
+    arg_parser: ArgumentParser = ArgumentParser(description='Benchmark DataGen against the mock weather API.')
+    arg_parser.add_argument('--locations', type=int, nargs='+', default=[10, 100, 1000])
+    arg_parser.add_argument('--ingestion-mode', choices=['threads', 'asyncio', 'bulk'], default='threads')
+    arg_parser.add_argument('--historical-days', type=int, default=2)
+    arg_parser.add_argument('--live-seconds', type=float, default=30.0)
+    arg_parser.add_argument('--update-interval-seconds', type=float, default=2.0)
+    arg_parser.add_argument('--latency-ms', type=float, default=50.0)
+    arg_parser.add_argument('--jitter-ms', type=float, default=15.0)
+    arg_parser.add_argument('--mock-port', type=int, default=8090)
+    arg_parser.add_argument('--db-host', default='localhost')
+    arg_parser.add_argument('--db-port', type=int, default=8000)
+    arg_parser.add_argument('--db-name', default='postgres')
+    arg_parser.add_argument('--db-user', default='data_generator')
+    arg_parser.add_argument('--db-password', default=getenv('PGPASSWORD', ''))
+    arg_parser.add_argument('--output', default=None, help='Also write the JSON results to this file')
+    arg_parser.add_argument('--keep-data', action='store_true', help='Leave the bench sensors in the database')
+    arg_parser.add_argument('--verbose', action='store_true', help='Show DataGen output')
+    args = arg_parser.parse_args()
+    bench_started_at: str = datetime.now(timezone.utc).isoformat()
+
+    # Live readings refresh every second on the mock so each poll can store a new row
+    mock_server = start_mock_server(
+        '127.0.0.1', args.mock_port, args.latency_ms / 1000, args.jitter_ms / 1000, refresh_seconds=1
+    )
+    Thread(name='mock_weather_api', target=mock_server.serve_forever, daemon=True).start()
+
+    # DataGen reads these while importing
+    environ['WEATHER_API_BASE_URL'] = f'http://127.0.0.1:{args.mock_port}/v1'
+    environ['WEATHER_API_KEY'] = 'benchmark'
+    environ['DATA_GEN_DB_HOST'] = args.db_host
+    environ['DATA_GEN_DB_PORT'] = str(args.db_port)
+    environ['DATA_GEN_DB_NAME'] = args.db_name
+    environ['DATA_GEN_DB_USER'] = args.db_user
+    environ['DATA_GEN_DB_PASSWORD'] = args.db_password
+    import DataGen
+
+    scenario_results: list[dict] = []
+    with TemporaryDirectory(prefix='bench_geo_cache_') as bench_geo_cache_dir:
+        for scenario_locations in args.locations:
+            if args.verbose:
+                scenario_results.append(run_scenario(DataGen, scenario_locations, bench_geo_cache_dir, args))
+            else:
+                with redirect_stdout(StringIO()):
+                    scenario_results.append(run_scenario(DataGen, scenario_locations, bench_geo_cache_dir, args))
+            print(f'Finished {scenario_locations} location(s).')
+
+    mock_server.shutdown()
+    bench_results: dict = {
+        'commit': get_commit(),
+        'started_at': bench_started_at,
+        'settings': {
+            'ingestion_mode': args.ingestion_mode, 'historical_days': args.historical_days,
+            'live_seconds': args.live_seconds, 'update_interval_seconds': args.update_interval_seconds,
+            'latency_ms': args.latency_ms, 'jitter_ms': args.jitter_ms,
+            'historical_worker_count': DataGen.HISTORICAL_WORKER_COUNT,
+        },
+        'scenarios': scenario_results,
+    }
+    print(dumps(bench_results, indent=2))
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.write(dumps(bench_results, indent=2))
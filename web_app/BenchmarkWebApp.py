@@ -0,0 +1,234 @@
+from argparse import ArgumentParser
+from os import environ, getenv
+from threading import Lock
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+from datetime import datetime, timedelta, timezone
+from json import dumps
+import tracemalloc
+import pandas as pd
+from psycopg2.extensions import connection, cursor
+from BenchmarkDataGen import BENCH_SENSOR_PREFIX, get_percentile, remove_bench_sensors, get_commit
+from MockWeatherApi import get_location_info, get_weather_info
+
+
+# Headless load test of the dashboard tabs against a seeded local Postgres created from init.sql, e.g.
+#   python BenchmarkWebApp.py --db-port 8000 --db-password <data_generator password> \
+#       --web-password <web_viewer password> --sensors 50 --days 30 --interval-minutes 15 --sessions 10
+# Seeded sensors use the sensor_bench_ prefix and are deleted afterwards. The "All" selections also include any
+# other sensors in the database, so use a dedicated database for comparable numbers.
+
+# Tab scenarios: the tab function, the radio choosing all or selected locations, that tab's location multiselect,
+# and any other radio choices to set
+TAB_SCENARIOS: dict[str, tuple[str, str, str, dict[str, list[str]]]] = {
+    'sensor_info': ('create_sensor_info_tab', '', '', {}),
+    'historical': (
+        'create_historical_tab', 'all_or_selected_hist', 'location_options_hist',
+        {'date_range_choice_hist': ['Last 24 hours', 'Last 7 days', 'Last 30 days']}
+    ),
+    'latest_weather': ('create_latest_weather_tab', 'all_or_selected_latest', 'location_options_latest', {}),
+}
+
+# Database reads made by WebApp.read_query, which only runs on a cache miss
+QUERY_STATS: dict[str, int] = {'queries': 0, 'rows': 0, 'bytes': 0}
+QUERY_STATS_LOCK: Lock = Lock()
+
+
+def seed_database(data_gen, sensor_count: int, days: int, interval_minutes: int) -> None:
+    # Register bench sensors directly and write generated readings through DataGen's batch insert path
+    seed_conn: connection = data_gen.connect_data_generator()
+    remove_bench_sensors(seed_conn)
+    now: datetime = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+    data_gen.maintain_partitions(seed_conn, now - timedelta(days=days + 1))
+
+    seed_cursor: cursor = seed_conn.cursor()
+    for sensor_index in range(sensor_count):
+        location_info: dict = get_location_info(f'Bench Web {sensor_index:04d}')
+        seed_cursor.execute(
+            "INSERT INTO sensors (sensor_name, sensor_locale, sensor_region, sensor_country, sensor_lat, "
+            "sensor_long, sensor_timezone) VALUES (%s, %s, %s, %s, %s, %s, %s) RETURNING sensor_id",
+            (f'{BENCH_SENSOR_PREFIX}web_{sensor_index:04d}', location_info['name'], location_info['region'],
+             location_info['country'], location_info['lat'], location_info['lon'], location_info['tz_id'])
+        )
+        sensor_id: int = seed_cursor.fetchone()[0]
+        seed_conn.commit()
+
+        # One transaction per sensor and day keeps rollup refreshes small
+        for day_index in range(days):
+            day_start: datetime = now - timedelta(days=days - day_index)
+            data_rows: list[tuple] = [
+                data_gen.get_weather_data_params(
+                    sensor_id, reading_time, get_weather_info(location_info['name'], reading_time)
+                )
+                for reading_time in (
+                    day_start + timedelta(minutes=minute) for minute in range(0, 24 * 60, interval_minutes)
+                )
+            ]
+            data_gen.add_sensor_data_entries(seed_conn, data_rows, Lock(), 'benchmark_seed')
+
+    seed_conn.close()
+
+
+def count_read_query(read_query):
+    def counted_read_query(conn_string: str, query: str, params: dict = None) -> pd.DataFrame:
+        query_df: pd.DataFrame = read_query(conn_string, query, params)
+        with QUERY_STATS_LOCK:
+            QUERY_STATS['queries'] += 1
+            QUERY_STATS['rows'] += len(query_df)
+            QUERY_STATS['bytes'] += int(query_df.memory_usage(deep=True).sum())
+        return query_df
+    return counted_read_query
+
+
+def start_session(app_test_class, tab_function: str, conn_string: str, location_radio: str, location_select: str,
+                  selection_mode: str, selected_count: int, radio_choices: dict[str, str]):
+    # Render the tab once with its defaults, then apply the scenario's selections
+    app_test = app_test_class.from_string(
+        f'import WebApp\nWebApp.{tab_function}({conn_string!r})\n', default_timeout=120
+    )
+    app_test.run()
+    if selection_mode == 'selected':
+        app_test.radio(key=location_radio).set_value('Selected Options').run()
+        location_options: list[str] = list(app_test.multiselect(key=location_select).options)
+        app_test.multiselect(key=location_select).set_value(location_options[:selected_count])
+    for radio_key, radio_choice in radio_choices.items():
+        app_test.radio(key=radio_key).set_value(radio_choice)
+    app_test.run()
+    return app_test
+
+
+def timed_rerun(app_test) -> float:
+    rerun_start: float = perf_counter()
+    app_test.run()
+    if app_test.exception:
+        raise RuntimeError(f'Dashboard rerun failed: {app_test.exception[0].message}')
+    return perf_counter() - rerun_start
+
+
+def run_scenario(app_test_class, clear_caches, scenario_name: str, selection_mode: str,
+                 radio_choices: dict[str, str], conn_string: str, args) -> dict:
+    tab_function, location_radio, location_select, _ = TAB_SCENARIOS[scenario_name]
+
+    # Start from empty caches so the first rerun shows the cold cost
+    clear_caches()
+    sessions: list = [
+        start_session(
+            app_test_class, tab_function, conn_string, location_radio, location_select, selection_mode,
+            args.selected_count, radio_choices
+        )
+        for _ in range(args.sessions)
+    ]
+    clear_caches()
+
+    # Rerun every session at once, like a view's refresh tick, and attribute the round's reads evenly
+    rerun_results: list[dict] = []
+    with ThreadPoolExecutor(max_workers=args.sessions) as executor:
+        for rerun_index in range(args.reruns):
+            with QUERY_STATS_LOCK:
+                QUERY_STATS.update(queries=0, rows=0, bytes=0)
+            tracemalloc.reset_peak()
+            render_seconds: list[float] = list(executor.map(timed_rerun, sessions))
+            peak_bytes: int = tracemalloc.get_traced_memory()[1]
+            with QUERY_STATS_LOCK:
+                round_stats: dict[str, int] = dict(QUERY_STATS)
+            rerun_results.append({
+                'rerun': rerun_index,
+                'render_p50_ms': get_percentile(render_seconds, 50) * 1000,
+                'render_max_ms': max(render_seconds) * 1000,
+                'queries_per_rerun': round_stats['queries'] / args.sessions,
+                'rows_per_rerun': round_stats['rows'] / args.sessions,
+                'bytes_per_rerun': round_stats['bytes'] / args.sessions,
+                'round_peak_memory_mb': peak_bytes / 2 ** 20,
+            })
+
+    return {
+        'tab': scenario_name, 'selection_mode': selection_mode, 'choices': radio_choices, 'reruns': rerun_results
+    }
+
+
+if __name__ == '__main__':
+    arg_parser: ArgumentParser = ArgumentParser(description='Load test the dashboard tabs headlessly.')
+    arg_parser.add_argument('--sensors', type=int, default=20)
+    arg_parser.add_argument('--days', type=int, default=7)
+    arg_parser.add_argument('--interval-minutes', type=int, default=15)
+    arg_parser.add_argument('--sessions', type=int, default=5)
+    arg_parser.add_argument('--reruns', type=int, default=3)
+    arg_parser.add_argument('--selected-count', type=int, default=3)
+    arg_parser.add_argument('--tabs', nargs='+', choices=list(TAB_SCENARIOS), default=list(TAB_SCENARIOS))
+    arg_parser.add_argument('--db-host', default='localhost')
+    arg_parser.add_argument('--db-port', type=int, default=8000)
+    arg_parser.add_argument('--db-name', default='postgres')
+    arg_parser.add_argument('--db-user', default='data_generator')
+    arg_parser.add_argument('--db-password', default=getenv('PGPASSWORD', ''))
+    arg_parser.add_argument('--web-user', default='web_viewer')
+    arg_parser.add_argument('--web-password', default='')
+    arg_parser.add_argument('--skip-seed', action='store_true', help='Reuse bench sensors from a --keep-data run')
+    arg_parser.add_argument('--keep-data', action='store_true', help='Leave the bench sensors in the database')
+    arg_parser.add_argument('--output', default=None, help='Also write the JSON results to this file')
+    args = arg_parser.parse_args()
+    bench_started_at: str = datetime.now(timezone.utc).isoformat()
+
+    # DataGen reads these while importing
+    environ['WEATHER_API_KEY'] = 'benchmark'
+    environ['DATA_GEN_DB_HOST'] = args.db_host
+    environ['DATA_GEN_DB_PORT'] = str(args.db_port)
+    environ['DATA_GEN_DB_NAME'] = args.db_name
+    environ['DATA_GEN_DB_USER'] = args.db_user
+    environ['DATA_GEN_DB_PASSWORD'] = args.db_password
+    import DataGen
+    import WebApp
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+
+    # Seed without expiring or archiving anything
+    DataGen.RAW_RETENTION_DAYS = 0
+    if not args.skip_seed:
+        seed_start: float = perf_counter()
+        seed_database(DataGen, args.sensors, args.days, args.interval_minutes)
+        print(f'Seeded {args.sensors} sensor(s) over {args.days} day(s) in {perf_counter() - seed_start:.1f} seconds.')
+
+    # Empty the query cache and the rolling windows between scenarios
+    def clear_caches() -> None:
+        st.cache_data.clear()
+        WebApp.get_rolling_windows.clear()
+
+    # Count reads below the caches, so only queries that reach the database are counted
+    WebApp.read_query = count_read_query(WebApp.read_query)
+    web_string: str = (
+        f'postgresql+pg8000://{args.web_user}:{args.web_password}@{args.db_host}:{args.db_port}/{args.db_name}'
+    )
+
+    tracemalloc.start()
+    scenario_results: list[dict] = []
+    for tab_name in args.tabs:
+        _, tab_location_radio, _, tab_radio_options = TAB_SCENARIOS[tab_name]
+        choice_sets: list[dict[str, str]] = [{}]
+        for radio_key, radio_options in tab_radio_options.items():
+            choice_sets = [choice_set | {radio_key: radio_option}
+                           for choice_set in choice_sets for radio_option in radio_options]
+        for tab_selection_mode in (['all', 'selected'] if tab_location_radio else ['all']):
+            for choice_set in choice_sets:
+                scenario_results.append(run_scenario(
+                    AppTest, clear_caches, tab_name, tab_selection_mode, choice_set, web_string, args
+                ))
+                print(f'Finished {tab_name} ({tab_selection_mode}, {choice_set or "defaults"}).')
+    tracemalloc.stop()
+
+    if not args.keep_data:
+        cleanup_conn: connection = DataGen.connect_data_generator()
+        remove_bench_sensors(cleanup_conn)
+        cleanup_conn.close()
+
+    bench_results: dict = {
+        'commit': get_commit(),
+        'started_at': bench_started_at,
+        'settings': {
+            'sensors': args.sensors, 'days': args.days, 'interval_minutes': args.interval_minutes,
+            'sessions': args.sessions, 'reruns': args.reruns, 'selected_count': args.selected_count,
+        },
+        'scenarios': scenario_results,
+    }
+    print(dumps(bench_results, indent=2))
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.write(dumps(bench_results, indent=2))
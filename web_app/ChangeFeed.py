@@ -0,0 +1,177 @@
+from threading import Thread, Event, Lock
+from select import select
+from json import dumps, loads
+from datetime import datetime
+from typing import Union, Callable
+
+
+# Postgres LISTEN/NOTIFY feed of newly written readings. DataGen publishes each written sensor's newest observation
+# time inside the inserting transaction, so listeners hear of it exactly when it commits, and WebApp keeps one
+# ReadingHub per server process holding every sensor's latest reading.
+CHANGE_FEED_CHANNEL: str = 'weather_readings'
+
+# Notification payloads are limited to 8000 bytes, which fits a little over 200 sensors; keep some headroom
+SENSORS_PER_NOTIFICATION: int = 150
+
+# How long the listener waits for a notification before checking whether it should stop
+LISTEN_WAIT_SECONDS: float = 5.0
+RECONNECT_SECONDS: float = 5.0
+
+# One backward probe of the (sensor_id, time_recorded) index per sensor, so a notified sensor costs one row read
+LATEST_READINGS_QUERY: str = (
+    "SELECT s.sensor_locale, w.* FROM sensors AS s "
+    "CROSS JOIN LATERAL (SELECT * FROM weather_data AS l WHERE l.sensor_id = s.sensor_id "
+    "ORDER BY l.time_recorded DESC LIMIT 1) AS w "
+    "WHERE %(all_sensors)s OR s.sensor_id = ANY(%(sensor_ids)s)"
+)
+
+
+def notify_readings(sensor_cursor, written_rows: list[tuple]) -> None:
+    # Publish the newest observation time of every sensor in written_rows, given as (sensor_id, time_recorded)
+    newest_times: dict[int, datetime] = {}
+    for sensor_id, time_recorded in written_rows:
+        if sensor_id not in newest_times or time_recorded > newest_times[sensor_id]:
+            newest_times[sensor_id] = time_recorded
+    if not newest_times:
+        return
+
+    newest_items: list[tuple[int, datetime]] = list(newest_times.items())
+    payloads: list[str] = [
+        dumps({
+            str(sensor_id): time_recorded.isoformat()
+            for sensor_id, time_recorded in newest_items[item_index:item_index + SENSORS_PER_NOTIFICATION]
+        })
+        for item_index in range(0, len(newest_items), SENSORS_PER_NOTIFICATION)
+    ]
+    sensor_cursor.execute(
+        'SELECT pg_notify(%s, payload) FROM unnest(%s::TEXT[]) AS payload', (CHANGE_FEED_CHANNEL, payloads)
+    )
+
+
+class ReadingHub:
+    def __init__(self, connect_params: dict, on_new_sensors: Union[Callable[[], None], None] = None) -> None:
+        # Latest reading per sensor id, kept current by a single listening connection
+        self.connect_params: dict = connect_params
+        self.on_new_sensors: Union[Callable[[], None], None] = on_new_sensors
+        self.latest_readings: dict[int, dict] = {}
+
+        # Bumped on every change; readers compare versions to learn whether a sensor changed since they last looked.
+        # Everything counts as changed after a (re)load, since notifications may have been missed while disconnected
+        self.version: int = 0
+        self.loaded_version: int = 0
+        self.changed_versions: dict[int, int] = {}
+
+        self.hub_lock: Lock = Lock()
+        self.ready: Event = Event()
+        self.stop_event: Event = Event()
+
+    def start(self) -> None:
+        # Listen from a daemon thread so the hub never keeps the server alive
+        Thread(name='reading_hub', target=self.listen, daemon=True).start()
+
+    def store_readings(self, listen_cursor, all_sensors: bool, sensor_ids: list[int]) -> None:
+        listen_cursor.execute(LATEST_READINGS_QUERY, {'all_sensors': all_sensors, 'sensor_ids': sensor_ids})
+        column_names: list[str] = [column[0] for column in listen_cursor.description]
+        new_readings: dict[int, dict] = {
+            reading['sensor_id']: reading
+            for reading in (dict(zip(column_names, reading_row)) for reading_row in listen_cursor.fetchall())
+        }
+        with self.hub_lock:
+            if all_sensors:
+                self.latest_readings = new_readings
+            else:
+                self.latest_readings.update(new_readings)
+
+    def apply_notifications(self, listen_cursor, payloads: list[str]) -> None:
+        # Any role may notify on the channel, so skip payloads that are not ours instead of failing on them
+        notified_times: dict[int, datetime] = {}
+        for payload in payloads:
+            try:
+                payload_times: dict[int, datetime] = {
+                    int(sensor_id): datetime.fromisoformat(time_recorded)
+                    for sensor_id, time_recorded in loads(payload).items()
+                }
+            except (ValueError, TypeError, AttributeError):
+                print(f'Ignoring malformed {CHANGE_FEED_CHANNEL} notification: {payload[:100]!r}')
+                continue
+            for sensor_id, time_recorded in payload_times.items():
+                if sensor_id not in notified_times or time_recorded > notified_times[sensor_id]:
+                    notified_times[sensor_id] = time_recorded
+
+        # Only re-read sensors whose notified reading is newer than the one held; backfilled days still count as a
+        # change for readers of past ranges
+        with self.hub_lock:
+            new_sensor: bool = any(sensor_id not in self.latest_readings for sensor_id in notified_times)
+            stale_sensor_ids: list[int] = [
+                sensor_id for sensor_id, time_recorded in notified_times.items()
+                if sensor_id not in self.latest_readings
+                or time_recorded > self.latest_readings[sensor_id]['time_recorded']
+            ]
+        if stale_sensor_ids:
+            self.store_readings(listen_cursor, False, stale_sensor_ids)
+
+        with self.hub_lock:
+            self.version += 1
+            for sensor_id in notified_times:
+                self.changed_versions[sensor_id] = self.version
+        if new_sensor and self.on_new_sensors is not None:
+            self.on_new_sensors()
+
+    def listen(self) -> None:
+        # Only the listener needs psycopg2, so it stays out of the dashboard's imports
+        from psycopg2 import connect, OperationalError, InterfaceError
+
+        while not self.stop_event.is_set():
+            listen_conn = None
+            try:
+                listen_conn = connect(**self.connect_params)
+                listen_conn.autocommit = True
+                listen_cursor = listen_conn.cursor()
+
+                # Listen before loading so nothing written in between is missed
+                listen_cursor.execute(f'LISTEN {CHANGE_FEED_CHANNEL}')
+                self.store_readings(listen_cursor, True, [])
+                with self.hub_lock:
+                    self.version += 1
+                    self.loaded_version = self.version
+                self.ready.set()
+                print(f'Listening for new readings on {CHANGE_FEED_CHANNEL}.')
+
+                while not self.stop_event.is_set():
+                    if not select([listen_conn], [], [], LISTEN_WAIT_SECONDS)[0]:
+                        continue
+                    listen_conn.poll()
+                    payloads: list[str] = [notification.payload for notification in listen_conn.notifies]
+                    listen_conn.notifies.clear()
+                    if payloads:
+                        self.apply_notifications(listen_cursor, payloads)
+            except (OperationalError, InterfaceError) as feed_error:
+                print(f'Reading feed disconnected, retrying in {RECONNECT_SECONDS} seconds: {feed_error}')
+                self.stop_event.wait(RECONNECT_SECONDS)
+            except Exception as feed_error:
+                # Anything else must not end the listener either, or readers would trust a frozen hub
+                print(f'Reading feed failed, reconnecting in {RECONNECT_SECONDS} seconds: {feed_error!r}')
+                self.stop_event.wait(RECONNECT_SECONDS)
+            finally:
+                # Readers fall back to querying until the feed is back
+                self.ready.clear()
+                if listen_conn is not None:
+                    listen_conn.close()
+
+    def changed_since(self, version: int, sensor_ids: list[int]) -> bool:
+        # Assume a change whenever the hub cannot vouch for the sensors
+        with self.hub_lock:
+            if not self.ready.is_set() or version < self.loaded_version:
+                return True
+            return any(self.changed_versions.get(sensor_id, 0) > version for sensor_id in sensor_ids)
+
+    def get_latest_readings(self, sensor_locales: list[str], all_sensors: bool) -> Union[list[dict], None]:
+        # Return None when the hub has nothing to vouch for, so callers fall back to querying
+        wanted_locales: set[str] = set(sensor_locales)
+        with self.hub_lock:
+            if not self.ready.is_set() or not self.latest_readings:
+                return None
+            return [
+                reading for reading in self.latest_readings.values()
+                if all_sensors or reading['sensor_locale'] in wanted_locales
+            ]
@@ -0,0 +1,151 @@
+from tomllib import load
+from os.path import getmtime
+from threading import Lock
+from typing import Union
+
+
+# Shared loader for start_config.toml. Each role validates only the settings it reads, so the dashboard starts
+# without the ingestion secrets or modules, and the file is parsed once per process unless it changes on disk.
+CONFIG_PATH: str = 'start_config.toml'
+
+# Settings read by each role, with the types each may have
+ROLE_SETTINGS: dict[str, dict[str, tuple[type, ...]]] = {
+    'ingest': {
+        'location_set': (list,),
+        'get_air_quality': (str,),
+        'reset_database': (str,),
+        'get_historical_data': (str,),
+        'sensor_interval_seconds': (int, float),
+        'update_interval_seconds': (int, float),
+        'ingestion_mode': (str,),
+        'bulk_batch_size': (int,),
+        'ingest_queue_size': (int,),
+        'ingest_queue_policy': (str,),
+        'ingest_batch_size': (int,),
+        'ingest_batch_wait_seconds': (int, float),
+        'async_db_pool_size': (int,),
+        'async_http_connections': (int,),
+        'historical_days': (int,),
+        'historical_batch_days': (int,),
+        'historical_worker_count': (int,),
+        'historical_requests_per_second': (int, float),
+        'partition_weeks_ahead': (int,),
+        'partition_maintenance_seconds': (int, float),
+        'raw_retention_days': (int,),
+        'archive_readings': (str,),
+        'archive_dir': (str,),
+        'spool_readings': (str,),
+        'spool_path': (str,),
+        'spool_sync_writes': (str,),
+        'spool_batch_size': (int,),
+        'spool_replay_seconds': (int, float),
+        'metrics_host': (str,),
+        'metrics_port': (int,),
+        'geo_cache_path': (str,),
+        'geo_lookup_workers': (int,),
+        'config_reload_seconds': (int, float),
+        'change_feed': (str,),
+    },
+    'web': {
+        'update_interval_seconds': (int, float),
+        'sensor_cache_ttl_seconds': (int, float),
+        'query_cache_max_entries': (int,),
+        'chart_max_points': (int,),
+        'archive_readings': (str,),
+        'archive_dir': (str,),
+        'render_profiler': (str,),
+        'render_profile_log': (str,),
+        'delta_refresh': (str,),
+        'delta_full_reload_seconds': (int, float),
+        'rolling_window_max_rows': (int,),
+        'change_feed': (str,),
+        'history_refresh_seconds': (int, float),
+    },
+}
+
+# Allowed values for settings that pick one of a few options
+SETTING_CHOICES: dict[str, tuple[str, ...]] = {
+    'get_air_quality': ('yes', 'no'),
+    'reset_database': ('yes', 'no'),
+    'get_historical_data': ('yes', 'no'),
+    'ingestion_mode': ('threads', 'asyncio', 'bulk'),
+    'ingest_queue_policy': ('block', 'drop_oldest', 'drop_newest'),
+    'archive_readings': ('yes', 'no'),
+    'spool_readings': ('yes', 'no'),
+    'spool_sync_writes': ('yes', 'no'),
+    'render_profiler': ('yes', 'no'),
+    'delta_refresh': ('yes', 'no'),
+    'change_feed': ('yes', 'no'),
+}
+
+# Settings that take effect without a restart when the file changes
+HOT_RELOAD_SETTINGS: tuple[str, ...] = ('location_set', 'sensor_interval_seconds', 'update_interval_seconds')
+
+# Validated settings and the file modification time they were read at, by role
+ROLE_CONFIGS: dict[str, dict] = {}
+ROLE_CONFIG_MTIMES: dict[str, float] = {}
+ROLE_CONFIGS_LOCK: Lock = Lock()
+
+
+def validate_config(raw_config: dict, role: str) -> dict:
+    role_config: dict = {}
+    for setting_name, setting_types in ROLE_SETTINGS[role].items():
+        if setting_name not in raw_config:
+            raise ValueError(f'{CONFIG_PATH} is missing {setting_name}.')
+
+        # Booleans are ints to Python, but never a valid count or interval here
+        setting_value = raw_config[setting_name]
+        if isinstance(setting_value, bool) or not isinstance(setting_value, setting_types):
+            raise ValueError(
+                f'{setting_name} in {CONFIG_PATH} must be {" or ".join(t.__name__ for t in setting_types)}, '
+                f'not {type(setting_value).__name__}.'
+            )
+        if setting_name in SETTING_CHOICES and setting_value not in SETTING_CHOICES[setting_name]:
+            raise ValueError(
+                f'{setting_name} in {CONFIG_PATH} must be one of {", ".join(SETTING_CHOICES[setting_name])}.'
+            )
+        role_config[setting_name] = setting_value
+
+    return role_config
+
+
+def read_config(role: str) -> tuple[dict, float]:
+    config_mtime: float = getmtime(CONFIG_PATH)
+    with open(CONFIG_PATH, 'rb') as config_file:
+        return validate_config(load(config_file), role), config_mtime
+
+
+def get_config(role: str) -> dict:
+    # Load and validate a role's settings on first use
+    with ROLE_CONFIGS_LOCK:
+        if role not in ROLE_CONFIGS:
+            ROLE_CONFIGS[role], ROLE_CONFIG_MTIMES[role] = read_config(role)
+        return ROLE_CONFIGS[role]
+
+
+def reload_config(role: str) -> dict:
+    # Re-read the file only when it changed, returning the hot-reloadable settings whose values changed
+    role_config: dict = get_config(role)
+    if getmtime(CONFIG_PATH) == ROLE_CONFIG_MTIMES[role]:
+        return {}
+
+    try:
+        new_config, new_mtime = read_config(role)
+    except (ValueError, OSError) as config_error:
+        # Keep running on the last good settings until the file is fixed
+        print(f'Ignoring changes to {CONFIG_PATH}: {config_error}')
+        ROLE_CONFIG_MTIMES[role] = getmtime(CONFIG_PATH)
+        return {}
+
+    changed_settings: dict = {
+        setting_name: new_config[setting_name] for setting_name in HOT_RELOAD_SETTINGS
+        if setting_name in role_config and new_config[setting_name] != role_config[setting_name]
+    }
+    with ROLE_CONFIGS_LOCK:
+        role_config.update(changed_settings)
+        ROLE_CONFIG_MTIMES[role] = new_mtime
+    return changed_settings
+
+
+def get_setting(role: str, setting_name: str) -> Union[str, int, float, list]:
+    return get_config(role)[setting_name]
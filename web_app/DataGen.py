@@ -1,21 +1,36 @@
-from requests import get
-from os import getenv
-from tomllib import load
-from threading import Thread, Event, Lock, current_thread
-from typing import Literal, Union
-from time import sleep
-from datetime import datetime, timedelta
+from requests import get, Session, RequestException
+from requests.adapters import HTTPAdapter
+from aiohttp import ClientSession, TCPConnector
+from os import getenv, makedirs, replace
+from os.path import exists, dirname
+from json import load as load_json, dump as dump_json
+from heapq import heappush, heappop
+import asyncio
+from threading import Thread, Event, Lock, current_thread, local
+from queue import Queue, Full, Empty
+from typing import Literal, Union, Callable
+from time import sleep, perf_counter, monotonic
+from datetime import datetime, date, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 from copy import deepcopy
-from psycopg2 import connect
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from psycopg2 import connect, OperationalError, InterfaceError, IntegrityError, DataError, DatabaseError
 from psycopg2.extensions import connection, cursor
+from psycopg2.extras import execute_values
+from psycopg2.pool import ThreadedConnectionPool
+from Archive import archive_closed_days
+from Spool import ReadingSpool
+from Metrics import Counter, Gauge, Histogram, start_metrics_server
+from ChangeFeed import notify_readings
+from Config import get_config, reload_config
 
 
 # API Key
-API_KEY: str = open('API_KEY.txt').read()  # API key because no hardcoding
+API_KEY: str = getenv('WEATHER_API_KEY') or open('API_KEY.txt').read()  # API key because no hardcoding
 
 # Retrieve configuration
-with open('start_config.toml', 'rb') as config_file:
-    config = load(config_file)
+config: dict = get_config('ingest')
 
 # Get API parameters
 LOCATION_SET: set[str] = config['location_set']
@@ -26,113 +41,726 @@ RESET_DATABASE: Literal['yes', 'no'] = config['reset_database']
 GET_HISTORICAL_DATA: Literal['yes', 'no'] = config['get_historical_data']
 SENSOR_INTERVAL_SECONDS: float = config['sensor_interval_seconds']
 UPDATE_INTERVAL_SECONDS: float = config['update_interval_seconds']
+INGESTION_MODE: Literal['threads', 'asyncio', 'bulk'] = config['ingestion_mode']
+BULK_BATCH_SIZE: int = config['bulk_batch_size']
+INGEST_QUEUE_SIZE: int = config['ingest_queue_size']
+INGEST_QUEUE_POLICY: Literal['block', 'drop_oldest', 'drop_newest'] = config['ingest_queue_policy']
+INGEST_BATCH_SIZE: int = config['ingest_batch_size']
+INGEST_BATCH_WAIT_SECONDS: float = config['ingest_batch_wait_seconds']
+ASYNC_DB_POOL_SIZE: int = config['async_db_pool_size']
+ASYNC_HTTP_CONNECTIONS: int = config['async_http_connections']
+HISTORICAL_DAYS: int = config['historical_days']
+HISTORICAL_BATCH_DAYS: int = config['historical_batch_days']
+HISTORICAL_WORKER_COUNT: int = config['historical_worker_count']
+HISTORICAL_REQUESTS_PER_SECOND: float = config['historical_requests_per_second']
+PARTITION_WEEKS_AHEAD: int = config['partition_weeks_ahead']
+PARTITION_MAINTENANCE_SECONDS: float = config['partition_maintenance_seconds']
+RAW_RETENTION_DAYS: int = config['raw_retention_days']
+ARCHIVE_READINGS: Literal['yes', 'no'] = config['archive_readings']
+ARCHIVE_DIR: str = config['archive_dir']
+SPOOL_READINGS: Literal['yes', 'no'] = config['spool_readings']
+SPOOL_PATH: str = config['spool_path']
+SPOOL_SYNC_WRITES: Literal['yes', 'no'] = config['spool_sync_writes']
+SPOOL_BATCH_SIZE: int = config['spool_batch_size']
+SPOOL_REPLAY_SECONDS: float = config['spool_replay_seconds']
+METRICS_HOST: str = config['metrics_host']
+METRICS_PORT: int = config['metrics_port']
+GEO_CACHE_PATH: str = config['geo_cache_path']
+GEO_LOOKUP_WORKERS: int = config['geo_lookup_workers']
+CONFIG_RELOAD_SECONDS: float = config['config_reload_seconds']
+CHANGE_FEED: str = config['change_feed']
+
+# How long the writer waits before retrying a batch after losing the database
+WRITER_RETRY_SECONDS: float = 5.0
+
+# How long dropping expired partitions may wait for ingestion to let go of weather_data; every reader and writer
+# queues behind the drop meanwhile, so give up quickly and try again next maintenance round
+EXPIRE_LOCK_TIMEOUT: str = '5s'
+
+# How long partition maintenance waits before retrying after a failed round
+MAINTENANCE_RETRY_SECONDS: float = 60.0
 
 # Dynamic parameters
 DATABASE_CREATION_PROGRESS: float = 0.0
+CONFIG_GENERATION: int = 0  # Bumped whenever hot-reloaded settings change
 
-# Environmental variables
-ENV_DB_HOST = "postgres"
-ENV_DB_NAME = "postgres"
-ENV_DB_USER = "data_generator"
-ENV_DB_PASSWORD = open("secrets/iot_temp_data_gen_password.txt").read().strip()
-ENV_DB_PORT = 5432
+# Lock wait and insert durations by name, collected only while a benchmark sets this to a dict
+INGEST_TIMINGS: Union[dict[str, list[float]], None] = None
 
+# Ingestion metrics, served in Prometheus text format by start_metrics_server()
+API_FETCH_SECONDS: Histogram = Histogram(
+    'datagen_api_fetch_seconds', 'Weather API request latency by endpoint and HTTP status.', ('endpoint', 'status')
+)
+LOCK_WAIT_SECONDS: Histogram = Histogram('datagen_lock_wait_seconds', 'Time spent waiting for a connection lock.')
+INSERT_SECONDS: Histogram = Histogram(
+    'datagen_insert_seconds', 'Time a weather data write holds its connection lock, commit included.'
+)
+COMMIT_SECONDS: Histogram = Histogram('datagen_commit_seconds', 'Time spent committing weather data writes.')
+ROWS_WRITTEN: Counter = Counter(
+    'datagen_rows_written_total', 'Weather data rows inserted or updated by sensor ID.', ('sensor_id',)
+)
+BACKFILL_PROGRESS: Gauge = Gauge('datagen_backfill_progress', 'Fraction of historical work units completed.')
+INGEST_QUEUE_DEPTH: Gauge = Gauge('datagen_ingest_queue_depth', 'Readings waiting for the writer thread.')
+SPOOL_PENDING_BYTES: Gauge = Gauge('datagen_spool_pending_bytes', 'Spooled bytes not replayed into the database yet.')
+TIMING_HISTOGRAMS: dict[str, Histogram] = {
+    'lock_wait': LOCK_WAIT_SECONDS, 'insert': INSERT_SECONDS, 'commit': COMMIT_SECONDS
+}
+
+# Weather API location (overridable to point at a local stand-in server such as MockWeatherApi.py)
+API_BASE_URL: str = getenv('WEATHER_API_BASE_URL', 'http://api.weatherapi.com/v1')
+
+# Environmental variables (overridable to run against a local database)
+ENV_DB_HOST = getenv('DATA_GEN_DB_HOST', "postgres")
+ENV_DB_NAME = getenv('DATA_GEN_DB_NAME', "postgres")
+ENV_DB_USER = getenv('DATA_GEN_DB_USER', "data_generator")
+ENV_DB_PASSWORD = getenv('DATA_GEN_DB_PASSWORD') or open("secrets/iot_temp_data_gen_password.txt").read().strip()
+ENV_DB_PORT = int(getenv('DATA_GEN_DB_PORT', 5432))
+
+
+class RateLimiter:
+    def __init__(self, requests_per_second: float) -> None:
+        # A non-positive rate disables limiting
+        self.interval_seconds: float = 1 / requests_per_second if requests_per_second > 0 else 0.0
+        self.next_slot: float = monotonic()
+        self.slot_lock: Lock = Lock()
+
+    def wait(self) -> None:
+        if self.interval_seconds == 0.0:
+            return
+
+        # Reserve the next free slot, then sleep outside the lock until it arrives
+        with self.slot_lock:
+            now: float = monotonic()
+            slot: float = max(now, self.next_slot)
+            self.next_slot = slot + self.interval_seconds
+        if slot > now:
+            sleep(slot - now)
+
+
+def record_timing(timing_name: str, seconds: float) -> None:
+    TIMING_HISTOGRAMS[timing_name].observe(seconds)
+    if INGEST_TIMINGS is not None:
+        INGEST_TIMINGS.setdefault(timing_name, []).append(seconds)
+
+
+def fetch_api_json(api_endpoint: str, request_function, **request_kwargs) -> dict:
+    # Time every weather API call by endpoint and HTTP status
+    fetch_start: float = perf_counter()
+    try:
+        api_response = request_function(**request_kwargs)
+    except RequestException:
+        API_FETCH_SECONDS.observe(perf_counter() - fetch_start, api_endpoint, 'error')
+        raise
+    API_FETCH_SECONDS.observe(perf_counter() - fetch_start, api_endpoint, str(api_response.status_code))
+    return api_response.json()
+
+
+def connect_data_generator() -> connection:
+    return connect(
+        host=ENV_DB_HOST, database=ENV_DB_NAME, user=ENV_DB_USER, password=ENV_DB_PASSWORD, port=ENV_DB_PORT
+    )
+
+
+def load_geo_cache() -> dict[str, dict]:
+    if not exists(GEO_CACHE_PATH):
+        return {}
+    with open(GEO_CACHE_PATH) as geo_cache_file:
+        return load_json(geo_cache_file)
+
+
+def save_geo_cache(geo_cache: dict[str, dict]) -> None:
+    # Write to a temporary file first so a crash never leaves a truncated cache
+    if dirname(GEO_CACHE_PATH):
+        makedirs(dirname(GEO_CACHE_PATH), exist_ok=True)
+    with open(f'{GEO_CACHE_PATH}.tmp', 'w') as geo_cache_file:
+        dump_json(geo_cache, geo_cache_file, indent=2, sort_keys=True)
+    replace(f'{GEO_CACHE_PATH}.tmp', GEO_CACHE_PATH)
+
+
+def lookup_location(sensor_location: str) -> dict:
+    sensor_api_link: str = f'{API_BASE_URL}/current.json?key={API_KEY}&q={sensor_location}&aqi={GET_AIR_QUALITY}'
+    return fetch_api_json('current.json', get, url=sensor_api_link)['location']
 
-def add_sensor_entry(sensor_conn: connection, sensor_api_link: str, conn_lock: Lock,
-                     sensor_name: Union[str, None] = None) -> tuple[int, bool]:
-    # Set sensor name
-    if sensor_name is None:
-        sensor_name = current_thread().name
 
-    name_already_existed = True
+def try_lookup_location(sensor_location: str) -> Union[dict, None]:
+    # One unresolvable location must not cost the lookups that did succeed
+    try:
+        return lookup_location(sensor_location)
+    except (RequestException, KeyError, ValueError) as lookup_error:
+        print(f'Could not look up location {sensor_location}, skipping it: {lookup_error!r}')
+        return None
+
+
+def register_sensors(sensor_conn: connection, sensor_locations: list[str], conn_lock: Lock) -> dict[str, int]:
+    sensor_names: dict[str, str] = {
+        sensor_location: f'sensor_{sensor_location.replace(" ", "_").lower()}' for sensor_location in sensor_locations
+    }
+
+    # Find every sensor that is already registered in one query
+    lock_start: float = perf_counter()
     with conn_lock:
-        # Check for entry
+        record_timing('lock_wait', perf_counter() - lock_start)
         sensor_cursor: cursor = sensor_conn.cursor()
-        sensor_cursor.execute('SELECT * FROM sensors WHERE sensor_name = %s', (sensor_name,))
-
-        # Add if check returned nothing
-        if not sensor_cursor.fetchall():
-            sensor_location_info: dict = get(url=sensor_api_link).json()['location']
-            insert_params: tuple = (
-                sensor_name, sensor_location_info["name"], sensor_location_info["region"],
-                sensor_location_info["country"], sensor_location_info["lat"], sensor_location_info["lon"],
-                sensor_location_info["tz_id"]
+        sensor_cursor.execute(
+            'SELECT sensor_name, sensor_id FROM sensors WHERE sensor_name = ANY(%s)', (list(sensor_names.values()),)
+        )
+        known_ids: dict[str, int] = dict(sensor_cursor.fetchall())
+        sensor_conn.commit()
+
+    new_locations: list[str] = list(dict.fromkeys(
+        sensor_location for sensor_location in sensor_locations if sensor_names[sensor_location] not in known_ids
+    ))
+    if new_locations:
+        # Look up new locations from the disk cache, then in parallel from the API, outside the lock
+        geo_cache: dict[str, dict] = load_geo_cache()
+        uncached_locations: list[str] = [
+            sensor_location for sensor_location in new_locations if sensor_location not in geo_cache
+        ]
+        if uncached_locations:
+            with ThreadPoolExecutor(max_workers=GEO_LOOKUP_WORKERS, thread_name_prefix='geo_lookup') as executor:
+                looked_up: list[Union[dict, None]] = list(executor.map(try_lookup_location, uncached_locations))
+            geo_cache.update(
+                (sensor_location, location_info)
+                for sensor_location, location_info in zip(uncached_locations, looked_up) if location_info is not None
             )
-            insert_query: str = (
-                "INSERT INTO sensors "
-                "(sensor_name, sensor_locale, sensor_region, sensor_country, "
-                "sensor_lat, sensor_long, sensor_timezone) "
-                "VALUES (%s, %s, %s, %s, %s, %s, %s)"
+            save_geo_cache(geo_cache)
+
+        # Insert every resolved sensor in one upsert; a no-op update makes rows added concurrently return their ids
+        # too. Locations sharing a sensor name get one row, since an upsert cannot touch the same row twice
+        insert_rows: list[tuple] = list({
+            sensor_names[sensor_location]: (
+                sensor_names[sensor_location], geo_cache[sensor_location]['name'],
+                geo_cache[sensor_location]['region'], geo_cache[sensor_location]['country'],
+                geo_cache[sensor_location]['lat'], geo_cache[sensor_location]['lon'],
+                geo_cache[sensor_location]['tz_id']
             )
-            sensor_cursor.execute(insert_query, insert_params)
+            for sensor_location in new_locations if sensor_location in geo_cache
+        }.values())
+        insert_query: str = (
+            "INSERT INTO sensors "
+            "(sensor_name, sensor_locale, sensor_region, sensor_country, "
+            "sensor_lat, sensor_long, sensor_timezone) "
+            "VALUES %s ON CONFLICT (sensor_name) DO UPDATE SET sensor_name = EXCLUDED.sensor_name "
+            "RETURNING sensor_name, sensor_id"
+        )
+        if insert_rows:
+            lock_start = perf_counter()
+            with conn_lock:
+                record_timing('lock_wait', perf_counter() - lock_start)
+                sensor_cursor: cursor = sensor_conn.cursor()
+                known_ids.update(execute_values(
+                    sensor_cursor, insert_query, insert_rows, page_size=len(insert_rows), fetch=True
+                ))
+
+                # Commit transaction
+                sensor_conn.commit()
+        print(f'Registered {len(insert_rows)} new sensor(s), {len(uncached_locations)} of them looked up '
+              f'from the weather API.')
+
+    # Locations that could not be resolved are left out, so callers skip them until the next registration
+    return {
+        sensor_location: known_ids[sensor_names[sensor_location]]
+        for sensor_location in sensor_locations if sensor_names[sensor_location] in known_ids
+    }
+
+
+def get_weather_data_params(sensor_id: int, timestamp: datetime, sensor_info: dict) -> tuple:
+    return (
+        sensor_id, timestamp, sensor_info['temp_c'],
+        sensor_info['temp_f'], sensor_info['wind_mph'], sensor_info['wind_kph'],
+        sensor_info['wind_degree'], sensor_info['wind_dir'], sensor_info['pressure_mb'],
+        sensor_info['pressure_in'], sensor_info['precip_mm'], sensor_info['precip_in'],
+        sensor_info['humidity'], sensor_info['uv']
+    )
 
-            # Commit transaction
-            sensor_conn.commit()
-            print(f'Added {sensor_name} to database')
-            name_already_existed = False
 
-        # Get sensor id
-        sensor_cursor.execute('SELECT sensor_id FROM sensors WHERE sensor_name = %s', (sensor_name,))
-        sensor_id: int = sensor_cursor.fetchone()[0]
-        print('Sensor ID:', sensor_id)
+def get_observation_timestamp(api_epoch: int) -> datetime:
+    # Use the epoch the API reports alongside its local time so stored observations are real instants
+    return datetime.fromtimestamp(api_epoch, tz=timezone.utc)
 
-    return sensor_id, name_already_existed
+
+def refresh_rollups(sensor_cursor: cursor, data_rows: list[tuple]) -> None:
+    # Recompute the rollup buckets covering the rows just written, inside the caller's transaction
+    refresh_params: tuple = (
+        sorted({data_row[0] for data_row in data_rows}),
+        min(data_row[1] for data_row in data_rows), max(data_row[1] for data_row in data_rows)
+    )
+    sensor_cursor.execute('SELECT refresh_weather_rollups(%s, %s, %s)', refresh_params)
 
 
 def add_sensor_data_entry(sensor_conn: connection, sensor_id: int, sensor_current_info: dict, conn_lock: Lock,
-                          timestamp: Union[str, None] = None, sensor_name: Union[str, None] = None) -> None:
-    # Set sensor name and timestamp
+                          timestamp: Union[datetime, None] = None, sensor_name: Union[str, None] = None) -> bool:
+    # Set sensor name and timestamp (the provider's observation time, so repeated readings share a key)
     if sensor_name is None:
         sensor_name = current_thread().name
     if timestamp is None:
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        timestamp = get_observation_timestamp(sensor_current_info['last_updated_epoch'])
 
+    lock_start: float = perf_counter()
     with conn_lock:
-        insert_params: tuple = (
-            sensor_id, timestamp, sensor_current_info['temp_c'],
-            sensor_current_info['temp_f'], sensor_current_info['wind_mph'], sensor_current_info['wind_kph'],
-            sensor_current_info['wind_degree'], sensor_current_info['wind_dir'], sensor_current_info['pressure_mb'],
-            sensor_current_info['pressure_in'], sensor_current_info['precip_mm'], sensor_current_info['precip_in'],
-            sensor_current_info['humidity'], sensor_current_info['uv']
-        )
+        insert_start: float = perf_counter()
+        record_timing('lock_wait', insert_start - lock_start)
+        insert_params: tuple = get_weather_data_params(sensor_id, timestamp, sensor_current_info)
         insert_query: str = (
             "INSERT INTO weather_data "
             "(sensor_id, time_recorded, temp_c, temp_f, wind_mph, wind_kph, wind_degree, wind_dir, "
             "pressure_mb, pressure_in, precip_mm, precip_in, humidity_perc, uv_index_score) "
-            "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"
+            "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s) "
+            "ON CONFLICT (sensor_id, time_recorded) DO NOTHING"
         )
         sensor_cursor: cursor = sensor_conn.cursor()
         sensor_cursor.execute(insert_query, insert_params)
+        data_added: bool = sensor_cursor.rowcount > 0
+        if data_added:
+            refresh_rollups(sensor_cursor, [insert_params])
+            if CHANGE_FEED == 'yes':
+                notify_readings(sensor_cursor, [(sensor_id, timestamp)])
 
         # Commit transaction
+        commit_start: float = perf_counter()
         sensor_conn.commit()
-        print(f'Added weather data from {sensor_name} to database at {insert_params[1]}.')
+        record_timing('commit', perf_counter() - commit_start)
+        record_timing('insert', perf_counter() - insert_start)
+        if data_added:
+            ROWS_WRITTEN.inc(str(sensor_id))
+            print(f'Added weather data from {sensor_name} to database at {insert_params[1]}.')
+        else:
+            print(f'Weather data from {sensor_name} at {insert_params[1]} was already in database.')
 
+    return data_added
 
-def weather_detection_service(sensor_loc: str, conn_lock: Lock, stop_event: Event) -> None:
-    # Connect to the database
-    sensor_conn: connection = connect(
+
+def add_sensor_data_entries(sensor_conn: connection, data_rows: list[tuple], conn_lock: Lock,
+                            sensor_name: Union[str, None] = None, replace_existing: bool = False,
+                            ingested_days: Union[list[tuple[int, date]], None] = None) -> int:
+    # Set sensor name
+    if sensor_name is None:
+        sensor_name = current_thread().name
+
+    if not data_rows and not ingested_days:
+        return 0
+
+    lock_start: float = perf_counter()
+    with conn_lock:
+        insert_start: float = perf_counter()
+        record_timing('lock_wait', insert_start - lock_start)
+        sensor_cursor: cursor = sensor_conn.cursor()
+
+        # Write every buffered row with multi-row VALUES inside one transaction, either overwriting rows being
+        # re-fetched (such as the partial present day) or keeping what is already stored
+        written_rows: list[tuple] = []
+        if data_rows:
+            if replace_existing:
+                conflict_action: str = (
+                    "DO UPDATE SET temp_c = EXCLUDED.temp_c, temp_f = EXCLUDED.temp_f, "
+                    "wind_mph = EXCLUDED.wind_mph, wind_kph = EXCLUDED.wind_kph, "
+                    "wind_degree = EXCLUDED.wind_degree, wind_dir = EXCLUDED.wind_dir, "
+                    "pressure_mb = EXCLUDED.pressure_mb, pressure_in = EXCLUDED.pressure_in, "
+                    "precip_mm = EXCLUDED.precip_mm, precip_in = EXCLUDED.precip_in, "
+                    "humidity_perc = EXCLUDED.humidity_perc, uv_index_score = EXCLUDED.uv_index_score"
+                )
+            else:
+                conflict_action: str = "DO NOTHING"
+            insert_query: str = (
+                "INSERT INTO weather_data "
+                "(sensor_id, time_recorded, temp_c, temp_f, wind_mph, wind_kph, wind_degree, wind_dir, "
+                "pressure_mb, pressure_in, precip_mm, precip_in, humidity_perc, uv_index_score) "
+                f"VALUES %s ON CONFLICT (sensor_id, time_recorded) {conflict_action} RETURNING sensor_id, time_recorded"
+            )
+            written_rows = execute_values(
+                sensor_cursor, insert_query, data_rows, page_size=len(data_rows), fetch=True
+            )
+            refresh_rollups(sensor_cursor, data_rows)
+            if CHANGE_FEED == 'yes':
+                notify_readings(sensor_cursor, written_rows)
+
+        # Record fully ingested days in the same transaction as their rows
+        if ingested_days:
+            watermark_query: str = (
+                "INSERT INTO backfill_days (sensor_id, day_ingested) VALUES %s ON CONFLICT DO NOTHING"
+            )
+            execute_values(sensor_cursor, watermark_query, ingested_days, page_size=len(ingested_days))
+
+        # Commit transaction
+        commit_start: float = perf_counter()
+        sensor_conn.commit()
+        record_timing('commit', perf_counter() - commit_start)
+        record_timing('insert', perf_counter() - insert_start)
+
+        # Count rows actually written per sensor, tallied first so each sensor takes the metric lock once
+        if written_rows:
+            written_counts: dict[int, int] = {}
+            for written_row in written_rows:
+                written_counts[written_row[0]] = written_counts.get(written_row[0], 0) + 1
+            for written_sensor_id, written_count in written_counts.items():
+                ROWS_WRITTEN.inc(str(written_sensor_id), amount=written_count)
+        print(f'Added {len(written_rows)} weather data rows from {sensor_name} to database.')
+
+    return len(written_rows)
+
+
+def get_ingested_days(sensor_conn: connection, sensor_id: int, conn_lock: Lock) -> set[date]:
+    with conn_lock:
+        sensor_cursor: cursor = sensor_conn.cursor()
+        sensor_cursor.execute('SELECT day_ingested FROM backfill_days WHERE sensor_id = %s', (sensor_id,))
+        ingested_days: set[date] = {day_row[0] for day_row in sensor_cursor.fetchall()}
+        sensor_conn.commit()
+
+    return ingested_days
+
+
+def get_location_date(sensor_timezone: str) -> date:
+    # The day in progress where the sensor is, which can differ from the server's own date
+    try:
+        return datetime.now(ZoneInfo(sensor_timezone)).date()
+    except (ZoneInfoNotFoundError, ValueError):
+        # Assume the earliest date anywhere on Earth, so an unfinished day is never marked as ingested
+        return (datetime.now(timezone.utc) - timedelta(hours=12)).date()
+
+
+def get_sensor_timezones(sensor_conn: connection, sensor_ids: list[int], conn_lock: Lock) -> dict[int, str]:
+    with conn_lock:
+        sensor_cursor: cursor = sensor_conn.cursor()
+        sensor_cursor.execute(
+            'SELECT sensor_id, sensor_timezone FROM sensors WHERE sensor_id = ANY(%s)', (sensor_ids,)
+        )
+        sensor_timezones: dict[int, str] = dict(sensor_cursor.fetchall())
+        sensor_conn.commit()
+
+    return sensor_timezones
+
+
+def enqueue_reading(reading_queue: Queue, data_row: tuple) -> bool:
+    # Apply the configured backpressure policy when the writer falls behind
+    if INGEST_QUEUE_POLICY == 'drop_newest':
+        try:
+            reading_queue.put_nowait(data_row)
+        except Full:
+            return False
+    elif INGEST_QUEUE_POLICY == 'drop_oldest':
+        while True:
+            try:
+                reading_queue.put_nowait(data_row)
+                break
+            except Full:
+                try:
+                    reading_queue.get_nowait()
+                except Empty:
+                    pass
+    else:
+        reading_queue.put(data_row)
+
+    return True
+
+
+def weather_detection_service(sensor_loc: str, sensor_db_id: int, reading_queue: Queue, stop_event: Event) -> None:
+    # Create api link
+    sensor_api_link = f'{API_BASE_URL}/current.json?key={API_KEY}&q={sensor_loc}&aqi={GET_AIR_QUALITY}'
+
+    # Start data generation loop, ending early if the location is removed from the config
+    next_update: datetime = datetime.now()
+    last_stored_update: Union[str, None] = None
+    while not stop_event.is_set() and sensor_loc in LOCATION_SET:
+        if datetime.now() > next_update:
+            # Get updated information
+            sensor_current_info: dict = fetch_api_json('current.json', get, url=sensor_api_link)['current']
+            print(f'Weather data from {sensor_loc} was last updated at {sensor_current_info["last_updated"]}.')
+
+            # Hand updated information to the writer unless the provider has not refreshed it yet
+            if not stop_event.is_set() and sensor_current_info['last_updated'] != last_stored_update:
+                data_row: tuple = get_weather_data_params(
+                    sensor_db_id, get_observation_timestamp(sensor_current_info['last_updated_epoch']),
+                    sensor_current_info
+                )
+                if enqueue_reading(reading_queue, data_row):
+                    last_stored_update = sensor_current_info['last_updated']
+                else:
+                    print(f'Dropped weather data from {sensor_loc} because the write queue is full.')
+
+            # Reset next update
+            next_update = datetime.now() + timedelta(seconds=UPDATE_INTERVAL_SECONDS)
+
+        # Sleep for one second until next stop event check
+        sleep(1)
+
+
+def weather_writer_service(reading_queue: Queue, reading_spool: Union[ReadingSpool, None],
+                           stop_event: Event) -> None:
+    # Connect lazily unless readings go to the spool; only this thread writes, so the lock is never contended
+    writer_conn: Union[connection, None] = None
+    writer_lock: Lock = Lock()
+
+    # Drain the queue in micro-batches until stopped and empty
+    while not stop_event.is_set() or not reading_queue.empty():
+        try:
+            data_rows: list[tuple] = [reading_queue.get(timeout=1)]
+        except Empty:
+            continue
+
+        batch_deadline: float = monotonic() + INGEST_BATCH_WAIT_SECONDS
+        while len(data_rows) < INGEST_BATCH_SIZE:
+            try:
+                data_rows.append(reading_queue.get(timeout=max(0.0, batch_deadline - monotonic())))
+            except Empty:
+                break
+        INGEST_QUEUE_DEPTH.set(reading_queue.qsize())
+
+        if reading_spool is not None:
+            reading_spool.append_rows(data_rows)
+            continue
+
+        # Keep retrying the batch through outages, reconnecting each time. Producers block or drop readings per the
+        # queue policy meanwhile, and inserts ignore stored readings, so a batch written twice is harmless
+        while True:
+            try:
+                if writer_conn is None:
+                    writer_conn = connect_data_generator()
+                add_sensor_data_entries(writer_conn, data_rows, writer_lock)
+                break
+            except (OperationalError, InterfaceError) as writer_error:
+                print(f'Could not write {len(data_rows)} weather data rows ({writer_error}). '
+                      f'Retrying in {WRITER_RETRY_SECONDS} seconds.')
+                if writer_conn is not None:
+                    writer_conn.close()
+                    writer_conn = None
+                if stop_event.wait(WRITER_RETRY_SECONDS):
+                    print(f'Stopped before {len(data_rows)} weather data rows could be written.')
+                    break
+
+    if writer_conn is not None:
+        writer_conn.close()
+
+
+def spool_replay_service(reading_spool: ReadingSpool, stop_event: Event) -> None:
+    # Connect lazily so readings keep spooling while the database is unreachable
+    replay_conn: Union[connection, None] = None
+    replay_lock: Lock = Lock()
+
+    # Replay spooled readings in order until stopped and drained
+    while True:
+        data_rows, next_offset = reading_spool.read_batch(SPOOL_BATCH_SIZE)
+        if not data_rows:
+            if stop_event.is_set():
+                break
+            stop_event.wait(SPOOL_REPLAY_SECONDS)
+            continue
+
+        # Inserts ignore readings that are already stored, so a batch replayed twice after a failure is harmless
+        try:
+            if replay_conn is None:
+                replay_conn = connect_data_generator()
+            add_sensor_data_entries(replay_conn, data_rows, replay_lock, 'spool_replay')
+        except (OperationalError, InterfaceError) as replay_error:
+            print(f'Could not replay spooled weather data ({replay_error}). '
+                  f'{reading_spool.pending_bytes()} bytes are waiting in {SPOOL_PATH}.')
+            if replay_conn is not None:
+                replay_conn.close()
+                replay_conn = None
+            if stop_event.is_set():
+                break
+            stop_event.wait(SPOOL_REPLAY_SECONDS)
+            continue
+        except (IntegrityError, DataError) as replay_error:
+            # Retrying a batch the database rejects would stall the spool forever, so set it aside and move on
+            replay_conn.rollback()
+            reading_spool.reject_rows(data_rows)
+            print(f'Moved {len(data_rows)} spooled weather data rows the database rejected ({replay_error}) '
+                  f'to {SPOOL_PATH}.rejected.')
+
+        reading_spool.commit_offset(next_offset)
+        SPOOL_PENDING_BYTES.set(reading_spool.pending_bytes())
+
+    if replay_conn is not None:
+        replay_conn.close()
+
+
+async def async_weather_detection(sensor_loc: str, sensor_id: int, http_session: ClientSession,
+                                  db_pool: ThreadedConnectionPool, db_slots: asyncio.Semaphore,
+                                  last_stored_updates: dict[int, str],
+                                  reading_spool: Union[ReadingSpool, None]) -> None:
+    sensor_name: str = f'sensor_{sensor_loc.replace(" ", "_").lower()}'
+
+    # Get updated information over the shared keep-alive session
+    sensor_api_params: dict[str, str] = {'key': API_KEY, 'q': sensor_loc, 'aqi': GET_AIR_QUALITY}
+    fetch_start: float = perf_counter()
+    async with http_session.get(f'{API_BASE_URL}/current.json', params=sensor_api_params) as sensor_response:
+        sensor_current_info: dict = (await sensor_response.json())['current']
+    API_FETCH_SECONDS.observe(perf_counter() - fetch_start, 'current.json', str(sensor_response.status))
+    print(f'Weather data from {sensor_loc} was last updated at {sensor_current_info["last_updated"]}.')
+
+    # Skip the write when the provider has not refreshed the reading yet
+    if last_stored_updates.get(sensor_id) == sensor_current_info['last_updated']:
+        return
+
+    # Spool updated information locally when enabled; the replay thread writes it to the database
+    if reading_spool is not None:
+        # Off the event loop, since appending may fsync
+        await asyncio.to_thread(reading_spool.append_rows, [get_weather_data_params(
+            sensor_id, get_observation_timestamp(sensor_current_info['last_updated_epoch']), sensor_current_info
+        )])
+        last_stored_updates[sensor_id] = sensor_current_info['last_updated']
+        return
+
+    # Add updated information to database through the shared pool
+    async with db_slots:
+        sensor_conn: connection = db_pool.getconn()
+        try:
+            await asyncio.to_thread(
+                add_sensor_data_entry, sensor_conn, sensor_id, sensor_current_info, Lock(), None, sensor_name
+            )
+        finally:
+            db_pool.putconn(sensor_conn)
+    last_stored_updates[sensor_id] = sensor_current_info['last_updated']
+
+
+async def async_register_sensors(sensor_locations: list[str], db_pool: ThreadedConnectionPool,
+                                 db_slots: asyncio.Semaphore) -> dict[str, int]:
+    # Wait for a free pool connection like the polling tasks do, since registration reruns while they hold some.
+    # The connection is checked out exclusively, so a private lock is enough
+    async with db_slots:
+        registration_conn: connection = db_pool.getconn()
+        try:
+            return await asyncio.to_thread(register_sensors, registration_conn, sensor_locations, Lock())
+        finally:
+            db_pool.putconn(registration_conn)
+
+
+async def async_ingestion_service(reading_spool: Union[ReadingSpool, None], stop_event: Event) -> None:
+    # Share a small connection pool and a keep-alive HTTP session across every sensor
+    db_pool: ThreadedConnectionPool = ThreadedConnectionPool(
+        1, ASYNC_DB_POOL_SIZE,
         host=ENV_DB_HOST, database=ENV_DB_NAME, user=ENV_DB_USER, password=ENV_DB_PASSWORD, port=ENV_DB_PORT
     )
+    db_slots: asyncio.Semaphore = asyncio.Semaphore(ASYNC_DB_POOL_SIZE)
+    sensor_tasks: set[asyncio.Task] = set()
+    last_stored_updates: dict[int, str] = {}
 
-    # Create api link
-    sensor_api_link = f'http://api.weatherapi.com/v1/current.json?key={API_KEY}&q={sensor_loc}&aqi={GET_AIR_QUALITY}'
+    try:
+        async with ClientSession(connector=TCPConnector(limit=ASYNC_HTTP_CONNECTIONS)) as http_session:
+            timer_heap: list[tuple[float, str, int]] = []
+            scheduled_locations: set[str] = set()
+            seen_generation: int = -1
+
+            # Start data generation loop
+            while not stop_event.is_set():
+                # Add sensors to database if not exist and schedule them on one timer heap, spreading first polls
+                # across the interval; this also picks up locations added to the config while running
+                if seen_generation != CONFIG_GENERATION:
+                    seen_generation = CONFIG_GENERATION
+                    active_locations: set[str] = set(LOCATION_SET)
+                    new_locations: list[str] = [
+                        sensor_location for sensor_location in dict.fromkeys(LOCATION_SET)
+                        if sensor_location not in scheduled_locations
+                    ]
+                    if new_locations:
+                        new_sensor_ids: dict[str, int] = await async_register_sensors(new_locations, db_pool, db_slots)
+                        loop_start: float = monotonic()
+                        for sensor_index, sensor_location in enumerate(new_locations):
+                            if sensor_location not in new_sensor_ids:
+                                continue
+                            first_update: float = (
+                                loop_start + UPDATE_INTERVAL_SECONDS * sensor_index / len(new_locations)
+                            )
+                            heappush(timer_heap, (first_update, sensor_location, new_sensor_ids[sensor_location]))
+                            scheduled_locations.add(sensor_location)
+
+                wait_seconds: float = timer_heap[0][0] - monotonic() if timer_heap else 1.0
+                if wait_seconds > 0:
+                    # Wake at least once a second to notice the stop event and config changes
+                    await asyncio.sleep(min(wait_seconds, 1.0))
+                    continue
 
-    # Add sensor to database if not exist
-    if not stop_event.is_set():
-        sensor_db_id, _ = add_sensor_entry(sensor_conn, sensor_api_link, conn_lock)
+                # Drop sensors whose location was removed from the config
+                next_update, sensor_location, sensor_id = heappop(timer_heap)
+                if sensor_location not in active_locations:
+                    scheduled_locations.discard(sensor_location)
+                    continue
+
+                sensor_task: asyncio.Task = asyncio.create_task(
+                    async_weather_detection(
+                        sensor_location, sensor_id, http_session, db_pool, db_slots, last_stored_updates, reading_spool
+                    )
+                )
+                sensor_tasks.add(sensor_task)
+                sensor_task.add_done_callback(sensor_tasks.discard)
+
+                # Reset next update
+                heappush(timer_heap, (next_update + UPDATE_INTERVAL_SECONDS, sensor_location, sensor_id))
+
+            # Let in-flight polls finish before closing the session
+            await asyncio.gather(*sensor_tasks, return_exceptions=True)
+    finally:
+        db_pool.closeall()
+
+
+def get_bulk_current_info(http_session: Session, sensor_locations: list[str]) -> tuple[dict[str, dict], int]:
+    # Query the provider's bulk form in batches, tagging each location so results can be fanned back out
+    current_info_by_location: dict[str, dict] = {}
+    request_count: int = 0
+    for batch_start in range(0, len(sensor_locations), BULK_BATCH_SIZE):
+        batch_locations: list[str] = sensor_locations[batch_start:batch_start + BULK_BATCH_SIZE]
+        bulk_body: dict = {'locations': [
+            {'q': sensor_location, 'custom_id': sensor_location} for sensor_location in batch_locations
+        ]}
+        bulk_response: dict = fetch_api_json(
+            'current.json:bulk', http_session.post,
+            url=f'{API_BASE_URL}/current.json', params={'key': API_KEY, 'q': 'bulk', 'aqi': GET_AIR_QUALITY},
+            json=bulk_body
+        )
+        request_count += 1
+
+        for bulk_entry in bulk_response['bulk']:
+            current_info_by_location[bulk_entry['query']['custom_id']] = bulk_entry['query']['current']
+
+    return current_info_by_location, request_count
+
+
+def bulk_weather_detection_service(conn_lock: Lock, reading_spool: Union[ReadingSpool, None],
+                                   stop_event: Event) -> None:
+    # Connect to the database
+    bulk_conn: connection = connect_data_generator()
+
+    # Reuse keep-alive connections for every batch
+    http_session: Session = Session()
+    http_session.mount('http://', HTTPAdapter(pool_maxsize=4))
+    http_session.mount('https://', HTTPAdapter(pool_maxsize=4))
 
     # Start data generation loop
     next_update: datetime = datetime.now()
+    last_stored_updates: dict[str, str] = {}
+    sensor_locations: list[str] = []
+    sensor_ids: dict[str, int] = {}
+    seen_generation: int = -1
     while not stop_event.is_set():
         if datetime.now() > next_update:
-            # Get updated information
-            sensor_current_info: dict = get(url=sensor_api_link).json()['current']
-            print(f'Weather data from {sensor_loc} was last updated at {sensor_current_info["last_updated"]}.')
+            # Add sensors to database if not exist, following locations added or removed while running
+            if seen_generation != CONFIG_GENERATION:
+                seen_generation = CONFIG_GENERATION
+                sensor_ids = register_sensors(bulk_conn, list(dict.fromkeys(LOCATION_SET)), conn_lock)
+                sensor_locations = list(sensor_ids)
+
+            # Get updated information for every location in as few requests as possible
+            cycle_start: float = perf_counter()
+            current_info_by_location, request_count = get_bulk_current_info(http_session, sensor_locations)
+            fetch_seconds: float = perf_counter() - cycle_start
+
+            # Fan the readings out to the batch insert path, skipping ones the provider has not refreshed
+            data_rows: list[tuple] = []
+            for sensor_location, sensor_current_info in current_info_by_location.items():
+                if last_stored_updates.get(sensor_location) == sensor_current_info['last_updated']:
+                    continue
+                data_rows.append(get_weather_data_params(
+                    sensor_ids[sensor_location], get_observation_timestamp(sensor_current_info['last_updated_epoch']),
+                    sensor_current_info
+                ))
+                last_stored_updates[sensor_location] = sensor_current_info['last_updated']
 
-            # Add updated information to database
-            if not stop_event.is_set():
-                add_sensor_data_entry(sensor_conn, sensor_db_id, sensor_current_info, conn_lock)
+            if reading_spool is not None:
+                reading_spool.append_rows(data_rows)
+            elif not stop_event.is_set():
+                add_sensor_data_entries(bulk_conn, data_rows, conn_lock, 'bulk_sensors')
+            print(f'Bulk cycle fetched {len(current_info_by_location)} locations in {request_count} request(s) '
+                  f'({fetch_seconds:.3f} seconds) and stored {len(data_rows)} new reading(s).')
 
             # Reset next update
             next_update = datetime.now() + timedelta(seconds=UPDATE_INTERVAL_SECONDS)
@@ -140,70 +768,209 @@ def weather_detection_service(sensor_loc: str, conn_lock: Lock, stop_event: Even
         # Sleep for one second until next stop event check
         sleep(1)
 
+    http_session.close()
+    bulk_conn.close()
+
+
+def get_historical_day(sensor_location: str, day: datetime, rate_limiter: RateLimiter) -> list[dict]:
+    # Wait for a free request slot before calling the API
+    rate_limiter.wait()
+    sensor_api_link: str = (
+        f'{API_BASE_URL}/history.json?'
+        f'key={API_KEY}&q={sensor_location}&dt={day.strftime("%Y-%m-%d")}&aqi={GET_AIR_QUALITY}'
+    )
+    return fetch_api_json('history.json', get, url=sensor_api_link)['forecast']['forecastday'][0]['hour']
+
+
+def backfill_work_unit(sensor_location: str, sensor_id: int, sensor_name: str, unit_days: list[datetime],
+                       location_date: date, rate_limiter: RateLimiter, worker_state: local,
+                       worker_conns: list[connection], worker_conns_lock: Lock) -> int:
+    # Give every worker thread its own connection so writes never wait on each other
+    if not hasattr(worker_state, 'conn'):
+        worker_state.conn = connect_data_generator()
+        worker_state.conn_lock = Lock()
+        with worker_conns_lock:
+            worker_conns.append(worker_state.conn)
+
+    # Buffer hourly data for every day in the unit
+    buffered_rows: list[tuple] = []
+    for unit_day in unit_days:
+        for sensor_hour_info in get_historical_day(sensor_location, unit_day, rate_limiter):
+            buffered_rows.append(get_weather_data_params(
+                sensor_id, get_observation_timestamp(sensor_hour_info['time_epoch']), sensor_hour_info
+            ))
+
+    # Only days already over at the location are complete; its present day is fetched again (replacing its rows)
+    # on every run
+    ingested_days: list[tuple[int, date]] = [
+        (sensor_id, unit_day.date()) for unit_day in unit_days if unit_day.date() < location_date
+    ]
+    includes_present_day: bool = len(ingested_days) < len(unit_days)
+
+    # Add buffered data and the unit's watermarks to database in one transaction
+    return add_sensor_data_entries(
+        worker_state.conn, buffered_rows, worker_state.conn_lock, sensor_name, includes_present_day, ingested_days
+    )
+
 
 def create_historical_data(start_date: Union[datetime, None] = None) -> None:
     global DATABASE_CREATION_PROGRESS
 
-    # Start from one week ago by default
+    # Start from the configured number of days ago by default
     present_date: datetime = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
     if start_date is None:
-        start_date: datetime = present_date - timedelta(days=7)
+        start_date: datetime = present_date - timedelta(days=HISTORICAL_DAYS)
+
+    # Raw readings older than the retention window would only be dropped again
+    if RAW_RETENTION_DAYS > 0:
+        start_date = max(start_date, present_date - timedelta(days=RAW_RETENTION_DAYS))
 
     # Wait a few seconds
     sleep(3)
 
     # Connect to the database
-    hist_conn: connection = connect(
-        host=ENV_DB_HOST, database=ENV_DB_NAME, user=ENV_DB_USER, password=ENV_DB_PASSWORD, port=ENV_DB_PORT
-    )
+    hist_conn: connection = connect_data_generator()
     hist_conn_lock: Lock = Lock()
 
-    # Start the loop
-    num_sensors = len(LOCATION_SET)
-    sensors_completed = 0
-    for sensor_location in LOCATION_SET:
+    # Register sensors and split their missing history into work units of whole days
+    sensor_ids: dict[str, int] = register_sensors(hist_conn, list(LOCATION_SET), hist_conn_lock)
+    sensor_timezones: dict[int, str] = get_sensor_timezones(hist_conn, list(sensor_ids.values()), hist_conn_lock)
+    work_units: list[tuple[str, int, str, list[datetime], date]] = []
+    for sensor_location in sensor_ids:
         # Prepare sensor information
-        sensor_api_link: str = (
-            f'http://api.weatherapi.com/v1/current.json?key={API_KEY}&q={sensor_location}&aqi={GET_AIR_QUALITY}'
-        )
         sensor_name: str = f'sensor_{sensor_location.replace(" ", "_").lower()}'
-        sensor_id, sensor_already_existed = add_sensor_entry(hist_conn, sensor_api_link, hist_conn_lock, sensor_name)
-
-        if sensor_already_existed:
-            sensors_completed += 1
-            continue
+        sensor_id: int = sensor_ids[sensor_location]
+        location_date: date = get_location_date(sensor_timezones[sensor_id])
 
-        # Loop through historical data
+        # Only fetch the days that have not been fully ingested yet, up to the location's present day
+        ingested_days: set[date] = get_ingested_days(hist_conn, sensor_id, hist_conn_lock)
+        missing_days: list[datetime] = []
         cur_date: datetime = deepcopy(start_date)
-        while cur_date <= present_date:
-            # Get hourly data
-            sensor_api_link: str = (
-                f'http://api.weatherapi.com/v1/history.json?'
-                f'key={API_KEY}&q={sensor_location}&dt={cur_date.strftime("%Y-%m-%d")}&aqi={GET_AIR_QUALITY}'
-            )
-            data_by_sensor_hour: list = get(url=sensor_api_link).json()['forecast']['forecastday'][0]['hour']
-
-            # Add hourly data to database
-            for sensor_hour_info in data_by_sensor_hour:
-                sensor_hour_timestamp = datetime.strptime(sensor_hour_info['time'], '%Y-%m-%d %H:%M')
-                add_sensor_data_entry(
-                    hist_conn, sensor_id, sensor_hour_info, hist_conn_lock,
-                    sensor_hour_timestamp.strftime('%Y-%m-%d %H:%M:%S'), sensor_name
-                )
-
-            # Increment date by one day
+        while cur_date.date() <= location_date:
+            if cur_date.date() not in ingested_days:
+                missing_days.append(cur_date)
             cur_date += timedelta(days=1)
 
+        for unit_start in range(0, len(missing_days), HISTORICAL_BATCH_DAYS):
+            unit_days: list[datetime] = missing_days[unit_start:unit_start + HISTORICAL_BATCH_DAYS]
+            work_units.append((sensor_location, sensor_id, sensor_name, unit_days, location_date))
+
+    hist_conn.close()
+
+    # Fetch and write the work units in parallel under the request rate limit
+    rate_limiter: RateLimiter = RateLimiter(HISTORICAL_REQUESTS_PER_SECOND)
+    worker_state: local = local()
+    worker_conns: list[connection] = []
+    worker_conns_lock: Lock = Lock()
+    rows_added = 0
+    units_completed = 0
+    hist_start_time: float = perf_counter()
+    with ThreadPoolExecutor(max_workers=HISTORICAL_WORKER_COUNT, thread_name_prefix='backfill') as executor:
+        unit_futures = [
+            executor.submit(
+                backfill_work_unit, *work_unit, rate_limiter, worker_state, worker_conns, worker_conns_lock
+            )
+            for work_unit in work_units
+        ]
+        for unit_future in as_completed(unit_futures):
+            rows_added += unit_future.result()
+
             # Calculate progress
-            cur_sensor_progress = (present_date - cur_date).total_seconds() / (present_date - start_date).total_seconds()
-            DATABASE_CREATION_PROGRESS = sensors_completed / num_sensors + cur_sensor_progress * (1 / num_sensors)
+            units_completed += 1
+            DATABASE_CREATION_PROGRESS = units_completed / len(work_units)
+            BACKFILL_PROGRESS.set(DATABASE_CREATION_PROGRESS)
 
-        # Increment sensor completion count
-        sensors_completed += 1
+    for worker_conn in worker_conns:
+        worker_conn.close()
+
+    # Report ingestion rate
+    hist_elapsed_seconds: float = perf_counter() - hist_start_time
+    print(f'Added {rows_added} historical rows from {len(work_units)} work units in {hist_elapsed_seconds:.2f} '
+          f'seconds ({rows_added / max(hist_elapsed_seconds, 1e-9):.1f} rows/sec).')
 
     # Finish Database Creation
     DATABASE_CREATION_PROGRESS = 1.0
-    hist_conn.close()
+    BACKFILL_PROGRESS.set(DATABASE_CREATION_PROGRESS)
+
+
+def maintain_partitions(maint_conn: connection, range_start: datetime) -> None:
+    maint_cursor: cursor = maint_conn.cursor()
+    now: datetime = datetime.now(timezone.utc)
+
+    # Create weekly partitions from the given start through the configured number of weeks ahead
+    maint_cursor.execute(
+        'SELECT ensure_weather_partitions(%s, %s)', (range_start, now + timedelta(weeks=PARTITION_WEEKS_AHEAD))
+    )
+    partitions_created: int = maint_cursor.fetchone()[0]
+    maint_conn.commit()
+
+    # Archive expired partitions to Parquet when enabled, then drop them in a short transaction of their own
+    partitions_dropped: int = 0
+    if RAW_RETENTION_DAYS > 0:
+        if ARCHIVE_READINGS == 'yes':
+            archive_closed_days(maint_conn, ARCHIVE_DIR, now - timedelta(days=RAW_RETENTION_DAYS))
+        maint_cursor.execute('SET LOCAL lock_timeout = %s', (EXPIRE_LOCK_TIMEOUT,))
+        maint_cursor.execute('SELECT expire_weather_partitions(%s)', (now - timedelta(days=RAW_RETENTION_DAYS),))
+        partitions_dropped = maint_cursor.fetchone()[0]
+
+        # Commit transaction
+        maint_conn.commit()
+
+        # Minute rollups are only kept as long as the raw readings they summarize
+        maint_cursor.execute('SELECT expire_minute_rollups()')
+        minute_buckets_deleted: int = maint_cursor.fetchone()[0]
+        maint_conn.commit()
+        if minute_buckets_deleted:
+            print(f'Deleted {minute_buckets_deleted} expired minute rollup(s).')
+    print(f'Created {partitions_created} and expired {partitions_dropped} weather data partition(s).')
+
+
+def partition_maintenance_service(stop_event: Event) -> None:
+    # Connect lazily so a lost connection is simply opened again next round
+    maint_conn: Union[connection, None] = None
+
+    # Keep partitions ahead of live ingestion until stopped. A failed round is retried soon, since inserts start
+    # failing once the partitions made ahead run out
+    while not stop_event.is_set():
+        try:
+            if maint_conn is None:
+                maint_conn = connect_data_generator()
+            maintain_partitions(maint_conn, datetime.now(timezone.utc))
+        except (DatabaseError, InterfaceError, OSError) as maint_error:
+            print(f'Partition maintenance failed ({maint_error}). Retrying in {MAINTENANCE_RETRY_SECONDS} seconds.')
+            if maint_conn is not None:
+                maint_conn.close()
+                maint_conn = None
+            stop_event.wait(MAINTENANCE_RETRY_SECONDS)
+            continue
+        stop_event.wait(PARTITION_MAINTENANCE_SECONDS)
+
+    if maint_conn is not None:
+        maint_conn.close()
+
+
+def config_reload_service(stop_event: Event, start_new_sensors: Union[Callable[[list[str]], None], None]) -> None:
+    global LOCATION_SET, SENSOR_INTERVAL_SECONDS, UPDATE_INTERVAL_SECONDS, CONFIG_GENERATION
+
+    # Apply edits to the hot-reloadable settings until stopped; services read these globals on every cycle
+    while not stop_event.wait(CONFIG_RELOAD_SECONDS):
+        changed_settings: dict = reload_config('ingest')
+        if not changed_settings:
+            continue
+
+        old_locations: list[str] = list(LOCATION_SET)
+        LOCATION_SET = changed_settings.get('location_set', LOCATION_SET)
+        SENSOR_INTERVAL_SECONDS = changed_settings.get('sensor_interval_seconds', SENSOR_INTERVAL_SECONDS)
+        UPDATE_INTERVAL_SECONDS = changed_settings.get('update_interval_seconds', UPDATE_INTERVAL_SECONDS)
+        CONFIG_GENERATION += 1
+        print(f'Reloaded {", ".join(changed_settings)} from the config.')
+
+        # Sensor threads for removed locations stop on their own; added locations need new ones
+        added_locations: list[str] = [
+            sensor_location for sensor_location in dict.fromkeys(LOCATION_SET) if sensor_location not in old_locations
+        ]
+        if added_locations and start_new_sensors is not None:
+            start_new_sensors(added_locations)
 
 
 def get_db_create_progress() -> float:
@@ -211,21 +978,75 @@ def get_db_create_progress() -> float:
     return DATABASE_CREATION_PROGRESS
 
 
+def start_detection_threads(sensor_locations: list[str], reading_queue: Queue, stop_event: Event) -> None:
+    # Register every sensor in one pass before the sensor threads start
+    registration_conn: connection = connect_data_generator()
+    sensor_ids: dict[str, int] = register_sensors(registration_conn, sensor_locations, Lock())
+    registration_conn.close()
+
+    for sensor_location, sensor_id in sensor_ids.items():
+        Thread(
+            name=f'sensor_{sensor_location.replace(" ", "_").lower()}',
+            target=weather_detection_service,
+            args=(sensor_location, sensor_id, reading_queue, stop_event,)
+        ).start()
+
+
 def start_sensor_threads(main_stop_event: Event) -> None:
+    # Keep weather data partitions ahead of the sensors
+    Thread(name='partition_maintenance', target=partition_maintenance_service, args=(main_stop_event,)).start()
+
+    # Append readings to a local spool when enabled, replaying them into the database from one thread
+    reading_spool: Union[ReadingSpool, None] = None
+    if SPOOL_READINGS == 'yes':
+        reading_spool = ReadingSpool(SPOOL_PATH, SPOOL_SYNC_WRITES == 'yes')
+        Thread(name='spool_replay', target=spool_replay_service, args=(reading_spool, main_stop_event,)).start()
+
+    # Apply config edits while running; the asyncio and bulk services follow location changes themselves
+    if INGESTION_MODE != 'threads':
+        Thread(name='config_reload', target=config_reload_service, args=(main_stop_event, None)).start()
+
+    # Run every sensor on one event loop when asyncio ingestion is selected
+    if INGESTION_MODE == 'asyncio':
+        Thread(
+            name='sensor_event_loop', target=asyncio.run,
+            args=(async_ingestion_service(reading_spool, main_stop_event),)
+        ).start()
+        return
+
     # Create threads for sensors
     main_conn_lock: Lock = Lock()
-    sensor_threads: dict[str, Thread] = {}
-    for sensor_location in LOCATION_SET:
-        new_sensor_name: str = f'sensor_{sensor_location.replace(" ", "_").lower()}'
-        sensor_threads[new_sensor_name] = Thread(
-            name=new_sensor_name,
-            target=weather_detection_service,
-            args=(sensor_location, main_conn_lock, main_stop_event,)
-        )
-        sensor_threads[new_sensor_name].start()
+
+    # Poll every sensor from one thread through the provider's bulk query when bulk ingestion is selected
+    if INGESTION_MODE == 'bulk':
+        Thread(
+            name='bulk_sensors', target=bulk_weather_detection_service,
+            args=(main_conn_lock, reading_spool, main_stop_event,)
+        ).start()
+        return
+
+    # Sensor threads only fetch; one writer thread drains their readings from a bounded queue
+    reading_queue: Queue = Queue(maxsize=INGEST_QUEUE_SIZE)
+    Thread(
+        name='sensor_writer', target=weather_writer_service, args=(reading_queue, reading_spool, main_stop_event,)
+    ).start()
+
+    # Start a sensor thread per location, and more for locations added to the config while running
+    start_detection_threads(list(dict.fromkeys(LOCATION_SET)), reading_queue, main_stop_event)
+    start_new_sensors = partial(start_detection_threads, reading_queue=reading_queue, stop_event=main_stop_event)
+    Thread(name='config_reload', target=config_reload_service, args=(main_stop_event, start_new_sensors)).start()
 
 
 def start_database(init_stop_event: Event, sensor_stop_event: Event) -> None:
+    # Expose ingestion metrics, including backfill progress, for scraping. Started once here rather than with the
+    # sensor threads, since its thread serves until the process exits
+    start_metrics_server(METRICS_HOST, METRICS_PORT)
+
+    # Create partitions for the historical window and the weeks ahead
+    init_conn: connection = connect_data_generator()
+    maintain_partitions(init_conn, datetime.now(timezone.utc) - timedelta(days=HISTORICAL_DAYS + 1))
+    init_conn.close()
+
     # Get Historical Data
     if GET_HISTORICAL_DATA == 'yes' and not init_stop_event.is_set():
         create_historical_data()
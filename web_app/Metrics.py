@@ -0,0 +1,150 @@
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from threading import Thread, Lock
+from bisect import bisect_left
+from typing import Union
+
+
+# Minimal Prometheus-style metrics for DataGen, served as text from /metrics, e.g.
+#   curl http://localhost:9108/metrics
+# Every update takes one short per-metric lock, so instrumenting the hot path costs well under a microsecond.
+LATENCY_BUCKETS: tuple[float, ...] = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+
+# Every metric created by this module, in creation order
+METRICS: list = []
+
+# The running metrics server, started at most once per process
+METRICS_SERVER: Union[ThreadingHTTPServer, None] = None
+METRICS_SERVER_LOCK: Lock = Lock()
+
+
+def escape_label_value(label_value: str) -> str:
+    return str(label_value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(label_names: tuple[str, ...], label_values: tuple[str, ...], extra_label: str = '') -> str:
+    label_pairs: list[str] = [
+        f'{label_name}="{escape_label_value(label_value)}"'
+        for label_name, label_value in zip(label_names, label_values)
+    ]
+    if extra_label:
+        label_pairs.append(extra_label)
+    return '{' + ','.join(label_pairs) + '}' if label_pairs else ''
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, label_names: tuple[str, ...] = ()) -> None:
+        self.name: str = name
+        self.help_text: str = help_text
+        self.label_names: tuple[str, ...] = label_names
+        self.values: dict[tuple[str, ...], float] = {}
+        self.metric_lock: Lock = Lock()
+        METRICS.append(self)
+
+    def inc(self, *label_values: str, amount: float = 1.0) -> None:
+        with self.metric_lock:
+            self.values[label_values] = self.values.get(label_values, 0.0) + amount
+
+    def render(self) -> list[str]:
+        with self.metric_lock:
+            values: dict[tuple[str, ...], float] = dict(self.values)
+        return [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter'] + [
+            f'{self.name}{format_labels(self.label_names, label_values)} {value}'
+            for label_values, value in sorted(values.items())
+        ]
+
+
+class Gauge:
+    def __init__(self, name: str, help_text: str) -> None:
+        self.name: str = name
+        self.help_text: str = help_text
+        self.value: float = 0.0
+        METRICS.append(self)
+
+    def set(self, value: float) -> None:
+        # A single assignment needs no lock
+        self.value = value
+
+    def render(self) -> list[str]:
+        return [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} gauge', f'{self.name} {self.value}']
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, label_names: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.name: str = name
+        self.help_text: str = help_text
+        self.label_names: tuple[str, ...] = label_names
+        self.buckets: tuple[float, ...] = buckets
+
+        # Per label set: a count for each bucket plus the overflow bucket, and the running sum
+        self.bucket_counts: dict[tuple[str, ...], list[int]] = {}
+        self.sums: dict[tuple[str, ...], float] = {}
+        self.metric_lock: Lock = Lock()
+        METRICS.append(self)
+
+    def observe(self, value: float, *label_values: str) -> None:
+        bucket_index: int = bisect_left(self.buckets, value)
+        with self.metric_lock:
+            if label_values not in self.bucket_counts:
+                self.bucket_counts[label_values] = [0] * (len(self.buckets) + 1)
+                self.sums[label_values] = 0.0
+            self.bucket_counts[label_values][bucket_index] += 1
+            self.sums[label_values] += value
+
+    def render(self) -> list[str]:
+        with self.metric_lock:
+            bucket_counts: dict[tuple[str, ...], list[int]] = {
+                label_values: list(counts) for label_values, counts in self.bucket_counts.items()
+            }
+            sums: dict[tuple[str, ...], float] = dict(self.sums)
+
+        metric_lines: list[str] = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        for label_values, counts in sorted(bucket_counts.items()):
+            # Buckets are exposed as cumulative counts
+            cumulative_count: int = 0
+            for upper_bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative_count += bucket_count
+                bound_label: str = 'le="+Inf"' if upper_bound == float('inf') else f'le="{upper_bound}"'
+                metric_lines.append(
+                    f'{self.name}_bucket{format_labels(self.label_names, label_values, bound_label)} '
+                    f'{cumulative_count}'
+                )
+            metric_lines.append(f'{self.name}_sum{format_labels(self.label_names, label_values)} {sums[label_values]}')
+            metric_lines.append(f'{self.name}_count{format_labels(self.label_names, label_values)} {cumulative_count}')
+        return metric_lines
+
+
+def render_metrics() -> str:
+    return '\n'.join(metric_line for metric in METRICS for metric_line in metric.render()) + '\n'
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        if self.path.split('?', 1)[0] != '/metrics':
+            self.send_error(404)
+            return
+
+        body: bytes = render_metrics().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        # Keep the console quiet when scraped
+        pass
+
+
+def start_metrics_server(host: str, port: int) -> None:
+    global METRICS_SERVER
+
+    # Serve from a daemon thread so the server never keeps the process alive
+    with METRICS_SERVER_LOCK:
+        if METRICS_SERVER is not None or port <= 0:
+            return
+        METRICS_SERVER = ThreadingHTTPServer((host, port), MetricsHandler)
+        Thread(name='metrics_server', target=METRICS_SERVER.serve_forever, daemon=True).start()
+    print(f'Serving ingestion metrics on http://{host}:{port}/metrics')
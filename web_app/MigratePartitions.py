@@ -0,0 +1,275 @@
+from argparse import ArgumentParser
+from os import getenv
+from os.path import dirname, join, abspath
+from time import sleep
+from datetime import datetime, timedelta, timezone
+from psycopg2 import connect
+from psycopg2.extensions import connection, cursor
+
+
+# Online conversion of a TIMESTAMPTZ weather_data heap table (see MigrateTimestamps.py) to the partitioned schema
+# in init.sql. Run it as the database owner while the existing DataGen keeps ingesting:
+#   python MigratePartitions.py --host localhost --port 8000 --user postgres --password iot_admin
+# The existing table is not copied. It becomes the weather_data_legacy partition, holding every time before a
+# week boundary a little ahead, and weekly partitions take over from there. Only metadata changes hold
+# ACCESS EXCLUSIVE, under a lock timeout. The legacy partition is dropped as a whole once its newest week passes
+# the retention window. Run the script again after deploying the new DataGen, so the rollups also cover rows the
+# old DataGen wrote meanwhile. It can be re-run after an interruption and picks up where it stopped.
+INIT_SQL_PATH: str = join(dirname(abspath(__file__)), '..', 'init.sql')
+
+# Objects from init.sql that a database at the TIMESTAMPTZ schema lacks
+NEW_TABLES: tuple[str, ...] = ('weather_partitions', 'weather_rollups', 'wind_dir_rollups', 'backfill_days')
+
+# Weeks between the start of the current week and where the weekly partitions take over from the legacy one, so
+# the range check added to the live table never rejects a reading before the swap
+CUTOVER_WEEKS_AHEAD: int = 2
+
+
+def read_init_statements(init_path: str) -> list[str]:
+    # Split init.sql into statements, keeping function bodies between $$ quotes whole
+    init_statements: list[str] = []
+    statement_lines: list[str] = []
+    in_body: bool = False
+    with open(init_path) as init_file:
+        for init_line in init_file:
+            if not statement_lines and (not init_line.strip() or init_line.lstrip().startswith('--')):
+                continue
+            statement_lines.append(init_line)
+            if init_line.count('$$') % 2:
+                in_body = not in_body
+            if not in_body and init_line.rstrip().endswith(';'):
+                init_statements.append(''.join(statement_lines).strip())
+                statement_lines = []
+    return init_statements
+
+
+def get_table_kind(migrate_cursor: cursor, table_name: str) -> str:
+    migrate_cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", (table_name,))
+    table_row = migrate_cursor.fetchone()
+    return table_row[0] if table_row else ''
+
+
+def create_missing_objects(migrate_conn: connection, init_path: str) -> None:
+    # New tables are created empty and functions are (re)defined straight from init.sql
+    migrate_cursor: cursor = migrate_conn.cursor()
+    for init_statement in read_init_statements(init_path):
+        if any(init_statement.startswith(f'CREATE TABLE {table_name} ') for table_name in NEW_TABLES):
+            migrate_cursor.execute(init_statement.replace('CREATE TABLE', 'CREATE TABLE IF NOT EXISTS', 1))
+        elif init_statement.startswith('CREATE FUNCTION'):
+            migrate_cursor.execute(init_statement.replace('CREATE FUNCTION', 'CREATE OR REPLACE FUNCTION', 1))
+        elif init_statement.startswith(('REVOKE EXECUTE', 'GRANT EXECUTE')):
+            migrate_cursor.execute(init_statement)
+    for table_name in NEW_TABLES:
+        migrate_cursor.execute(f'GRANT SELECT, INSERT, UPDATE, DELETE ON {table_name} TO data_generator')
+        migrate_cursor.execute(f'GRANT SELECT ON {table_name} TO web_viewer')
+    migrate_conn.commit()
+    print(f'Created {", ".join(NEW_TABLES)} and the init.sql functions where missing.')
+
+
+def add_sensor_name_key(migrate_conn: connection) -> None:
+    # Registration upserts on sensor_name, so it needs a unique constraint
+    migrate_cursor: cursor = migrate_conn.cursor()
+    migrate_cursor.execute(
+        "SELECT 1 FROM pg_constraint WHERE conrelid = 'sensors'::regclass AND conname = 'sensors_sensor_name_key'"
+    )
+    if migrate_cursor.fetchone():
+        migrate_conn.commit()
+        return
+    migrate_cursor.execute("SELECT sensor_name FROM sensors GROUP BY sensor_name HAVING COUNT(*) > 1")
+    duplicate_names: list[str] = [name_row[0] for name_row in migrate_cursor.fetchall()]
+    migrate_conn.commit()
+    if duplicate_names:
+        raise ValueError(f'sensors holds duplicate sensor names, merge them first: {", ".join(duplicate_names)}.')
+
+    migrate_conn.autocommit = True
+    migrate_cursor.execute("DROP INDEX CONCURRENTLY IF EXISTS sensors_sensor_name_key")
+    migrate_cursor.execute("CREATE UNIQUE INDEX CONCURRENTLY sensors_sensor_name_key ON sensors (sensor_name)")
+    migrate_cursor.execute(
+        "ALTER TABLE sensors ADD CONSTRAINT sensors_sensor_name_key UNIQUE USING INDEX sensors_sensor_name_key"
+    )
+    migrate_conn.autocommit = False
+    print('Added the unique sensor_name constraint.')
+
+
+def get_cutover_time() -> datetime:
+    now: datetime = datetime.now(timezone.utc)
+    week_start: datetime = datetime.combine(now.date() - timedelta(days=now.weekday()), datetime.min.time(),
+                                            tzinfo=timezone.utc)
+    return week_start + timedelta(weeks=CUTOVER_WEEKS_AHEAD)
+
+
+def prepare_legacy_table(migrate_conn: connection, cutover_time: datetime, lock_timeout: str) -> None:
+    # The partitioned key needs time_recorded, and a validated range check lets the attach skip its scan. CONCURRENTLY
+    # and VALIDATE keep inserts flowing while the table is scanned
+    migrate_conn.autocommit = True
+    migrate_cursor: cursor = migrate_conn.cursor()
+    migrate_cursor.execute("DROP INDEX CONCURRENTLY IF EXISTS weather_data_legacy_pkey")
+    migrate_cursor.execute(
+        "CREATE UNIQUE INDEX CONCURRENTLY weather_data_legacy_pkey ON weather_data (data_id, time_recorded)"
+    )
+    migrate_conn.autocommit = False
+
+    migrate_cursor.execute("SET LOCAL lock_timeout = %s", (lock_timeout,))
+    migrate_cursor.execute("ALTER TABLE weather_data DROP CONSTRAINT IF EXISTS weather_data_legacy_range")
+    migrate_cursor.execute(
+        "ALTER TABLE weather_data ADD CONSTRAINT weather_data_legacy_range CHECK (time_recorded < %s) NOT VALID",
+        (cutover_time,)
+    )
+    migrate_conn.commit()
+    migrate_cursor.execute("ALTER TABLE weather_data VALIDATE CONSTRAINT weather_data_legacy_range")
+    migrate_conn.commit()
+    print(f'Built (data_id, time_recorded) index and validated readings end before {cutover_time}.')
+
+
+def create_partitioned_table(migrate_conn: connection) -> None:
+    # An empty copy of the columns, sharing the data_id sequence; any leftover from an interrupted run is empty too
+    migrate_cursor: cursor = migrate_conn.cursor()
+    migrate_cursor.execute("DROP TABLE IF EXISTS weather_data_partitioned")
+    migrate_cursor.execute(
+        "CREATE TABLE weather_data_partitioned (LIKE weather_data INCLUDING DEFAULTS) "
+        "PARTITION BY RANGE (time_recorded)"
+    )
+    migrate_cursor.execute(
+        "ALTER TABLE weather_data_partitioned "
+        "ADD CONSTRAINT weather_data_partitioned_pkey PRIMARY KEY (data_id, time_recorded), "
+        "ADD CONSTRAINT weather_data_partitioned_sensor_id_time_recorded_key UNIQUE (sensor_id, time_recorded), "
+        "ADD CONSTRAINT weather_data_partitioned_sensor_id_fkey FOREIGN KEY (sensor_id) REFERENCES sensors(sensor_id)"
+    )
+    migrate_cursor.execute("GRANT SELECT, INSERT, UPDATE, DELETE ON weather_data_partitioned TO data_generator")
+    migrate_cursor.execute("GRANT SELECT ON weather_data_partitioned TO web_viewer")
+    migrate_conn.commit()
+    print('Created the empty partitioned table.')
+
+
+def swap_in_partitioned_table(migrate_conn: connection, cutover_time: datetime, lock_timeout: str) -> None:
+    # Every statement here is metadata-only: the prepared index becomes the legacy table's key, the tables trade
+    # names, and the legacy table is attached without a scan thanks to the validated range check
+    migrate_cursor: cursor = migrate_conn.cursor()
+    migrate_cursor.execute("SET LOCAL lock_timeout = %s", (lock_timeout,))
+    migrate_cursor.execute("LOCK TABLE weather_data IN ACCESS EXCLUSIVE MODE")
+    migrate_cursor.execute(
+        "SELECT conname FROM pg_constraint WHERE conrelid = 'weather_data'::regclass AND contype = 'p'"
+    )
+    old_primary_key: str = migrate_cursor.fetchone()[0]
+    migrate_cursor.execute(f'ALTER TABLE weather_data DROP CONSTRAINT "{old_primary_key}"')
+    migrate_cursor.execute(
+        "ALTER TABLE weather_data ADD CONSTRAINT weather_data_legacy_pkey "
+        "PRIMARY KEY USING INDEX weather_data_legacy_pkey"
+    )
+    migrate_cursor.execute(
+        "ALTER TABLE weather_data RENAME CONSTRAINT weather_data_sensor_id_time_recorded_key "
+        "TO weather_data_legacy_sensor_id_time_recorded_key"
+    )
+    migrate_cursor.execute("ALTER TABLE weather_data RENAME TO weather_data_legacy")
+    migrate_cursor.execute("ALTER TABLE weather_data_partitioned RENAME TO weather_data")
+    migrate_cursor.execute(
+        "ALTER TABLE weather_data RENAME CONSTRAINT weather_data_partitioned_pkey TO weather_data_pkey"
+    )
+    migrate_cursor.execute(
+        "ALTER TABLE weather_data RENAME CONSTRAINT weather_data_partitioned_sensor_id_time_recorded_key "
+        "TO weather_data_sensor_id_time_recorded_key"
+    )
+    migrate_cursor.execute(
+        "ALTER TABLE weather_data RENAME CONSTRAINT weather_data_partitioned_sensor_id_fkey "
+        "TO weather_data_sensor_id_fkey"
+    )
+
+    # The sequence must outlive the legacy partition, which retention drops eventually
+    migrate_cursor.execute("ALTER SEQUENCE weather_data_data_id_seq OWNED BY weather_data.data_id")
+    migrate_cursor.execute(
+        "ALTER TABLE weather_data ATTACH PARTITION weather_data_legacy FOR VALUES FROM (MINVALUE) TO (%s)",
+        (cutover_time,)
+    )
+    migrate_cursor.execute("ALTER TABLE weather_data_legacy DROP CONSTRAINT weather_data_legacy_range")
+    migrate_cursor.execute(
+        "INSERT INTO weather_partitions VALUES ('weather_data_legacy', '-infinity', %s) ON CONFLICT DO NOTHING",
+        (cutover_time,)
+    )
+    migrate_conn.commit()
+    print(f'Swapped in the partitioned weather_data, with the old table as its partition before {cutover_time}.')
+
+
+def ensure_partitions_ahead(migrate_conn: connection, weeks_ahead: int) -> None:
+    migrate_cursor: cursor = migrate_conn.cursor()
+    now: datetime = datetime.now(timezone.utc)
+    migrate_cursor.execute('SELECT ensure_weather_partitions(%s, %s)', (now, now + timedelta(weeks=weeks_ahead)))
+    partitions_created: int = migrate_cursor.fetchone()[0]
+    migrate_conn.commit()
+    print(f'Created {partitions_created} weekly partition(s).')
+
+
+def backfill_rollups(migrate_conn: connection, pause_seconds: float) -> None:
+    migrate_cursor: cursor = migrate_conn.cursor()
+    migrate_cursor.execute("SELECT sensor_id FROM sensors ORDER BY sensor_id")
+    sensor_ids: list[int] = [sensor_row[0] for sensor_row in migrate_cursor.fetchall()]
+    migrate_conn.commit()
+
+    # Refresh one sensor and UTC day per transaction, resuming from the newest day already rolled up
+    days_refreshed: int = 0
+    end_time: datetime = datetime.now(timezone.utc)
+    for sensor_id in sensor_ids:
+        migrate_cursor.execute(
+            "SELECT COALESCE((SELECT MAX(bucket_start) FROM weather_rollups "
+            "WHERE resolution = 'day' AND sensor_id = %(sensor_id)s), "
+            "(SELECT MIN(time_recorded) FROM weather_data WHERE sensor_id = %(sensor_id)s))",
+            {'sensor_id': sensor_id}
+        )
+        start_time: datetime = migrate_cursor.fetchone()[0]
+        migrate_conn.commit()
+        if start_time is None:
+            continue
+
+        day_start: datetime = datetime.combine(start_time.astimezone(timezone.utc).date(), datetime.min.time(),
+                                               tzinfo=timezone.utc)
+        while day_start <= end_time:
+            migrate_cursor.execute(
+                'SELECT refresh_weather_rollups(%s, %s, %s)',
+                ([sensor_id], day_start, day_start + timedelta(days=1) - timedelta(microseconds=1))
+            )
+            migrate_conn.commit()
+            days_refreshed += 1
+            day_start += timedelta(days=1)
+            sleep(pause_seconds)
+        print(f'Rolled up sensor {sensor_id} from {start_time}.')
+    print(f'Refreshed {days_refreshed} sensor day(s) of rollups.')
+
+
+def migrate_partitions(migrate_conn: connection, init_path: str, weeks_ahead: int, pause_seconds: float,
+                       lock_timeout: str) -> None:
+    create_missing_objects(migrate_conn, init_path)
+    add_sensor_name_key(migrate_conn)
+
+    migrate_cursor: cursor = migrate_conn.cursor()
+    table_kind: str = get_table_kind(migrate_cursor, 'weather_data')
+    migrate_conn.commit()
+    if table_kind == 'p':
+        print('weather_data is already partitioned.')
+    else:
+        cutover_time: datetime = get_cutover_time()
+        prepare_legacy_table(migrate_conn, cutover_time, lock_timeout)
+        create_partitioned_table(migrate_conn)
+        swap_in_partitioned_table(migrate_conn, cutover_time, lock_timeout)
+
+    ensure_partitions_ahead(migrate_conn, weeks_ahead)
+    backfill_rollups(migrate_conn, pause_seconds)
+    print('Done. Deploy the current DataGen, then run this again to roll up what the old one wrote meanwhile.')
+
+
+if __name__ == '__main__':
+    arg_parser: ArgumentParser = ArgumentParser(description='Convert weather_data to the partitioned schema.')
+    arg_parser.add_argument('--host', default='localhost')
+    arg_parser.add_argument('--port', type=int, default=8000)
+    arg_parser.add_argument('--database', default='postgres')
+    arg_parser.add_argument('--user', default='postgres')
+    arg_parser.add_argument('--password', default=getenv('PGPASSWORD', ''))
+    arg_parser.add_argument('--init-sql', default=INIT_SQL_PATH)
+    arg_parser.add_argument('--weeks-ahead', type=int, default=2)
+    arg_parser.add_argument('--pause-seconds', type=float, default=0.1)
+    arg_parser.add_argument('--lock-timeout', default='5s')
+    args = arg_parser.parse_args()
+
+    main_conn: connection = connect(
+        host=args.host, database=args.database, user=args.user, password=args.password, port=args.port
+    )
+    migrate_partitions(main_conn, args.init_sql, args.weeks_ahead, args.pause_seconds, args.lock_timeout)
+    main_conn.close()
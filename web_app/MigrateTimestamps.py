@@ -0,0 +1,161 @@
+from argparse import ArgumentParser
+from os import getenv
+from time import sleep
+from psycopg2 import connect
+from psycopg2.extensions import connection, cursor
+from MigratePartitions import migrate_partitions, INIT_SQL_PATH
+
+
+# Online migration of weather_data.time_recorded from VARCHAR(50) to TIMESTAMPTZ. Run it as the database owner
+# while the existing DataGen keeps ingesting, then deploy the current DataGen and WebApp:
+#   python MigrateTimestamps.py --host localhost --port 8000 --user postgres --password iot_admin
+# Every step only holds short locks. Old strings are local times at the sensor, so they are converted using
+# sensors.sensor_timezone. The script can be re-run after an interruption and picks up where it stopped.
+# Once the column is swapped, MigratePartitions.py carries on to the partitioned schema of the current init.sql.
+SYNC_FUNCTION_QUERY: str = """
+    CREATE OR REPLACE FUNCTION sync_time_recorded_tz() RETURNS trigger AS $$
+    BEGIN
+        NEW.time_recorded_tz := NEW.time_recorded::timestamp AT TIME ZONE (
+            SELECT sensor_timezone FROM sensors WHERE sensor_id = NEW.sensor_id
+        );
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql
+"""
+
+
+def get_column_type(migrate_cursor: cursor, column_name: str) -> str:
+    migrate_cursor.execute(
+        "SELECT data_type FROM information_schema.columns WHERE table_name = 'weather_data' AND column_name = %s",
+        (column_name,)
+    )
+    column_row = migrate_cursor.fetchone()
+    return column_row[0] if column_row else ''
+
+
+def add_shadow_column(migrate_conn: connection) -> None:
+    # Adding a nullable column and a trigger are metadata-only changes
+    migrate_cursor: cursor = migrate_conn.cursor()
+    migrate_cursor.execute("ALTER TABLE weather_data ADD COLUMN IF NOT EXISTS time_recorded_tz TIMESTAMPTZ")
+    migrate_cursor.execute(SYNC_FUNCTION_QUERY)
+    migrate_cursor.execute("DROP TRIGGER IF EXISTS sync_time_recorded_tz ON weather_data")
+    migrate_cursor.execute(
+        "CREATE TRIGGER sync_time_recorded_tz BEFORE INSERT OR UPDATE OF time_recorded ON weather_data "
+        "FOR EACH ROW EXECUTE FUNCTION sync_time_recorded_tz()"
+    )
+    migrate_conn.commit()
+    print('Added time_recorded_tz column and sync trigger.')
+
+
+def backfill_shadow_column(migrate_conn: connection, batch_size: int, pause_seconds: float) -> None:
+    migrate_cursor: cursor = migrate_conn.cursor()
+    migrate_cursor.execute("SELECT COALESCE(MIN(data_id), 0), COALESCE(MAX(data_id), 0) FROM weather_data")
+    min_data_id, max_data_id = migrate_cursor.fetchone()
+    migrate_conn.commit()
+
+    # Convert one primary key range per transaction so row locks are held briefly
+    rows_converted: int = 0
+    for batch_start in range(min_data_id, max_data_id + 1, batch_size):
+        migrate_cursor.execute(
+            "UPDATE weather_data AS w "
+            "SET time_recorded_tz = w.time_recorded::timestamp AT TIME ZONE s.sensor_timezone "
+            "FROM sensors AS s "
+            "WHERE s.sensor_id = w.sensor_id AND w.data_id >= %s AND w.data_id < %s "
+            "AND w.time_recorded_tz IS NULL",
+            (batch_start, batch_start + batch_size)
+        )
+        rows_converted += migrate_cursor.rowcount
+        migrate_conn.commit()
+        print(f'Converted {rows_converted} rows (data_id up to {min(batch_start + batch_size - 1, max_data_id)}).')
+        sleep(pause_seconds)
+
+
+def remove_duplicate_readings(migrate_conn: connection) -> None:
+    # Databases created before the unique constraint may hold the same observation more than once
+    migrate_cursor: cursor = migrate_conn.cursor()
+    migrate_cursor.execute("SELECT sensor_id FROM sensors ORDER BY sensor_id")
+    sensor_ids: list[int] = [sensor_row[0] for sensor_row in migrate_cursor.fetchall()]
+    for sensor_id in sensor_ids:
+        migrate_cursor.execute(
+            "DELETE FROM weather_data AS a USING weather_data AS b "
+            "WHERE a.sensor_id = %s AND b.sensor_id = a.sensor_id "
+            "AND a.time_recorded_tz = b.time_recorded_tz AND a.data_id > b.data_id",
+            (sensor_id,)
+        )
+        if migrate_cursor.rowcount:
+            print(f'Removed {migrate_cursor.rowcount} duplicate readings from sensor {sensor_id}.')
+        migrate_conn.commit()
+
+
+def build_index_and_check(migrate_conn: connection) -> None:
+    # CONCURRENTLY and VALIDATE keep inserts flowing while the table is scanned
+    migrate_conn.autocommit = True
+    migrate_cursor: cursor = migrate_conn.cursor()
+    migrate_cursor.execute("DROP INDEX CONCURRENTLY IF EXISTS weather_data_sensor_time_tz_key")
+    migrate_cursor.execute(
+        "CREATE UNIQUE INDEX CONCURRENTLY weather_data_sensor_time_tz_key "
+        "ON weather_data (sensor_id, time_recorded_tz)"
+    )
+    migrate_cursor.execute("ALTER TABLE weather_data DROP CONSTRAINT IF EXISTS time_recorded_tz_not_null")
+    migrate_cursor.execute(
+        "ALTER TABLE weather_data ADD CONSTRAINT time_recorded_tz_not_null "
+        "CHECK (time_recorded_tz IS NOT NULL) NOT VALID"
+    )
+    migrate_cursor.execute("ALTER TABLE weather_data VALIDATE CONSTRAINT time_recorded_tz_not_null")
+    migrate_conn.autocommit = False
+    print('Built (sensor_id, time_recorded_tz) index and validated not-null check.')
+
+
+def swap_columns(migrate_conn: connection, lock_timeout: str) -> None:
+    # Every statement here is metadata-only; SET NOT NULL reuses the validated check instead of scanning
+    migrate_cursor: cursor = migrate_conn.cursor()
+    migrate_cursor.execute("SET LOCAL lock_timeout = %s", (lock_timeout,))
+    migrate_cursor.execute("LOCK TABLE weather_data IN ACCESS EXCLUSIVE MODE")
+    migrate_cursor.execute("ALTER TABLE weather_data ALTER COLUMN time_recorded_tz SET NOT NULL")
+    migrate_cursor.execute("ALTER TABLE weather_data DROP CONSTRAINT time_recorded_tz_not_null")
+    migrate_cursor.execute("DROP TRIGGER sync_time_recorded_tz ON weather_data")
+    migrate_cursor.execute("DROP FUNCTION sync_time_recorded_tz()")
+    migrate_cursor.execute("ALTER TABLE weather_data DROP COLUMN time_recorded")
+    migrate_cursor.execute("ALTER TABLE weather_data RENAME COLUMN time_recorded_tz TO time_recorded")
+    migrate_cursor.execute(
+        "ALTER TABLE weather_data ADD CONSTRAINT weather_data_sensor_id_time_recorded_key "
+        "UNIQUE USING INDEX weather_data_sensor_time_tz_key"
+    )
+    migrate_conn.commit()
+    print('Swapped time_recorded to TIMESTAMPTZ.')
+
+
+def migrate_timestamps(migrate_conn: connection, batch_size: int, pause_seconds: float, lock_timeout: str) -> None:
+    migrate_cursor: cursor = migrate_conn.cursor()
+    if get_column_type(migrate_cursor, 'time_recorded') == 'timestamp with time zone':
+        print('weather_data.time_recorded is already TIMESTAMPTZ.')
+        return
+    migrate_conn.commit()
+
+    add_shadow_column(migrate_conn)
+    backfill_shadow_column(migrate_conn, batch_size, pause_seconds)
+    remove_duplicate_readings(migrate_conn)
+    build_index_and_check(migrate_conn)
+    swap_columns(migrate_conn, lock_timeout)
+
+
+if __name__ == '__main__':
+    arg_parser: ArgumentParser = ArgumentParser(description='Convert weather_data.time_recorded to TIMESTAMPTZ.')
+    arg_parser.add_argument('--host', default='localhost')
+    arg_parser.add_argument('--port', type=int, default=8000)
+    arg_parser.add_argument('--database', default='postgres')
+    arg_parser.add_argument('--user', default='postgres')
+    arg_parser.add_argument('--password', default=getenv('PGPASSWORD', ''))
+    arg_parser.add_argument('--batch-size', type=int, default=10000)
+    arg_parser.add_argument('--pause-seconds', type=float, default=0.1)
+    arg_parser.add_argument('--lock-timeout', default='5s')
+    arg_parser.add_argument('--init-sql', default=INIT_SQL_PATH)
+    arg_parser.add_argument('--weeks-ahead', type=int, default=2)
+    args = arg_parser.parse_args()
+
+    main_conn: connection = connect(
+        host=args.host, database=args.database, user=args.user, password=args.password, port=args.port
+    )
+    migrate_timestamps(main_conn, args.batch_size, args.pause_seconds, args.lock_timeout)
+    migrate_partitions(main_conn, args.init_sql, args.weeks_ahead, args.pause_seconds, args.lock_timeout)
+    main_conn.close()
@@ -0,0 +1,165 @@
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from argparse import ArgumentParser
+from threading import Lock
+from time import sleep, time
+from datetime import datetime, timedelta
+from random import Random
+from zlib import crc32
+from json import dumps, loads
+
+
+# Stand-in for api.weatherapi.com so DataGen can be exercised locally, e.g.
+#   python MockWeatherApi.py --port 8090
+#   WEATHER_API_BASE_URL=http://localhost:8090/v1 python DataGen.py
+# Responses can be delayed by a base latency plus gaussian jitter to resemble the real provider.
+WIND_DIRECTIONS: list[str] = [
+    'N', 'NNE', 'NE', 'ENE', 'E', 'ESE', 'SE', 'SSE', 'S', 'SSW', 'SW', 'WSW', 'W', 'WNW', 'NW', 'NNW'
+]
+
+# Request counts by endpoint, served from /stats
+REQUEST_COUNTS: dict[str, int] = {}
+REQUEST_COUNTS_LOCK: Lock = Lock()
+
+
+def get_location_info(location: str) -> dict:
+    # Derive stable coordinates from the location name
+    location_rng: Random = Random(crc32(location.encode()))
+    return {
+        'name': location, 'region': 'Maryland', 'country': 'United States of America',
+        'lat': round(38.0 + location_rng.random() * 2, 4), 'lon': round(-78.0 + location_rng.random() * 2, 4),
+        'tz_id': 'America/New_York', 'localtime': datetime.now().strftime('%Y-%m-%d %H:%M')
+    }
+
+
+def get_weather_info(location: str, observed_at: datetime) -> dict:
+    # Seed on location and observation time so repeated requests return the same reading
+    weather_rng: Random = Random(crc32(f'{location}|{observed_at.isoformat()}'.encode()))
+    temp_c: float = round(10 + 12 * weather_rng.random(), 1)
+    wind_kph: float = round(30 * weather_rng.random(), 1)
+    wind_degree: int = weather_rng.randrange(360)
+    pressure_mb: float = round(995 + 30 * weather_rng.random(), 1)
+    precip_mm: float = round(max(0.0, weather_rng.gauss(0, 1)), 2)
+    return {
+        'temp_c': temp_c, 'temp_f': round(temp_c * 9 / 5 + 32, 1),
+        'wind_mph': round(wind_kph / 1.609, 1), 'wind_kph': wind_kph,
+        'wind_degree': wind_degree, 'wind_dir': WIND_DIRECTIONS[round(wind_degree / 22.5) % 16],
+        'pressure_mb': pressure_mb, 'pressure_in': round(pressure_mb * 0.02953, 2),
+        'precip_mm': precip_mm, 'precip_in': round(precip_mm / 25.4, 2),
+        'humidity': weather_rng.randrange(20, 100), 'uv': round(11 * weather_rng.random(), 1)
+    }
+
+
+def get_current_payload(location: str, refresh_seconds: int = 900) -> dict:
+    # The provider refreshes current conditions every 15 minutes; a shorter interval yields a new reading more often
+    now_epoch: int = int(time())
+    last_updated: datetime = datetime.fromtimestamp(now_epoch - now_epoch % refresh_seconds)
+    current_info: dict = get_weather_info(location, last_updated)
+    # Keep seconds when refreshing faster than once a minute so each refresh is told apart
+    updated_format: str = '%Y-%m-%d %H:%M:%S' if refresh_seconds < 60 else '%Y-%m-%d %H:%M'
+    current_info['last_updated'] = last_updated.strftime(updated_format)
+    current_info['last_updated_epoch'] = int(last_updated.timestamp())
+    return {'location': get_location_info(location), 'current': current_info}
+
+
+def get_history_payload(location: str, day: str) -> dict:
+    day_start: datetime = datetime.strptime(day, '%Y-%m-%d')
+    hour_infos: list[dict] = []
+    for hour in range(24):
+        hour_time: datetime = day_start + timedelta(hours=hour)
+        hour_info: dict = get_weather_info(location, hour_time)
+        hour_info['time'] = hour_time.strftime('%Y-%m-%d %H:%M')
+        hour_info['time_epoch'] = int(hour_time.timestamp())
+        hour_infos.append(hour_info)
+    return {
+        'location': get_location_info(location),
+        'forecast': {'forecastday': [{'date': day, 'hour': hour_infos}]}
+    }
+
+
+class MockWeatherHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        parsed_url = urlparse(self.path)
+        query: dict[str, list[str]] = parse_qs(parsed_url.query)
+        endpoint: str = parsed_url.path.rsplit('/', 1)[-1]
+
+        if endpoint != 'stats':
+            with REQUEST_COUNTS_LOCK:
+                REQUEST_COUNTS[endpoint] = REQUEST_COUNTS.get(endpoint, 0) + 1
+            self.delay_response()
+
+        if endpoint == 'current.json':
+            self.send_json(get_current_payload(query['q'][0], self.server.refresh_seconds))
+        elif endpoint == 'history.json':
+            self.send_json(get_history_payload(query['q'][0], query['dt'][0]))
+        elif endpoint == 'stats':
+            with REQUEST_COUNTS_LOCK:
+                self.send_json(dict(REQUEST_COUNTS))
+        else:
+            self.send_json({'error': {'code': 1005, 'message': 'API request url is invalid.'}}, 400)
+
+    def do_POST(self) -> None:
+        parsed_url = urlparse(self.path)
+        query: dict[str, list[str]] = parse_qs(parsed_url.query)
+        endpoint: str = parsed_url.path.rsplit('/', 1)[-1]
+        body: dict = loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+
+        with REQUEST_COUNTS_LOCK:
+            REQUEST_COUNTS[f'{endpoint}:bulk'] = REQUEST_COUNTS.get(f'{endpoint}:bulk', 0) + 1
+        self.delay_response()
+
+        # Bulk requests answer every tagged location in one response
+        if endpoint == 'current.json' and query.get('q') == ['bulk']:
+            bulk_entries: list[dict] = []
+            for bulk_location in body['locations']:
+                location_payload: dict = get_current_payload(bulk_location['q'], self.server.refresh_seconds)
+                location_payload['q'] = bulk_location['q']
+                location_payload['custom_id'] = bulk_location.get('custom_id')
+                bulk_entries.append({'query': location_payload})
+            self.send_json({'bulk': bulk_entries})
+        else:
+            self.send_json({'error': {'code': 1005, 'message': 'API request url is invalid.'}}, 400)
+
+    def delay_response(self) -> None:
+        # Simulate network and provider time
+        delay_seconds: float = self.server.latency_seconds + self.server.jitter_rng.gauss(0, self.server.jitter_seconds)
+        if delay_seconds > 0:
+            sleep(delay_seconds)
+
+    def send_json(self, payload: dict, status: int = 200) -> None:
+        body: bytes = dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        # Keep the console quiet under load
+        pass
+
+
+def start_mock_server(host: str = '127.0.0.1', port: int = 8090, latency_seconds: float = 0.0,
+                      jitter_seconds: float = 0.0, refresh_seconds: int = 900) -> ThreadingHTTPServer:
+    mock_server: ThreadingHTTPServer = ThreadingHTTPServer((host, port), MockWeatherHandler)
+    mock_server.latency_seconds = latency_seconds
+    mock_server.jitter_seconds = jitter_seconds
+    mock_server.jitter_rng = Random(0)
+    mock_server.refresh_seconds = refresh_seconds
+    return mock_server
+
+
+if __name__ == '__main__':
+    arg_parser: ArgumentParser = ArgumentParser(description='Local stand-in for the weather API.')
+    arg_parser.add_argument('--host', default='127.0.0.1')
+    arg_parser.add_argument('--port', type=int, default=8090)
+    arg_parser.add_argument('--latency-ms', type=float, default=0.0)
+    arg_parser.add_argument('--jitter-ms', type=float, default=0.0)
+    arg_parser.add_argument('--refresh-seconds', type=int, default=900)
+    args = arg_parser.parse_args()
+
+    mock_server: ThreadingHTTPServer = start_mock_server(
+        args.host, args.port, args.latency_ms / 1000, args.jitter_ms / 1000, args.refresh_seconds
+    )
+    print(f'Mock weather API listening on http://{args.host}:{args.port}/v1')
+    mock_server.serve_forever()
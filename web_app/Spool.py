@@ -0,0 +1,82 @@
+from os import makedirs, replace, fsync
+from os.path import dirname, exists, getsize
+from threading import Lock
+from datetime import datetime
+from json import dumps, loads
+
+
+class ReadingSpool:
+    def __init__(self, spool_path: str, sync_writes: bool = False) -> None:
+        # Readings are appended as JSON lines; the replay offset is kept next to the spool file
+        self.spool_path: str = spool_path
+        self.offset_path: str = f'{spool_path}.offset'
+        self.rejected_path: str = f'{spool_path}.rejected'
+        self.sync_writes: bool = sync_writes
+        self.spool_lock: Lock = Lock()
+
+        if dirname(spool_path):
+            makedirs(dirname(spool_path), exist_ok=True)
+
+        # Drop a line torn by a crash mid-append so new readings start on a clean line
+        if exists(spool_path):
+            with open(spool_path, 'rb+') as spool_file:
+                spool_bytes: bytes = spool_file.read()
+                spool_file.truncate(spool_bytes.rfind(b'\n') + 1)
+        else:
+            open(spool_path, 'wb').close()
+
+        self.offset: int = int(open(self.offset_path).read()) if exists(self.offset_path) else 0
+        if self.offset > getsize(spool_path):
+            self.offset = 0
+
+    def write_rows(self, file_path: str, data_rows: list[tuple]) -> None:
+        spool_lines: bytes = b''.join(
+            dumps([data_row[0], data_row[1].isoformat(), *data_row[2:]]).encode() + b'\n' for data_row in data_rows
+        )
+        with self.spool_lock:
+            with open(file_path, 'ab') as spool_file:
+                spool_file.write(spool_lines)
+                if self.sync_writes:
+                    spool_file.flush()
+                    fsync(spool_file.fileno())
+
+    def append_rows(self, data_rows: list[tuple]) -> None:
+        self.write_rows(self.spool_path, data_rows)
+
+    def reject_rows(self, data_rows: list[tuple]) -> None:
+        # Keep rows the database refused in the same format next to the spool, for inspection or a manual replay
+        self.write_rows(self.rejected_path, data_rows)
+
+    def read_batch(self, max_rows: int) -> tuple[list[tuple], int]:
+        # Read complete lines after the committed offset, returning the offset just past them
+        data_rows: list[tuple] = []
+        next_offset: int = self.offset
+        with open(self.spool_path, 'rb') as spool_file:
+            spool_file.seek(self.offset)
+            while len(data_rows) < max_rows:
+                spool_line: bytes = spool_file.readline()
+                if not spool_line.endswith(b'\n'):
+                    break
+                spool_values: list = loads(spool_line)
+                data_rows.append((spool_values[0], datetime.fromisoformat(spool_values[1]), *spool_values[2:]))
+                next_offset += len(spool_line)
+
+        return data_rows, next_offset
+
+    def commit_offset(self, next_offset: int) -> None:
+        with self.spool_lock:
+            # Start over once everything has been replayed so the spool does not grow forever. The offset is
+            # saved before truncating, so a crash in between only replays readings the database already ignores
+            spool_drained: bool = next_offset >= getsize(self.spool_path)
+            if spool_drained:
+                next_offset = 0
+
+            with open(f'{self.offset_path}.tmp', 'w') as offset_file:
+                offset_file.write(str(next_offset))
+            replace(f'{self.offset_path}.tmp', self.offset_path)
+            if spool_drained:
+                open(self.spool_path, 'wb').close()
+            self.offset = next_offset
+
+    def pending_bytes(self) -> int:
+        return getsize(self.spool_path) - self.offset
@@ -1,55 +1,397 @@
 import streamlit as st
 import pandas as pd
-from DataGen import UPDATE_INTERVAL_SECONDS
-from streamlit_autorefresh import st_autorefresh
-from collections import Counter
-from datetime import datetime, timedelta
-from threading import Thread, Event
-from time import sleep
-
-
-def get_avg_metric(conn_string: str, timestamps_by_sensor: pd.DataFrame, col_n, selected_unit: str,
-                   selected_unit_modifier: str, metric_title: str, delta=None) -> None:
-    timestamps_by_sensor = timestamps_by_sensor.values.tolist()
-
-    results = []
-    for sensor_id, max_timestamp in timestamps_by_sensor:
-        # cursor.execute(query, (sensor_id, max_timestamp))
-        # results.append(cursor.fetchone()[0])
-        query = (f"SELECT {selected_unit} FROM weather_data "
-                 f"WHERE sensor_id = {sensor_id} AND time_recorded = '{max_timestamp}'")
-        df = pd.read_sql_query(query, conn_string)
-        if not df.empty:
-            results.append(df.iloc[0, 0])
-
-    col_n.metric(metric_title, f'{round(sum(results) / len(results), 2)}{selected_unit_modifier}', delta)
-
-
-def get_hist_section(conn_string: str, start_date_time: datetime, end_date_time: datetime, just_id_choices: list[int],
-                     id_to_locale_map: dict[int, str], measured_unit: str, measured_unit_modifier: str,
-                     title: str, y_label_base: str) -> None:
-    # Create title for plot
-    st.subheader(title)
-
-    # Get data using ids
-    if len(just_id_choices) == 1:
-        query = (f"SELECT sensor_id, time_recorded, {measured_unit} FROM weather_data "
-                 f"WHERE sensor_id = {just_id_choices[0]}")
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine, make_url
+from Config import get_config, get_setting, reload_config
+from ChangeFeed import ReadingHub
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timedelta, time as day_time
+from threading import Thread, Event, Lock, local
+from time import sleep, time, perf_counter
+from json import dumps
+from typing import Union, Callable
+
+
+# Retrieve configuration; the update interval is re-read every rerun so config edits apply without a restart
+web_config: dict = get_config('web')
+UPDATE_INTERVAL_SECONDS: float = web_config['update_interval_seconds']
+SENSOR_CACHE_TTL_SECONDS: float = web_config['sensor_cache_ttl_seconds']
+QUERY_CACHE_MAX_ENTRIES: int = web_config['query_cache_max_entries']
+CHART_MAX_POINTS: int = web_config['chart_max_points']
+ARCHIVE_READINGS: str = web_config['archive_readings']
+ARCHIVE_DIR: str = web_config['archive_dir']
+RENDER_PROFILER: str = web_config['render_profiler']
+RENDER_PROFILE_LOG: str = web_config['render_profile_log']
+DELTA_REFRESH: str = web_config['delta_refresh']
+DELTA_FULL_RELOAD_SECONDS: float = web_config['delta_full_reload_seconds']
+ROLLING_WINDOW_MAX_ROWS: int = web_config['rolling_window_max_rows']
+CHANGE_FEED: str = web_config['change_feed']
+HISTORY_REFRESH_SECONDS: float = web_config['history_refresh_seconds']
+
+# Rollup resolutions maintained by DataGen, finest first, with their bucket widths in seconds
+ROLLUP_RESOLUTIONS: dict[str, int] = {'minute': 60, 'hour': 3600, 'day': 86400}
+
+# Render profile of the current rerun; each session reruns on its own script thread
+PROFILE_STATE: local = local()
+
+# Joined into every charted window's query (with its table as t) to read each sensor from its own start time, so a
+# window can be loaded whole or topped up with only the rows newer than what is already held
+WINDOW_SINCE_JOIN: str = (
+    "JOIN unnest(CAST(:sensor_ids AS INTEGER[]), CAST(:since_times AS TIMESTAMPTZ[])) AS s(sensor_id, since_time) "
+    "ON s.sensor_id = t.sensor_id "
+)
+
+
+class RollingWindow:
+    def __init__(self) -> None:
+        # A charted date range ending at the refresh time, with the end it was last read up to
+        self.frame: Union[pd.DataFrame, None] = None
+        self.loaded_until: Union[datetime, None] = None
+        self.full_loaded_at: Union[datetime, None] = None
+        self.hub_version: int = 0
+        self.row_count: int = 0
+        self.window_lock: Lock = Lock()
+
+
+@st.cache_resource
+def get_engine(conn_string: str) -> Engine:
+    # One pooled engine per server process, shared by every session
+    return create_engine(conn_string, pool_size=5, max_overflow=5, pool_pre_ping=True)
+
+
+def start_profile() -> None:
+    # Profile every section of this run when enabled in the config or with ?profile=1
+    PROFILE_STATE.enabled = RENDER_PROFILER == 'yes' or st.query_params.get('profile') == '1'
+    PROFILE_STATE.section = None
+    PROFILE_STATE.records = []
+
+
+def is_profiling() -> bool:
+    return getattr(PROFILE_STATE, 'enabled', False)
+
+
+@contextmanager
+def profile_section(section_name: str):
+    # Time a dashboard section, attributing database reads made inside it to the section
+    if not is_profiling():
+        yield
+        return
+
+    section_record: dict = {'section': section_name, 'queries': 0, 'rows': 0, 'query_ms': 0.0, 'sql': []}
+    outer_record: Union[dict, None] = PROFILE_STATE.section
+    PROFILE_STATE.section = section_record
+    section_start: float = perf_counter()
+    try:
+        yield
+    finally:
+        section_record['total_ms'] = (perf_counter() - section_start) * 1000
+        section_record['render_ms'] = section_record['total_ms'] - section_record['query_ms']
+        section_record['sql'] = ' | '.join(section_record['sql'])
+        PROFILE_STATE.section = outer_record
+        PROFILE_STATE.records.append(section_record)
+
+
+def record_query(query: str, row_count: int, query_seconds: float) -> None:
+    section_record: Union[dict, None] = getattr(PROFILE_STATE, 'section', None)
+    if section_record is not None:
+        section_record['queries'] += 1
+        section_record['rows'] += row_count
+        section_record['query_ms'] += query_seconds * 1000
+        section_record['sql'].append(' '.join(query.split()))
+
+
+def show_render_profile(rerun_start: float, profile_container=None) -> None:
+    # List this rerun's sections, slowest first, in the sidebar (or the given container, since a fragment can only
+    # write inside itself) and optionally append them to the log file
+    profile_df = pd.DataFrame(
+        PROFILE_STATE.records, columns=['section', 'total_ms', 'query_ms', 'render_ms', 'queries', 'rows', 'sql']
+    ).sort_values('total_ms', ascending=False)
+    rerun_ms: float = (perf_counter() - rerun_start) * 1000
+    with profile_container or st.sidebar:
+        st.subheader('Render Profile')
+        st.write(f'Rerun took {rerun_ms:.1f} ms. Queries only count reads that missed the cache.')
+        st.dataframe(profile_df.round(1), hide_index=True)
+
+    if RENDER_PROFILE_LOG:
+        with open(RENDER_PROFILE_LOG, 'a') as profile_log:
+            profile_log.write(dumps({
+                'logged_at': datetime.now().astimezone().isoformat(), 'rerun_ms': rerun_ms,
+                'sections': profile_df.to_dict(orient='records')
+            }) + '\n')
+
+
+def read_query(conn_string: str, query: str, params: Union[dict, None] = None) -> pd.DataFrame:
+    query_start: float = perf_counter()
+    with get_engine(conn_string).connect() as query_conn:
+        query_df = pd.read_sql_query(text(query), query_conn, params=params)
+    record_query(query, len(query_df), perf_counter() - query_start)
+    return query_df
+
+
+@st.cache_data(ttl=UPDATE_INTERVAL_SECONDS, max_entries=QUERY_CACHE_MAX_ENTRIES, show_spinner=False)
+def read_weather_query(conn_string: str, query: str, params: Union[dict, None] = None) -> pd.DataFrame:
+    # Weather data changes every update interval, so results are shared across sessions for that long
+    return read_query(conn_string, query, params)
+
+
+@st.cache_data(ttl=SENSOR_CACHE_TTL_SECONDS, max_entries=QUERY_CACHE_MAX_ENTRIES, show_spinner=False)
+def read_sensor_query(conn_string: str, query: str, params: Union[dict, None] = None) -> pd.DataFrame:
+    # Sensor metadata rarely changes, so it is kept much longer
+    return read_query(conn_string, query, params)
+
+
+@st.cache_data(ttl=SENSOR_CACHE_TTL_SECONDS, max_entries=QUERY_CACHE_MAX_ENTRIES, show_spinner=False)
+def read_archived_readings(start_date_time: datetime, end_date_time: datetime, sensor_ids: list[int],
+                           columns: list[str]) -> pd.DataFrame:
+    # Archived days never change, so they are kept as long as sensor metadata. Pyarrow is only imported once an
+    # archived range is charted, keeping it out of the dashboard's cold start
+    from Archive import read_archive
+    return read_archive(ARCHIVE_DIR, start_date_time, end_date_time, sensor_ids, columns)
+
+
+@st.cache_resource
+def get_reading_hub(conn_string: str) -> ReadingHub:
+    # One change feed listener per server process, shared by every session. A newly registered sensor also
+    # refreshes the cached sensor lists
+    db_url = make_url(conn_string)
+    reading_hub = ReadingHub(
+        {'host': db_url.host, 'port': db_url.port, 'dbname': db_url.database, 'user': db_url.username,
+         'password': db_url.password},
+        on_new_sensors=read_sensor_query.clear
+    )
+    reading_hub.start()
+    return reading_hub
+
+
+@st.cache_resource
+def get_rolling_windows() -> tuple[OrderedDict, Lock]:
+    # Rolling windows shared by every session, least recently read first
+    return OrderedDict(), Lock()
+
+
+def get_rolling_window(window_key: tuple) -> RollingWindow:
+    rolling_windows, rolling_windows_lock = get_rolling_windows()
+    with rolling_windows_lock:
+        if window_key not in rolling_windows:
+            rolling_windows[window_key] = RollingWindow()
+            if len(rolling_windows) > QUERY_CACHE_MAX_ENTRIES:
+                rolling_windows.popitem(last=False)
+        rolling_windows.move_to_end(window_key)
+        return rolling_windows[window_key]
+
+
+def trim_rolling_windows(window_key: tuple) -> None:
+    # Evict the least recently read windows until every window together holds at most ROLLING_WINDOW_MAX_ROWS rows,
+    # always keeping the window just read
+    rolling_windows, rolling_windows_lock = get_rolling_windows()
+    with rolling_windows_lock:
+        total_rows: int = sum(rolling_window.row_count for rolling_window in rolling_windows.values())
+        for evict_key in list(rolling_windows):
+            if total_rows <= ROLLING_WINDOW_MAX_ROWS:
+                break
+            if evict_key != window_key:
+                total_rows -= rolling_windows.pop(evict_key).row_count
+
+
+def read_window_query(conn_string: str, query: str, params: dict, sensor_ids: list[int], start_date_time: datetime,
+                      end_date_time: datetime, rolling: bool) -> pd.DataFrame:
+    # Fixed ranges are read whole through the query cache
+    sensor_ids = [int(sensor_id) for sensor_id in sensor_ids]
+    if not rolling or DELTA_REFRESH != 'yes':
+        return read_weather_query(conn_string, query, params={
+            **params, 'sensor_ids': sensor_ids, 'since_times': [start_date_time] * len(sensor_ids),
+            'start_date': start_date_time, 'end_date': end_date_time
+        })
+
+    # Windows that end at the refresh time are kept in memory and refreshed from each sensor's newest row, so a
+    # steady-state refresh reads only what was ingested since the last tick
+    window_key: tuple = (
+        conn_string, query, tuple(sorted(params.items())), tuple(sensor_ids), end_date_time - start_date_time
+    )
+    rolling_window: RollingWindow = get_rolling_window(window_key)
+    reading_hub: Union[ReadingHub, None] = get_reading_hub(conn_string) if CHANGE_FEED == 'yes' else None
+    with rolling_window.window_lock:
+        # Every session in the same tick shares one read
+        if rolling_window.loaded_until == end_date_time:
+            return rolling_window.frame
+
+        # Reload the whole window now and then to pick up anything written out of order
+        full_reload: bool = (
+            rolling_window.frame is None or end_date_time < rolling_window.loaded_until
+            or (end_date_time - rolling_window.full_loaded_at).total_seconds() >= DELTA_FULL_RELOAD_SECONDS
+        )
+
+        # Taken before reading, so anything written during the read counts as a change next tick
+        hub_version: int = reading_hub.version if reading_hub is not None else 0
+        if full_reload:
+            new_df: pd.DataFrame = read_query(conn_string, query, params={
+                **params, 'sensor_ids': sensor_ids, 'since_times': [start_date_time] * len(sensor_ids),
+                'start_date': start_date_time, 'end_date': end_date_time
+            })
+            rolling_window.full_loaded_at = end_date_time
+        elif reading_hub is not None and not reading_hub.changed_since(rolling_window.hub_version, sensor_ids):
+            # The change feed saw no writes for these sensors, so only evict rows that have left the window
+            window_df: pd.DataFrame = rolling_window.frame
+            new_df = window_df[window_df['time_recorded'] >= start_date_time]
+        else:
+            # Re-read each sensor from its newest row or bucket, since a rollup bucket fills in as readings arrive
+            since_times: dict[int, datetime] = {sensor_id: start_date_time for sensor_id in sensor_ids}
+            newest_times: pd.Series = rolling_window.frame.groupby('sensor_id')['time_recorded'].max()
+            for sensor_id, newest_time in newest_times.items():
+                since_times[int(sensor_id)] = max(newest_time.to_pydatetime(), start_date_time)
+            delta_df: pd.DataFrame = read_query(conn_string, query, params={
+                **params, 'sensor_ids': list(since_times), 'since_times': list(since_times.values()),
+                'start_date': min(since_times.values()), 'end_date': end_date_time
+            })
+
+            # Swap in the re-read rows and evict rows that have left the window. Charts pivot by time, so the
+            # appended rows need no re-sorting
+            window_df: pd.DataFrame = rolling_window.frame
+            window_since: pd.Series = pd.to_datetime(window_df['sensor_id'].map(since_times), utc=True)
+            window_df = window_df[
+                (window_df['time_recorded'] < window_since) & (window_df['time_recorded'] >= start_date_time)
+            ]
+            new_df = pd.concat([window_df, delta_df], ignore_index=True) if len(delta_df) else window_df
+
+        rolling_window.frame = new_df
+        rolling_window.loaded_until = end_date_time
+        rolling_window.hub_version = hub_version
+        rolling_window.row_count = len(new_df)
+    trim_rolling_windows(window_key)
+    return new_df
+
+
+def get_refresh_time() -> datetime:
+    # Snap to the refresh interval so every session in the same tick sends identical, cacheable queries
+    update_interval_seconds: float = get_setting('web', 'update_interval_seconds')
+    return datetime.fromtimestamp(time() // update_interval_seconds * update_interval_seconds).astimezone()
+
+
+def get_latest_snapshot(conn_string: str, just_locale_choices: list[str], all_sensors: bool) -> pd.DataFrame:
+    # Serve the newest rows from the change feed's in-memory table without touching the database
+    if CHANGE_FEED == 'yes':
+        latest_readings: Union[list[dict], None] = get_reading_hub(conn_string).get_latest_readings(
+            just_locale_choices, all_sensors
+        )
+        # With no readings for the chosen locales there are no columns to build a frame from, so the query below
+        # supplies the empty frame
+        if latest_readings:
+            return pd.DataFrame(latest_readings).drop(columns='sensor_locale')
+
+    # Until the feed is connected, get the newest full row for every wanted sensor in one query. Each sensor is one
+    # backward probe of the (sensor_id, time_recorded) index, where DISTINCT ON would read every stored row
+    query = (
+        "SELECT w.* FROM sensors AS s "
+        "CROSS JOIN LATERAL (SELECT * FROM weather_data AS l WHERE l.sensor_id = s.sensor_id "
+        "ORDER BY l.time_recorded DESC LIMIT 1) AS w "
+        "WHERE :all_sensors OR s.sensor_locale = ANY(CAST(:sensor_locales AS TEXT[])) "
+        "ORDER BY s.sensor_id"
+    )
+    return read_weather_query(conn_string, query, params={
+        'all_sensors': all_sensors, 'sensor_locales': list(just_locale_choices)
+    })
+
+
+def get_avg_metric(latest_snapshot: pd.DataFrame, col_n, selected_unit: str, selected_unit_modifier: str,
+                   metric_title: str, delta=None) -> None:
+    with profile_section(metric_title):
+        col_n.metric(
+            metric_title, f'{round(latest_snapshot[selected_unit].mean(), 2)}{selected_unit_modifier}', delta
+        )
+
+
+def get_chart_resolution(start_date_time: datetime, end_date_time: datetime) -> str:
+    # Use the finest data that keeps each series within the chart's point budget
+    range_seconds: float = (end_date_time - start_date_time).total_seconds()
+    if range_seconds / get_setting('web', 'update_interval_seconds') <= CHART_MAX_POINTS:
+        return 'raw'
+    for resolution, bucket_seconds in ROLLUP_RESOLUTIONS.items():
+        if range_seconds / bucket_seconds <= CHART_MAX_POINTS:
+            return resolution
+    return 'day'
+
+
+def get_hot_start(conn_string: str) -> Union[datetime, None]:
+    # Start of the oldest raw partition. Older times only have hourly and daily rollups, and the Parquet archive
+    hot_start = read_weather_query(conn_string, "SELECT MIN(range_start) AS hot_start FROM weather_partitions")
+    hot_start = hot_start.iloc[0, 0]
+    return hot_start.to_pydatetime() if pd.notna(hot_start) else None
+
+
+def get_hist_data(conn_string: str, start_date_time: datetime, end_date_time: datetime, just_id_choices: list[int],
+                  id_to_locale_map: dict[int, str], measured_units: list[str], resolution: str,
+                  rolling: bool) -> pd.DataFrame:
+    # Get every charted column at once, letting the database filter the date range
+    if resolution == 'raw':
+        query = (
+            f"SELECT t.sensor_id, t.time_recorded, {', '.join(measured_units)} FROM weather_data AS t "
+            f"{WINDOW_SINCE_JOIN}"
+            f"WHERE t.time_recorded >= s.since_time AND t.time_recorded BETWEEN :start_date AND :end_date "
+            f"ORDER BY t.time_recorded, t.sensor_id"
+        )
     else:
-        query = (f"SELECT sensor_id, time_recorded, {measured_unit} FROM weather_data "
-                 f"WHERE sensor_id IN {tuple(just_id_choices)}")
-    df = pd.read_sql_query(query, conn_string)
+        # Rollups hold bucket means in place of raw readings
+        rollup_columns: str = ', '.join(f'{measured_unit}_mean AS {measured_unit}' for measured_unit in measured_units)
+        query = (
+            f"SELECT t.sensor_id, t.bucket_start AS time_recorded, {rollup_columns} FROM weather_rollups AS t "
+            f"{WINDOW_SINCE_JOIN}"
+            f"WHERE t.resolution = :resolution AND t.bucket_start >= s.since_time "
+            f"AND t.bucket_start BETWEEN :start_date AND :end_date "
+            f"ORDER BY t.bucket_start, t.sensor_id"
+        )
+    df = read_window_query(
+        conn_string, query, {'resolution': resolution}, just_id_choices, start_date_time, end_date_time, rolling
+    )
+
+    # Raw readings older than the oldest partition only live in the Parquet archive (rollups are never archived)
+    if resolution == 'raw' and ARCHIVE_READINGS == 'yes':
+        hot_start: Union[datetime, None] = get_hot_start(conn_string)
+        if hot_start is not None and start_date_time < hot_start:
+            archive_df = read_archived_readings(
+                start_date_time, min(end_date_time, hot_start),
+                [int(sensor_id) for sensor_id in just_id_choices], measured_units
+            )
+            df = pd.concat([archive_df, df], ignore_index=True)
+
+    # Format the table without touching the frame a rolling window may share with other sessions
+    return df.assign(locale=df['sensor_id'].map(id_to_locale_map))
+
+
+def get_wind_dir_counts(conn_string: str, hist_df: pd.DataFrame, start_date_time: datetime, end_date_time: datetime,
+                        just_id_choices: list[int], resolution: str, rolling: bool) -> pd.DataFrame:
+    # Count sensors per direction and timestamp from the shared frame when charting raw readings
+    if resolution == 'raw':
+        wind_dir_df_groups = hist_df.groupby(['time_recorded', 'wind_dir'])
+        return wind_dir_df_groups.size().unstack(fill_value=0)
+
+    # Otherwise use the pre-counted direction buckets at the same resolution, read per sensor so the window can be
+    # topped up like the other charts
+    query = (
+        "SELECT t.sensor_id, t.bucket_start AS time_recorded, t.wind_dir, t.direction_count FROM wind_dir_rollups AS t "
+        f"{WINDOW_SINCE_JOIN}"
+        "WHERE t.resolution = :resolution AND t.bucket_start >= s.since_time "
+        "AND t.bucket_start BETWEEN :start_date AND :end_date"
+    )
+    wind_dir_df = read_window_query(
+        conn_string, query, {'resolution': resolution}, just_id_choices, start_date_time, end_date_time, rolling
+    )
+    return wind_dir_df.pivot_table(
+        index='time_recorded', columns='wind_dir', values='direction_count', aggfunc='sum', fill_value=0
+    )
+
 
-    # Filter the table
-    df['time_recorded'] = pd.to_datetime(df['time_recorded'])
-    df = df[(df['time_recorded'] >= start_date_time) & (df['time_recorded'] <= end_date_time)]
+def get_hist_section(hist_df: pd.DataFrame, measured_unit: str, measured_unit_modifier: str, title: str,
+                     y_label_base: str) -> None:
+    with profile_section(f'{y_label_base} chart'):
+        # Create title for plot
+        st.subheader(title)
 
-    # Format the table
-    df['locale'] = df['sensor_id'].map(lambda x: id_to_locale_map[x])
-    pivot_df = df.pivot(index="time_recorded", columns="locale", values=measured_unit)
+        # Pivot the shared frame for this metric
+        pivot_df = hist_df.pivot(index="time_recorded", columns="locale", values=measured_unit)
 
-    # Create line chart
-    st.line_chart(pivot_df, x_label='Date & Time', y_label=f'{y_label_base} ({measured_unit_modifier})')
+        # Create line chart
+        st.line_chart(pivot_df, x_label='Date & Time', y_label=f'{y_label_base} ({measured_unit_modifier})')
 
 
 def create_sensor_info_tab(conn_string: str) -> None:
@@ -58,14 +400,16 @@ def create_sensor_info_tab(conn_string: str) -> None:
     st.write("This dashboard shows information about the sensors and their locations.")
 
     # Table
-    st.subheader("Sensor Information Table")
-    df = pd.read_sql_query("SELECT * FROM sensors", conn_string)
-    st.dataframe(df)
+    with profile_section('Sensor table'):
+        st.subheader("Sensor Information Table")
+        df = read_sensor_query(conn_string, "SELECT * FROM sensors")
+        st.dataframe(df)
 
     # Map
-    st.subheader("Sensor Locations")
-    df = pd.read_sql_query('SELECT sensor_lat, sensor_long FROM sensors', conn_string)
-    st.map(df, latitude='sensor_lat', longitude='sensor_long', color='#2A9CFF', size=2000)
+    with profile_section('Sensor map'):
+        st.subheader("Sensor Locations")
+        df = read_sensor_query(conn_string, 'SELECT sensor_lat, sensor_long FROM sensors')
+        st.map(df, latitude='sensor_lat', longitude='sensor_long', color='#2A9CFF', size=2000)
 
 
 def create_latest_weather_tab(conn_string: str) -> None:
@@ -84,7 +428,7 @@ def create_latest_weather_tab(conn_string: str) -> None:
 
     # cursor.execute('SELECT sensor_locale, sensor_region, sensor_country FROM sensors')
     # all_locations_query = cursor.fetchall()
-    df = pd.read_sql_query("SELECT sensor_locale, sensor_region, sensor_country FROM sensors", conn_string)
+    df = read_sensor_query(conn_string, "SELECT sensor_locale, sensor_region, sensor_country FROM sensors")
     all_locations_query = df.values.tolist()
     all_locations = [', '.join(location) for location in all_locations_query]
 
@@ -144,105 +488,50 @@ def create_latest_weather_tab(conn_string: str) -> None:
     col4, col5, col6 = st.columns(3, border=True, gap="medium")
     col7, col8, col9 = st.columns(3, border=True, gap="medium")
 
-    # Get only the sensors wanted when getting the latest timestamps
-    if locale_string == 'All Locations' or len(just_locale_choices) == 0:
-        # cursor.execute('SELECT sensor_id, MAX(timestamp) AS max_timestamp FROM weather_data GROUP BY sensor_id')
-        timestamps_by_sensor = pd.read_sql_query(
-            'SELECT sensor_id, MAX(time_recorded) AS max_timestamp FROM weather_data GROUP BY sensor_id',
-            conn_string
+    # Get the latest reading of only the sensors wanted
+    with profile_section('Latest snapshot'):
+        latest_snapshot = get_latest_snapshot(
+            conn_string, just_locale_choices, locale_string == 'all locations' or len(just_locale_choices) == 0
         )
-    else:
-        # Get only the ids wanted
-        if len(just_locale_choices) == 1:
-            # cursor.execute(f"SELECT sensor_id FROM sensors WHERE sensor_locale = '{just_locale_choices[0]}'")
-            # just_id_choices = cursor.fetchone()[0]
-            df = pd.read_sql_query(
-                f"SELECT sensor_id FROM sensors WHERE sensor_locale = '{just_locale_choices[0]}'",
-                conn_string
-            )
-            just_id_choices = df.iloc[0, 0]
-
-            # Use the ids to get the latest timestamps
-            # cursor.execute(f"""
-            #     SELECT sensor_id, MAX(timestamp) AS max_timestamp FROM weather_data
-            #     WHERE sensor_id = {just_id_choices} GROUP BY sensor_id
-            # """)
-            query = f"""
-                SELECT sensor_id, MAX(time_recorded) AS max_timestamp FROM weather_data
-                WHERE sensor_id = {just_id_choices} GROUP BY sensor_id
-            """
-            timestamps_by_sensor = pd.read_sql_query(query, conn_string)
-        else:
-            # cursor.execute(f'SELECT sensor_id FROM sensors WHERE sensor_locale IN {tuple(just_locale_choices)}')
-            # just_id_choices = [sensor_id[0] for sensor_id in cursor.fetchall()]
-            df_ids = pd.read_sql_query(
-                f"SELECT sensor_id FROM sensors WHERE sensor_locale IN {tuple(just_locale_choices)}", conn_string
-            )
-            just_id_choices = df_ids['sensor_id'].tolist()
-
-            # Use the ids to get the latest timestamps
-            # cursor.execute(f"""
-            #     SELECT sensor_id, MAX(timestamp) AS max_timestamp FROM weather_data
-            #     WHERE sensor_id IN {tuple(just_id_choices)} GROUP BY sensor_id
-            # """)
-            query = f"""
-                SELECT sensor_id, MAX(time_recorded) AS max_timestamp FROM weather_data
-                WHERE sensor_id IN {tuple(just_id_choices)} GROUP BY sensor_id
-            """
-            timestamps_by_sensor = pd.read_sql_query(query, conn_string)
 
     # Average Temperature
     get_avg_metric(
-        conn_string, timestamps_by_sensor, col1, selected_units["Temperature"], selected_unit_modifiers["Temperature"],
+        latest_snapshot, col1, selected_units["Temperature"], selected_unit_modifiers["Temperature"],
         "Avg Temperature"
     )
 
     # Average Wind Speed
     get_avg_metric(
-        conn_string, timestamps_by_sensor, col2, selected_units["Wind"], selected_unit_modifiers["Wind"],
-        "Avg Wind Speed"
+        latest_snapshot, col2, selected_units["Wind"], selected_unit_modifiers["Wind"], "Avg Wind Speed"
     )
 
     # Average Wind Degree/Direction
-    wind_dir_results = []
-    for sid, mt in timestamps_by_sensor.values.tolist():
-        # cursor.execute(wind_dir_query, (sid, mt))
-        # wind_dir_results.append(cursor.fetchone()[0])
-        query = (f"SELECT {generic_units['Wind_Direction']} FROM weather_data "
-                 f"WHERE sensor_id = {sid} AND time_recorded = '{mt}'")
-        df = pd.read_sql_query(query, conn_string)
-        if not df.empty:
-            wind_dir_results.append(df.iloc[0, 0])
-
+    wind_dir_results = latest_snapshot[generic_units['Wind_Direction']].tolist()
     get_avg_metric(
-        conn_string, timestamps_by_sensor, col3, generic_units["Wind_Degree"],
-        generic_unit_modifiers["Wind_Degree"],
+        latest_snapshot, col3, generic_units["Wind_Degree"], generic_unit_modifiers["Wind_Degree"],
         "Avg Wind Direction",
-        Counter(wind_dir_results).most_common(1)[0][0]
+        Counter(wind_dir_results).most_common(1)[0][0] if wind_dir_results else None
     )
 
     # Average Air Pressure
     get_avg_metric(
-        conn_string, timestamps_by_sensor, col4, selected_units["Pressure"], selected_unit_modifiers["Pressure"],
-        "Avg Air Pressure"
+        latest_snapshot, col4, selected_units["Pressure"], selected_unit_modifiers["Pressure"], "Avg Air Pressure"
     )
 
     # Average Precipitation
     get_avg_metric(
-        conn_string, timestamps_by_sensor, col5, selected_units["Precipitation"],
-        selected_unit_modifiers["Precipitation"], "Avg Precipitation"
+        latest_snapshot, col5, selected_units["Precipitation"], selected_unit_modifiers["Precipitation"],
+        "Avg Precipitation"
     )
 
     # Average Humidity
     get_avg_metric(
-        conn_string, timestamps_by_sensor, col6, generic_units["Humidity"], generic_unit_modifiers["Humidity"],
-        "Avg Humidity"
+        latest_snapshot, col6, generic_units["Humidity"], generic_unit_modifiers["Humidity"], "Avg Humidity"
     )
 
     # Average UV Index Score
     get_avg_metric(
-        conn_string, timestamps_by_sensor, col8, generic_units["UV"], generic_unit_modifiers["UV"],
-        "Avg UV Index Score"
+        latest_snapshot, col8, generic_units["UV"], generic_unit_modifiers["UV"], "Avg UV Index Score"
     )
 
 
@@ -260,7 +549,7 @@ def create_historical_tab(conn_string: str) -> None:
         key="all_or_selected_hist"
     )
 
-    df = pd.read_sql_query("SELECT sensor_locale, sensor_region, sensor_country FROM sensors", conn_string)
+    df = read_sensor_query(conn_string, "SELECT sensor_locale, sensor_region, sensor_country FROM sensors")
     all_locations_query = df.values.tolist()
     all_locations = [', '.join(location) for location in all_locations_query]
 
@@ -321,7 +610,7 @@ def create_historical_tab(conn_string: str) -> None:
         key="date_range_choice_hist"
     )
 
-    end_date = datetime.now()
+    end_date = get_refresh_time()
     if date_range_choice_hist == 'Last 24 hours':
         st.empty()
         start_date = end_date - timedelta(hours=24)
@@ -332,17 +621,27 @@ def create_historical_tab(conn_string: str) -> None:
         st.empty()
         start_date = end_date - timedelta(days=30)
     else:
+        # Keyed, with their starting times set in VIEW_WIDGET_DEFAULTS, so the choices survive switching views
         col1, col2 = st.columns(2)
         with col1:
-            custom_start_date_hist = st.date_input('Select start date:', 'today')
-            custom_start_time_hist = st.time_input('Select start time:', '00:00')
+            custom_start_date_hist = st.date_input('Select start date:', key="custom_start_date_hist")
+            custom_start_time_hist = st.time_input('Select start time:', key="custom_start_time_hist")
         with col2:
-            custom_end_date_hist = st.date_input('Select end date:', 'today')
-            custom_end_time_hist = st.time_input('Select end time:', '23:59')
+            custom_end_date_hist = st.date_input('Select end date:', key="custom_end_date_hist")
+            custom_end_time_hist = st.time_input('Select end time:', key="custom_end_time_hist")
 
-        # Convert to datetime objects
-        start_date = datetime.combine(custom_start_date_hist, custom_start_time_hist)
-        end_date = datetime.combine(custom_end_date_hist, custom_end_time_hist)
+        # Convert to datetime objects in the server's time zone to compare with stored timestamps
+        start_date = datetime.combine(custom_start_date_hist, custom_start_time_hist).astimezone()
+        end_date = datetime.combine(custom_end_date_hist, custom_end_time_hist).astimezone()
+
+    # Selection for chart resolution; raw readings past the retention window are read back from the archive
+    resolution_choice_hist = st.radio(
+        "Select the chart resolution:",
+        ['Automatic', 'Raw readings'],
+        horizontal=True,
+        captions=["Summarized to fit the range.", "Every stored reading, including archived days."],
+        key="resolution_choice_hist"
+    )
 
     # Create string versions of dates
     start_date_str = start_date.strftime("%d %b %Y, %I:%M%p")
@@ -354,7 +653,7 @@ def create_historical_tab(conn_string: str) -> None:
         # query_result = cursor.fetchall()
         # just_id_choices = [sensor_id[0] for sensor_id in query_result]
         # id_locale_map = {sensor_id[0]: sensor_id[1] for sensor_id in query_result}
-        df = pd.read_sql_query("SELECT sensor_id, sensor_locale FROM sensors", conn_string)
+        df = read_sensor_query(conn_string, "SELECT sensor_id, sensor_locale FROM sensors")
         just_id_choices = df['sensor_id'].tolist()
         id_locale_map = dict(zip(df['sensor_id'], df['sensor_locale']))
     elif len(just_locale_choices) == 1:
@@ -364,9 +663,9 @@ def create_historical_tab(conn_string: str) -> None:
         # query_result = cursor.fetchone()
         # just_id_choices = [query_result[0]]
         # id_locale_map = {query_result[0]: query_result[1]}
-        df = pd.read_sql_query(
-            f"SELECT sensor_id, sensor_locale FROM sensors WHERE sensor_locale = '{just_locale_choices[0]}'",
-            conn_string
+        df = read_sensor_query(
+            conn_string, "SELECT sensor_id, sensor_locale FROM sensors WHERE sensor_locale = :sensor_locale",
+            {'sensor_locale': just_locale_choices[0]}
         )
         just_id_choices = df['sensor_id'].tolist()
         id_locale_map = dict(zip(df['sensor_id'], df['sensor_locale']))
@@ -377,78 +676,135 @@ def create_historical_tab(conn_string: str) -> None:
         # query_result = cursor.fetchall()
         # just_id_choices = [sensor_id[0] for sensor_id in query_result]
         # id_locale_map = {sensor_id[0]: sensor_id[1] for sensor_id in query_result}
-        df = pd.read_sql_query(
-            f'SELECT sensor_id, sensor_locale FROM sensors WHERE sensor_locale IN {tuple(just_locale_choices)}',
-            conn_string
+        df = read_sensor_query(
+            conn_string, "SELECT sensor_id, sensor_locale FROM sensors WHERE sensor_locale = ANY(:sensor_locales)",
+            {'sensor_locales': list(just_locale_choices)}
         )
         just_id_choices = df['sensor_id'].tolist()
         id_locale_map = dict(zip(df['sensor_id'], df['sensor_locale']))
 
+    # Load every column the charts need in one query, at a resolution that suits the range. Ranges ending now move
+    # with every refresh, so only their new rows are read
+    rolling_range = date_range_choice_hist != 'Custom Range'
+    if resolution_choice_hist == 'Raw readings':
+        chart_resolution = 'raw'
+    else:
+        chart_resolution = get_chart_resolution(start_date, end_date)
+
+        # Minute rollups expire with the raw readings, so older ranges use hourly ones
+        if chart_resolution == 'minute':
+            hot_start = get_hot_start(conn_string)
+            if hot_start is not None and start_date < hot_start:
+                chart_resolution = 'hour'
+    hist_units = list(selected_units.values()) + [generic_units['Humidity'], generic_units['UV']]
+    if chart_resolution == 'raw':
+        hist_units.append(generic_units['Wind_Direction'])
+    with profile_section('Historical data'):
+        hist_df = get_hist_data(
+            conn_string, start_date, end_date, just_id_choices, id_locale_map, hist_units, chart_resolution,
+            rolling_range
+        )
+
     # Section for line plots
     st.header('Historical Trends by Topic')
     st.write(f'This dashboard shows historical weather data from {locale_string}.')
 
     # Historical Temperature Data
     get_hist_section(
-        conn_string, start_date, end_date, just_id_choices, id_locale_map, selected_units['Temperature'],
-        selected_unit_modifiers['Temperature'],
+        hist_df, selected_units['Temperature'], selected_unit_modifiers['Temperature'],
         f'Historical Temperature Data from {start_date_str} to {end_date_str}.', 'Degrees'
     )
 
     # Historical Wind Speed Data
     get_hist_section(
-        conn_string, start_date, end_date, just_id_choices, id_locale_map, selected_units['Wind'],
-        selected_unit_modifiers['Wind'],
+        hist_df, selected_units['Wind'], selected_unit_modifiers['Wind'],
         f'Historical Wind Speed Data from {start_date_str} to {end_date_str}.', 'Wind Speed'
     )
 
     # Historical Wind Direction Data
-    st.subheader(f'Historical Wind Direction Data from {start_date_str} to {end_date_str}.')
+    with profile_section('Wind Direction chart'):
+        st.subheader(f'Historical Wind Direction Data from {start_date_str} to {end_date_str}.')
 
-    if len(just_id_choices) == 1:
-        query = (f"SELECT sensor_id, time_recorded, {generic_units['Wind_Direction']} FROM weather_data "
-                 f"WHERE sensor_id = {just_id_choices[0]}")
-    else:
-        query = (f"SELECT sensor_id, time_recorded, {generic_units['Wind_Direction']} FROM weather_data "
-                 f"WHERE sensor_id IN {tuple(just_id_choices)}")
-    wind_dir_df = pd.read_sql_query(query, conn_string)
-
-    wind_dir_df['time_recorded'] = pd.to_datetime(wind_dir_df['time_recorded'])
-    wind_dir_df = wind_dir_df[(wind_dir_df['time_recorded'] >= start_date) & (wind_dir_df['time_recorded'] <= end_date)]
-    wind_dir_df = wind_dir_df[['time_recorded', generic_units['Wind_Direction']]]
-    wind_dir_df_groups = wind_dir_df.groupby(['time_recorded', generic_units['Wind_Direction']])
-    wind_dir_df_size = wind_dir_df_groups.size().unstack(fill_value=0)
+        wind_dir_df_size = get_wind_dir_counts(
+            conn_string, hist_df, start_date, end_date, just_id_choices, chart_resolution, rolling_range
+        )
 
-    st.area_chart(wind_dir_df_size, stack=True, x_label='Date & Time', y_label=f'Wind Direction')
+        st.area_chart(wind_dir_df_size, stack=True, x_label='Date & Time', y_label=f'Wind Direction')
 
     # Historical Air Pressure Data
     get_hist_section(
-        conn_string, start_date, end_date, just_id_choices, id_locale_map, selected_units['Pressure'],
-        selected_unit_modifiers['Pressure'],
+        hist_df, selected_units['Pressure'], selected_unit_modifiers['Pressure'],
         f'Historical Air Pressure Data from {start_date_str} to {end_date_str}.', 'Air Pressure'
     )
 
     # Historical Precipitation Data
     get_hist_section(
-        conn_string, start_date, end_date, just_id_choices, id_locale_map, selected_units['Precipitation'],
-        selected_unit_modifiers['Precipitation'],
+        hist_df, selected_units['Precipitation'], selected_unit_modifiers['Precipitation'],
         f'Historical Precipitation Data from {start_date_str} to {end_date_str}.', 'Rainfall'
     )
 
     # Historical Humidity Data
     get_hist_section(
-        conn_string, start_date, end_date, just_id_choices, id_locale_map, generic_units['Humidity'],
-        generic_unit_modifiers['Humidity'],
+        hist_df, generic_units['Humidity'], generic_unit_modifiers['Humidity'],
         f'Historical Humidity Percentage Data from {start_date_str} to {end_date_str}.', 'Humidity'
     )
 
     # Historical UV Index Data
     get_hist_section(
-        conn_string, start_date, end_date, just_id_choices, id_locale_map, generic_units['UV'], generic_unit_modifiers['UV'],
+        hist_df, generic_units['UV'], generic_unit_modifiers['UV'],
         f'Historical UV Index Data from {start_date_str} to {end_date_str}.', 'UV Index Score'
     )
 
 
+# Dashboard views, each shown as its own fragment, with the setting that says how often it refreshes by itself
+DASHBOARD_VIEWS: dict[str, tuple[Callable[[str], None], str]] = {
+    'Sensor Info': (create_sensor_info_tab, 'sensor_cache_ttl_seconds'),
+    'Historical Trends Info': (create_historical_tab, 'history_refresh_seconds'),
+    'Latest Weather Info': (create_latest_weather_tab, 'update_interval_seconds'),
+}
+
+
+# Keyed widgets of each view with the value they start at, where None leaves the widget's own default. Streamlit
+# forgets a widget that is not rendered in a run, and only the chosen view is rendered, so these values are also kept
+# under keys of their own and put back when the view is shown again
+VIEW_WIDGET_DEFAULTS: dict[str, dict[str, object]] = {
+    'Sensor Info': {},
+    'Historical Trends Info': {
+        'all_or_selected_hist': None,
+        'location_options_hist': None,
+        'metric_or_customary_hist': None,
+        'date_range_choice_hist': None,
+        'custom_start_date_hist': None,
+        'custom_start_time_hist': day_time(0, 0),
+        'custom_end_date_hist': None,
+        'custom_end_time_hist': day_time(23, 59),
+        'resolution_choice_hist': None,
+    },
+    'Latest Weather Info': {
+        'all_or_selected_latest': None,
+        'location_options_latest': None,
+        'metric_or_customary_latest': None,
+    },
+}
+
+
+def restore_view_widgets(view_name: str) -> None:
+    # Only widgets Streamlit has dropped are put back, so a change made in this run is never overwritten
+    for widget_key, default_value in VIEW_WIDGET_DEFAULTS[view_name].items():
+        if widget_key in st.session_state:
+            continue
+        if f'saved_{widget_key}' in st.session_state:
+            st.session_state[widget_key] = st.session_state[f'saved_{widget_key}']
+        elif default_value is not None:
+            st.session_state[widget_key] = default_value
+
+
+def save_view_widgets(view_name: str) -> None:
+    for widget_key in VIEW_WIDGET_DEFAULTS[view_name]:
+        if widget_key in st.session_state:
+            st.session_state[f'saved_{widget_key}'] = st.session_state[widget_key]
+
+
 def set_cooldown(e: Event) -> None:
     e.set()
     sleep(UPDATE_INTERVAL_SECONDS)
@@ -460,10 +816,28 @@ def set_cooldown_thread(e: Event) -> None:
     cooldown_thread.start()
 
 
+def show_dashboard_view(view_name: str, conn_string: str) -> None:
+    # Runs as a fragment, so its timer and its widgets rerun only this view. Reruns of the fragment alone pick up
+    # config edits and keep their own render profile, since the page around them does not run
+    fragment_rerun: bool = not getattr(PROFILE_STATE, 'page_rerun', False)
+    fragment_start: float = perf_counter()
+    if fragment_rerun:
+        reload_config('web')
+        start_profile()
+
+    restore_view_widgets(view_name)
+    DASHBOARD_VIEWS[view_name][0](conn_string)
+    save_view_widgets(view_name)
+
+    if fragment_rerun and is_profiling():
+        show_render_profile(fragment_start, st.expander('Render Profile'))
+
+
 def create_web_page():
-    # Automatically refresh at a specific rate
-    refresh_rate: int = int(UPDATE_INTERVAL_SECONDS) * 1000
-    st_autorefresh(interval=refresh_rate, key="auto_refresh")
+    rerun_start: float = perf_counter()
+    PROFILE_STATE.page_rerun = True
+    start_profile()
+    reload_config('web')
 
     # Create connection and cursor
     ENV_DB_HOST = "postgres"
@@ -477,15 +851,16 @@ def create_web_page():
     # Title of dashboard
     st.title("IoT Weather Sensor Data Dashboard")
 
-    # Tabs
-    tab1, tab2, tab3 = st.tabs(["Sensor Info", "Historical Trends Info", "Latest Weather Info"])
+    # Only the chosen view is rendered, refreshing on its own interval instead of rerunning the whole page
+    view_name = st.radio(
+        "Dashboard view", list(DASHBOARD_VIEWS), horizontal=True, label_visibility="collapsed", key="dashboard_view"
+    )
+    view_refresh_seconds: float = get_setting('web', DASHBOARD_VIEWS[view_name][1])
+    st.fragment(show_dashboard_view, run_every=view_refresh_seconds)(view_name, web_string)
 
-    with tab1:
-        create_sensor_info_tab(web_string)
-    with tab2:
-        create_historical_tab(web_string)
-    with tab3:
-        create_latest_weather_tab(web_string)
+    PROFILE_STATE.page_rerun = False
+    if is_profiling():
+        show_render_profile(rerun_start)
 
     # # Create events for sidebar
     # web_event: Event = Event()
@@ -0,0 +1,8 @@
+from os import chdir
+from os.path import dirname
+import sys
+
+
+# The app modules import each other as top-level modules from web_app/, and read start_config.toml from there
+sys.path.insert(0, dirname(dirname(__file__)))
+chdir(dirname(dirname(__file__)))
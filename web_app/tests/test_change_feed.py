@@ -0,0 +1,127 @@
+from datetime import datetime, timedelta, timezone
+from json import dumps, loads
+from ChangeFeed import ReadingHub, notify_readings, SENSORS_PER_NOTIFICATION
+
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+class NotifyCursor:
+    def __init__(self) -> None:
+        self.executed: list[tuple] = []
+
+    def execute(self, query: str, params: tuple) -> None:
+        self.executed.append(params)
+
+
+class ReadingsCursor:
+    def __init__(self, readings: dict[int, datetime]) -> None:
+        # Answers the latest readings query from {sensor_id: time_recorded}
+        self.readings: dict[int, datetime] = readings
+        self.description: list[tuple] = [('sensor_locale',), ('sensor_id',), ('time_recorded',)]
+        self.rows: list[tuple] = []
+        self.requested_ids: list[list[int]] = []
+
+    def execute(self, query: str, params: dict) -> None:
+        sensor_ids: list[int] = list(self.readings) if params['all_sensors'] else params['sensor_ids']
+        self.requested_ids.append(sensor_ids)
+        self.rows = [(f'Town {sensor_id}', sensor_id, self.readings[sensor_id]) for sensor_id in sensor_ids]
+
+    def fetchall(self) -> list[tuple]:
+        return self.rows
+
+
+def make_hub(readings: dict[int, datetime]) -> tuple[ReadingHub, ReadingsCursor]:
+    # A hub loaded as if its listener had just connected
+    reading_hub = ReadingHub({})
+    readings_cursor = ReadingsCursor(readings)
+    reading_hub.store_readings(readings_cursor, True, [])
+    reading_hub.version = reading_hub.loaded_version = 1
+    reading_hub.ready.set()
+    return reading_hub, readings_cursor
+
+
+def test_notify_keeps_each_sensors_newest_time():
+    notify_cursor = NotifyCursor()
+    notify_readings(notify_cursor, [(1, START), (1, START + timedelta(hours=1)), (2, START), (1, START)])
+
+    channel, payloads = notify_cursor.executed[0]
+    assert channel == 'weather_readings'
+    assert loads(payloads[0]) == {'1': (START + timedelta(hours=1)).isoformat(), '2': START.isoformat()}
+
+
+def test_notify_without_rows_sends_nothing():
+    notify_cursor = NotifyCursor()
+    notify_readings(notify_cursor, [])
+
+    assert notify_cursor.executed == []
+
+
+def test_notify_chunks_payloads_under_the_size_limit():
+    sensor_count: int = SENSORS_PER_NOTIFICATION * 2 + 1
+    notify_cursor = NotifyCursor()
+    notify_readings(notify_cursor, [(sensor_id, START) for sensor_id in range(1, sensor_count + 1)])
+
+    payloads: list[str] = notify_cursor.executed[0][1]
+    assert [len(loads(payload)) for payload in payloads] == [SENSORS_PER_NOTIFICATION, SENSORS_PER_NOTIFICATION, 1]
+    assert all(len(payload.encode()) < 8000 for payload in payloads)
+    assert set().union(*(loads(payload) for payload in payloads)) == {
+        str(sensor_id) for sensor_id in range(1, sensor_count + 1)
+    }
+
+
+def test_notified_sensors_count_as_changed():
+    reading_hub, readings_cursor = make_hub({1: START, 2: START})
+    readings_cursor.readings[1] = START + timedelta(hours=1)
+    reading_hub.apply_notifications(readings_cursor, [dumps({'1': (START + timedelta(hours=1)).isoformat()})])
+
+    assert reading_hub.changed_since(1, [1])
+    assert not reading_hub.changed_since(1, [2])
+    assert reading_hub.latest_readings[1]['time_recorded'] == START + timedelta(hours=1)
+
+
+def test_only_stale_sensors_are_read_again():
+    # A backfilled older reading still counts as a change, but the held latest reading stays
+    reading_hub, readings_cursor = make_hub({1: START + timedelta(hours=1)})
+    reading_hub.apply_notifications(readings_cursor, [dumps({'1': START.isoformat()})])
+
+    assert readings_cursor.requested_ids == [[1]]
+    assert reading_hub.changed_since(1, [1])
+
+
+def test_malformed_payloads_are_skipped():
+    reading_hub, readings_cursor = make_hub({1: START, 2: START})
+    readings_cursor.readings[2] = START + timedelta(hours=1)
+    reading_hub.apply_notifications(readings_cursor, [
+        'x', dumps(['not', 'a', 'map']), dumps({'one': START.isoformat()}), dumps({'1': 'yesterday'}),
+        dumps({'2': (START + timedelta(hours=1)).isoformat()}),
+    ])
+
+    assert not reading_hub.changed_since(1, [1])
+    assert reading_hub.changed_since(1, [2])
+
+
+def test_new_sensor_triggers_callback():
+    new_sensor_calls: list[bool] = []
+    reading_hub, readings_cursor = make_hub({1: START})
+    reading_hub.on_new_sensors = lambda: new_sensor_calls.append(True)
+    readings_cursor.readings[3] = START
+    reading_hub.apply_notifications(readings_cursor, [dumps({'3': START.isoformat()})])
+
+    assert new_sensor_calls == [True]
+    assert 3 in reading_hub.latest_readings
+
+
+def test_hub_that_is_not_ready_vouches_for_nothing():
+    reading_hub, _ = make_hub({1: START})
+    reading_hub.ready.clear()
+
+    assert reading_hub.changed_since(1, [1])
+    assert reading_hub.get_latest_readings(['Town 1'], False) is None
+
+
+def test_latest_readings_are_filtered_by_locale():
+    reading_hub, _ = make_hub({1: START, 2: START})
+
+    assert [reading['sensor_id'] for reading in reading_hub.get_latest_readings(['Town 2'], False)] == [2]
+    assert len(reading_hub.get_latest_readings([], True)) == 2
@@ -0,0 +1,81 @@
+from os import utime
+from os.path import getmtime
+import pytest
+import Config
+
+
+def write_config(config_path, replacements: dict[str, str], mtime_step: int = 0) -> None:
+    # Start from the shipped settings; bump the modification time so a rewrite within the same second still counts
+    config_text: str = open('start_config.toml').read()
+    for old_line, new_line in replacements.items():
+        assert old_line in config_text
+        config_text = config_text.replace(old_line, new_line)
+    config_path.write_text(config_text)
+    if mtime_step:
+        utime(config_path, (getmtime(config_path) + mtime_step, getmtime(config_path) + mtime_step))
+
+
+@pytest.fixture
+def config_path(monkeypatch, tmp_path):
+    config_path = tmp_path / 'start_config.toml'
+    write_config(config_path, {})
+    monkeypatch.setattr(Config, 'CONFIG_PATH', str(config_path))
+    monkeypatch.setattr(Config, 'ROLE_CONFIGS', {})
+    monkeypatch.setattr(Config, 'ROLE_CONFIG_MTIMES', {})
+    return config_path
+
+
+def test_roles_only_load_their_own_settings(config_path):
+    assert 'location_set' in Config.get_config('ingest')
+    assert 'location_set' not in Config.get_config('web')
+    assert 'chart_max_points' in Config.get_config('web')
+
+
+def test_unchanged_file_reloads_nothing(config_path):
+    Config.get_config('ingest')
+    assert Config.reload_config('ingest') == {}
+
+
+def test_reload_returns_only_changed_hot_settings(config_path):
+    Config.get_config('ingest')
+    write_config(config_path, {
+        'update_interval_seconds = 5': 'update_interval_seconds = 10',
+        'bulk_batch_size = 50': 'bulk_batch_size = 25',
+    }, mtime_step=1)
+
+    assert Config.reload_config('ingest') == {'update_interval_seconds': 10}
+    assert Config.get_setting('ingest', 'update_interval_seconds') == 10
+
+    # Settings that need a restart keep their starting values
+    assert Config.get_setting('ingest', 'bulk_batch_size') == 50
+
+
+def test_reload_is_applied_once(config_path):
+    Config.get_config('web')
+    write_config(config_path, {'update_interval_seconds = 5': 'update_interval_seconds = 10'}, mtime_step=1)
+
+    assert Config.reload_config('web') == {'update_interval_seconds': 10}
+    assert Config.reload_config('web') == {}
+
+
+def test_invalid_edit_keeps_last_good_settings(config_path):
+    Config.get_config('ingest')
+    write_config(config_path, {'update_interval_seconds = 5': "update_interval_seconds = 'soon'"}, mtime_step=1)
+
+    assert Config.reload_config('ingest') == {}
+    assert Config.get_setting('ingest', 'update_interval_seconds') == 5
+
+    # The broken file is not re-read on every check
+    assert Config.ROLE_CONFIG_MTIMES['ingest'] == getmtime(config_path)
+
+
+@pytest.mark.parametrize('old_line, new_line, message', [
+    ('bulk_batch_size = 50', '', 'missing bulk_batch_size'),
+    ('bulk_batch_size = 50', 'bulk_batch_size = true', 'must be int'),
+    ("ingestion_mode = 'threads'", "ingestion_mode = 'fibers'", 'must be one of'),
+])
+def test_invalid_settings_are_rejected(config_path, old_line, new_line, message):
+    write_config(config_path, {old_line: new_line})
+
+    with pytest.raises(ValueError, match=message):
+        Config.get_config('ingest')
@@ -0,0 +1,68 @@
+import pytest
+import Metrics
+from Metrics import Counter, Gauge, Histogram, render_metrics
+
+
+@pytest.fixture(autouse=True)
+def metrics(monkeypatch) -> list:
+    # Keep the metrics made here out of the module's registry
+    test_metrics: list = []
+    monkeypatch.setattr(Metrics, 'METRICS', test_metrics)
+    return test_metrics
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram('insert_seconds', 'Insert time.', buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value)
+
+    assert histogram.render() == [
+        '# HELP insert_seconds Insert time.',
+        '# TYPE insert_seconds histogram',
+        'insert_seconds_bucket{le="0.1"} 2',
+        'insert_seconds_bucket{le="1.0"} 3',
+        'insert_seconds_bucket{le="+Inf"} 4',
+        'insert_seconds_sum 2.65',
+        'insert_seconds_count 4',
+    ]
+
+
+def test_histogram_renders_each_label_set_in_order():
+    histogram = Histogram('fetch_seconds', 'Fetch time.', ('endpoint', 'status'), buckets=(1.0,))
+    histogram.observe(0.5, 'history.json', '200')
+    histogram.observe(3.0, 'current.json', 'error')
+
+    assert histogram.render()[2:] == [
+        'fetch_seconds_bucket{endpoint="current.json",status="error",le="1.0"} 0',
+        'fetch_seconds_bucket{endpoint="current.json",status="error",le="+Inf"} 1',
+        'fetch_seconds_sum{endpoint="current.json",status="error"} 3.0',
+        'fetch_seconds_count{endpoint="current.json",status="error"} 1',
+        'fetch_seconds_bucket{endpoint="history.json",status="200",le="1.0"} 1',
+        'fetch_seconds_bucket{endpoint="history.json",status="200",le="+Inf"} 1',
+        'fetch_seconds_sum{endpoint="history.json",status="200"} 0.5',
+        'fetch_seconds_count{endpoint="history.json",status="200"} 1',
+    ]
+
+
+def test_histogram_without_observations_renders_only_its_header():
+    assert Histogram('idle_seconds', 'Idle time.').render() == [
+        '# HELP idle_seconds Idle time.', '# TYPE idle_seconds histogram'
+    ]
+
+
+def test_label_values_are_escaped():
+    counter = Counter('rows_total', 'Rows.', ('source',))
+    counter.inc('say "hi"\\\n')
+
+    assert counter.render()[2] == 'rows_total{source="say \\"hi\\"\\\\\\n"} 1.0'
+
+
+def test_render_metrics_joins_every_metric(metrics):
+    Counter('rows_total', 'Rows.').inc(amount=3)
+    Gauge('queue_depth', 'Queued readings.').set(7)
+
+    assert render_metrics() == (
+        '# HELP rows_total Rows.\n# TYPE rows_total counter\nrows_total 3.0\n'
+        '# HELP queue_depth Queued readings.\n# TYPE queue_depth gauge\nqueue_depth 7\n'
+    )
+    assert len(metrics) == 2
@@ -0,0 +1,189 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from threading import Lock
+import pytest
+
+pd = pytest.importorskip('pandas')
+pytest.importorskip('sqlalchemy')
+pytest.importorskip('streamlit')
+import WebApp
+
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def make_readings(sensor_ids: list[int], minutes: int) -> pd.DataFrame:
+    return pd.DataFrame({
+        'sensor_id': [sensor_id for sensor_id in sensor_ids for _ in range(minutes)],
+        'time_recorded': pd.to_datetime(
+            [START + timedelta(minutes=minute) for _ in sensor_ids for minute in range(minutes)], utc=True
+        ),
+        'temp_c': [float(sensor_id * 100 + minute) for sensor_id in sensor_ids for minute in range(minutes)],
+    })
+
+
+def sorted_frame(readings_df: pd.DataFrame) -> pd.DataFrame:
+    return readings_df.sort_values(['sensor_id', 'time_recorded']).reset_index(drop=True)
+
+
+class FakeDatabase:
+    def __init__(self, readings_df: pd.DataFrame) -> None:
+        # Answers the windowed queries like the database would, reading each sensor from its own since time
+        self.readings_df: pd.DataFrame = readings_df
+        self.queries: list[dict] = []
+
+    def read_query(self, conn_string: str, query: str, params: dict = None) -> pd.DataFrame:
+        self.queries.append(params)
+        return self.select(params['sensor_ids'], params['since_times'], params['start_date'], params['end_date'])
+
+    def select(self, sensor_ids: list[int], since_times: list[datetime], start_date: datetime,
+               end_date: datetime) -> pd.DataFrame:
+        readings_df: pd.DataFrame = self.readings_df
+        since: pd.Series = pd.to_datetime(readings_df['sensor_id'].map(dict(zip(sensor_ids, since_times))), utc=True)
+        return readings_df[
+            (readings_df['time_recorded'] >= since) & (readings_df['time_recorded'] >= start_date)
+            & (readings_df['time_recorded'] <= end_date)
+        ].reset_index(drop=True)
+
+    def window(self, sensor_ids: list[int], start_date: datetime, end_date: datetime) -> pd.DataFrame:
+        return self.select(sensor_ids, [start_date] * len(sensor_ids), start_date, end_date)
+
+
+class FakeHub:
+    def __init__(self, changed: bool) -> None:
+        self.version: int = 1
+        self.changed: bool = changed
+
+    def changed_since(self, version: int, sensor_ids: list[int]) -> bool:
+        return self.changed
+
+
+@pytest.fixture
+def rolling_windows(monkeypatch) -> OrderedDict:
+    shared_windows: tuple[OrderedDict, Lock] = (OrderedDict(), Lock())
+    monkeypatch.setattr(WebApp, 'get_rolling_windows', lambda: shared_windows)
+    monkeypatch.setattr(WebApp, 'DELTA_REFRESH', 'yes')
+    monkeypatch.setattr(WebApp, 'CHANGE_FEED', 'no')
+    monkeypatch.setattr(WebApp, 'DELTA_FULL_RELOAD_SECONDS', 900)
+    monkeypatch.setattr(WebApp, 'ROLLING_WINDOW_MAX_ROWS', 10 ** 6)
+    return shared_windows[0]
+
+
+@pytest.fixture
+def database(monkeypatch, rolling_windows) -> FakeDatabase:
+    fake_database = FakeDatabase(make_readings([1, 2], 60))
+    monkeypatch.setattr(WebApp, 'read_query', fake_database.read_query)
+    monkeypatch.setattr(WebApp, 'read_weather_query', fake_database.read_query)
+    return fake_database
+
+
+def read_window(start_minute: int, end_minute: int, sensor_ids: list[int] = (1, 2),
+                rolling: bool = True) -> pd.DataFrame:
+    return WebApp.read_window_query(
+        'conn', 'query', {'resolution': 'raw'}, list(sensor_ids), START + timedelta(minutes=start_minute),
+        START + timedelta(minutes=end_minute), rolling
+    )
+
+
+def expected_window(database: FakeDatabase, start_minute: int, end_minute: int,
+                    sensor_ids: list[int] = (1, 2)) -> pd.DataFrame:
+    return sorted_frame(database.window(
+        list(sensor_ids), START + timedelta(minutes=start_minute), START + timedelta(minutes=end_minute)
+    ))
+
+
+def test_fixed_range_is_read_whole(database, rolling_windows):
+    window_df = read_window(0, 30, rolling=False)
+
+    pd.testing.assert_frame_equal(sorted_frame(window_df), expected_window(database, 0, 30))
+    assert database.queries[0]['since_times'] == [START, START]
+    assert not rolling_windows
+
+
+def test_first_read_loads_whole_window(database):
+    window_df = read_window(0, 30)
+
+    pd.testing.assert_frame_equal(sorted_frame(window_df), expected_window(database, 0, 30))
+    assert database.queries[0]['since_times'] == [START, START]
+
+
+def test_same_tick_shares_one_read(database):
+    read_window(0, 30)
+    read_window(0, 30)
+
+    assert len(database.queries) == 1
+
+
+def test_refresh_reads_each_sensor_from_its_newest_row(database):
+    read_window(0, 30)
+    window_df = read_window(10, 40)
+
+    pd.testing.assert_frame_equal(sorted_frame(window_df), expected_window(database, 10, 40))
+    assert database.queries[1]['since_times'] == [START + timedelta(minutes=30)] * 2
+    assert database.queries[1]['start_date'] == START + timedelta(minutes=30)
+
+
+def test_refresh_replaces_the_newest_row(database):
+    # A rollup bucket keeps filling in after it was first read
+    read_window(0, 30)
+    newest_row = (database.readings_df['sensor_id'] == 1) & (
+        database.readings_df['time_recorded'] == START + timedelta(minutes=30)
+    )
+    database.readings_df.loc[newest_row, 'temp_c'] = -1.0
+    window_df = read_window(10, 40)
+
+    pd.testing.assert_frame_equal(sorted_frame(window_df), expected_window(database, 10, 40))
+    assert (sorted_frame(window_df)['temp_c'] == -1.0).sum() == 1
+
+
+def test_unchanged_hub_only_evicts_old_rows(monkeypatch, database):
+    monkeypatch.setattr(WebApp, 'CHANGE_FEED', 'yes')
+    monkeypatch.setattr(WebApp, 'get_reading_hub', lambda conn_string: FakeHub(changed=False))
+    read_window(0, 30)
+    window_df = read_window(10, 40)
+
+    pd.testing.assert_frame_equal(sorted_frame(window_df), expected_window(database, 10, 30))
+    assert len(database.queries) == 1
+
+
+def test_changed_hub_reads_new_rows(monkeypatch, database):
+    monkeypatch.setattr(WebApp, 'CHANGE_FEED', 'yes')
+    monkeypatch.setattr(WebApp, 'get_reading_hub', lambda conn_string: FakeHub(changed=True))
+    read_window(0, 30)
+    window_df = read_window(10, 40)
+
+    pd.testing.assert_frame_equal(sorted_frame(window_df), expected_window(database, 10, 40))
+    assert len(database.queries) == 2
+
+
+def test_window_is_reloaded_whole_after_the_full_reload_interval(monkeypatch, database):
+    monkeypatch.setattr(WebApp, 'DELTA_FULL_RELOAD_SECONDS', 60)
+    read_window(0, 30)
+    window_df = read_window(5, 35)
+
+    pd.testing.assert_frame_equal(sorted_frame(window_df), expected_window(database, 5, 35))
+    assert database.queries[1]['since_times'] == [START + timedelta(minutes=5)] * 2
+
+
+def test_window_moving_backwards_is_reloaded_whole(database):
+    read_window(10, 40)
+    window_df = read_window(0, 30)
+
+    pd.testing.assert_frame_equal(sorted_frame(window_df), expected_window(database, 0, 30))
+    assert database.queries[1]['since_times'] == [START, START]
+
+
+def test_row_cap_evicts_least_recently_read_windows(monkeypatch, database, rolling_windows):
+    monkeypatch.setattr(WebApp, 'ROLLING_WINDOW_MAX_ROWS', 40)
+    read_window(0, 30, sensor_ids=[1])
+    read_window(0, 30, sensor_ids=[2])
+
+    assert [window_key[3] for window_key in rolling_windows] == [(2,)]
+
+
+def test_window_just_read_is_kept_over_the_row_cap(monkeypatch, database, rolling_windows):
+    monkeypatch.setattr(WebApp, 'ROLLING_WINDOW_MAX_ROWS', 1)
+    window_df = read_window(0, 30)
+
+    assert len(rolling_windows) == 1
+    assert len(window_df) == 62
@@ -0,0 +1,96 @@
+from datetime import datetime, timezone
+from os.path import exists, getsize
+from Spool import ReadingSpool
+
+
+def make_rows(sensor_id: int, row_count: int) -> list[tuple]:
+    return [
+        (sensor_id, datetime(2026, 1, 1, hour, tzinfo=timezone.utc), 1.5 * hour, 'NW')
+        for hour in range(row_count)
+    ]
+
+
+def test_rows_round_trip(tmp_path):
+    reading_spool = ReadingSpool(str(tmp_path / 'readings.jsonl'))
+    reading_spool.append_rows(make_rows(1, 3))
+
+    data_rows, next_offset = reading_spool.read_batch(10)
+    assert data_rows == make_rows(1, 3)
+    assert next_offset == getsize(tmp_path / 'readings.jsonl')
+
+
+def test_uncommitted_rows_are_replayed_after_restart(tmp_path):
+    spool_path = str(tmp_path / 'readings.jsonl')
+    reading_spool = ReadingSpool(spool_path)
+    reading_spool.append_rows(make_rows(1, 3))
+    reading_spool.read_batch(10)
+
+    assert ReadingSpool(spool_path).read_batch(10)[0] == make_rows(1, 3)
+
+
+def test_committed_offset_survives_restart(tmp_path):
+    spool_path = str(tmp_path / 'readings.jsonl')
+    reading_spool = ReadingSpool(spool_path)
+    reading_spool.append_rows(make_rows(1, 2) + make_rows(2, 2))
+
+    data_rows, next_offset = reading_spool.read_batch(2)
+    reading_spool.commit_offset(next_offset)
+
+    reopened_spool = ReadingSpool(spool_path)
+    assert reopened_spool.read_batch(10)[0] == make_rows(2, 2)
+    assert reopened_spool.pending_bytes() == getsize(spool_path) - next_offset
+
+
+def test_drained_spool_is_truncated(tmp_path):
+    spool_path = str(tmp_path / 'readings.jsonl')
+    reading_spool = ReadingSpool(spool_path)
+    reading_spool.append_rows(make_rows(1, 3))
+
+    reading_spool.commit_offset(reading_spool.read_batch(10)[1])
+    assert getsize(spool_path) == 0
+    assert open(f'{spool_path}.offset').read() == '0'
+    assert reading_spool.pending_bytes() == 0
+
+    # New rows start from the beginning of the emptied file
+    reading_spool.append_rows(make_rows(2, 1))
+    assert ReadingSpool(spool_path).read_batch(10)[0] == make_rows(2, 1)
+
+
+def test_crash_between_offset_write_and_truncate_replays_from_start(tmp_path):
+    # The offset is reset to 0 before truncating, so a crash in between replays rows instead of skipping new ones
+    spool_path = str(tmp_path / 'readings.jsonl')
+    ReadingSpool(spool_path).append_rows(make_rows(1, 3))
+    open(f'{spool_path}.offset', 'w').write('0')
+
+    assert ReadingSpool(spool_path).read_batch(10)[0] == make_rows(1, 3)
+
+
+def test_offset_past_end_of_file_is_reset(tmp_path):
+    spool_path = str(tmp_path / 'readings.jsonl')
+    ReadingSpool(spool_path).append_rows(make_rows(1, 2))
+    open(f'{spool_path}.offset', 'w').write(str(10 ** 6))
+
+    reopened_spool = ReadingSpool(spool_path)
+    assert reopened_spool.offset == 0
+    assert reopened_spool.read_batch(10)[0] == make_rows(1, 2)
+
+
+def test_torn_line_is_dropped_on_open(tmp_path):
+    spool_path = str(tmp_path / 'readings.jsonl')
+    ReadingSpool(spool_path).append_rows(make_rows(1, 2))
+    with open(spool_path, 'ab') as spool_file:
+        spool_file.write(b'[3, "2026-01-01T05:00')
+
+    reopened_spool = ReadingSpool(spool_path)
+    reopened_spool.append_rows(make_rows(4, 1))
+    assert reopened_spool.read_batch(10)[0] == make_rows(1, 2) + make_rows(4, 1)
+
+
+def test_rejected_rows_are_kept_aside(tmp_path):
+    spool_path = str(tmp_path / 'readings.jsonl')
+    reading_spool = ReadingSpool(spool_path)
+    reading_spool.reject_rows(make_rows(1, 2))
+
+    assert exists(f'{spool_path}.rejected')
+    assert getsize(spool_path) == 0
+    assert ReadingSpool(f'{spool_path}.rejected').read_batch(10)[0] == make_rows(1, 2)